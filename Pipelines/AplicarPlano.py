@@ -0,0 +1,141 @@
+"""
+Aplica um plano de migração de schema a vários bancos de uma vez, sem perguntas.
+
+O plano (JSON, ou YAML se o pacote PyYAML estiver instalado) lista, por banco em bds/
+e por tabela, as renomeações, remoções, mudanças de tipo e índices (formato de
+MigrarSchema.migrar):
+
+    {
+      "portaltp.db": {
+        "licitacoes": {"renomear": {"Numero": "numero"}, "tipos": {"Valor": "REAL"},
+                       "indices": [["municipio", "ano", "mes"]]}
+      },
+      "agape&alphatec.db": {
+        "licitacoes": {"renomear": {"numeroLicitacao": "numero"}, "remover": ["links"]}
+      }
+    }
+
+Cada banco é migrado num processo próprio (bancos independentes em paralelo), numa
+única transação. No fim sai um relatório com o caminho (ALTER TABLE nativo ou
+reconstrução), o tempo e os bytes reescritos de cada tabela. Com --simular nada é
+alterado: o relatório mostra o que seria feito e quanto seria reescrito.
+
+As mensagens de cada processo saem com o nome do banco na frente. O código de saída é 1
+se algum banco falhar na validação ou na migração, para uso em scripts e agendadores.
+"""
+import argparse
+import json
+import sys
+import time
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from MigrarSchema import migrar, PROJECT_ROOT
+
+def carregar_plano(caminho: Path) -> Dict:
+    """Lê o plano em JSON ou YAML (pela extensão do arquivo)"""
+    with open(caminho, encoding='utf-8') as f:
+        if caminho.suffix.lower() in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("Planos em YAML requerem o pacote PyYAML (pip install pyyaml); use JSON")
+            plano = yaml.safe_load(f)
+        else:
+            plano = json.load(f)
+    if not isinstance(plano, dict) or not all(isinstance(tabelas, dict) for tabelas in plano.values()):
+        raise ValueError("O plano deve ser {banco: {tabela: {operações}}}")
+    return plano
+
+class _SaidaComPrefixo:
+    """Saída que escreve cada linha completa com um prefixo (processos em paralelo no mesmo terminal)"""
+
+    def __init__(self, saida, prefixo: str):
+        self.saida = saida
+        self.prefixo = prefixo
+        self._pendente = ''
+
+    def write(self, texto: str) -> int:
+        *linhas, self._pendente = (self._pendente + texto).split('\n')
+        if linhas:
+            self.saida.write(''.join(f"{self.prefixo}{linha}\n" for linha in linhas))
+            self.saida.flush()
+        return len(texto)
+
+    def flush(self):
+        if self._pendente:
+            self.write('\n')
+
+def migrar_banco(db_path: Path, plano_banco: Dict, reconstruir: bool, simular: bool) -> Tuple[bool, List[Dict], float]:
+    """Executado num processo filho: migra um banco e devolve (sucesso, relatório por tabela, segundos)"""
+    inicio = time.perf_counter()
+    relatorio = []
+    saida = _SaidaComPrefixo(sys.stdout, f"[{db_path.name}] ")
+    with redirect_stdout(saida):
+        try:
+            # O progresso padrão de migrar imprime no stdout, que aqui já sai com o prefixo do banco
+            ok = migrar(db_path, plano_banco, reconstruir=reconstruir, simular=simular, relatorio=relatorio)
+        finally:
+            saida.flush()
+    return ok, relatorio, time.perf_counter() - inicio
+
+def _mb(valor) -> str:
+    return '?' if valor is None else f"{valor / 1024 / 1024:.1f}"
+
+def imprimir_relatorio(resultados: Dict[str, Tuple[bool, List[Dict], float]], simular: bool):
+    print(f"\n{'banco':<22}{'tabela':<28}{'caminho':<14}{'segundos':>10}{'MB reescritos' if not simular else 'MB a reescrever':>17}{'índices':>9}")
+    for banco, (ok, relatorio, segundos) in resultados.items():
+        for linha in relatorio:
+            print(f"{banco:<22}{linha['tabela']:<28}{linha['caminho']:<14}{linha['segundos']:>10.2f}{_mb(linha['bytes']):>17}"
+                  f"{linha['indices']:>9}")
+        estado = '✅' if ok else '❌ falhou (nenhuma alteração aplicada)'
+        print(f"{banco:<22}{'total':<28}{'':<14}{segundos:>10.2f}  {estado}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Aplica um plano de migração de schema a vários bancos em paralelo',
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('plano', help='Arquivo do plano (.json, ou .yaml/.yml com PyYAML)')
+    parser.add_argument('--simular', action='store_true', help='Só valida e mostra o que seria feito (dry-run)')
+    parser.add_argument('--reconstruir', action='store_true', help='Reconstrói as tabelas mesmo quando o ALTER TABLE bastaria')
+    parser.add_argument('--processos', type=int, help='Bancos migrados ao mesmo tempo (padrão: um processo por banco)')
+    parser.add_argument('--bds', default=str(PROJECT_ROOT / 'bds'), help='Diretório dos bancos (padrão: bds/)')
+
+    args = parser.parse_args()
+
+    try:
+        plano = carregar_plano(Path(args.plano))
+        bds_dir = Path(args.bds)
+        faltantes = [banco for banco in plano if not (bds_dir / banco).is_file()]
+        if faltantes:
+            raise FileNotFoundError(f"Bancos não encontrados em {bds_dir}: {faltantes}")
+
+        print(f"\n{'🔍 Simulando' if args.simular else '⚙️ Migrando'} {len(plano)} bancos: {', '.join(plano)}")
+        resultados = {}
+        with ProcessPoolExecutor(max_workers=args.processos or len(plano)) as executor:
+            futures = {executor.submit(migrar_banco, bds_dir / banco, tabelas, args.reconstruir, args.simular): banco
+                       for banco, tabelas in plano.items()}
+            for future in as_completed(futures):
+                banco = futures[future]
+                try:
+                    resultados[banco] = future.result()
+                except Exception as e:
+                    print(f"  ❌ {banco}: {str(e)}")
+                    resultados[banco] = (False, [], 0.0)
+
+        imprimir_relatorio({banco: resultados[banco] for banco in plano}, args.simular)
+        falhas = [banco for banco in plano if not resultados[banco][0]]
+        if falhas:
+            print(f"\n❌ Falha na operação: {', '.join(falhas)}")
+            sys.exit(1)
+        print(f"\n🎉 {'Simulação' if args.simular else 'Migração'} concluída")
+
+    except Exception as e:
+        print(f"\n❌ Erro: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Colunas derivadas: chaves calculadas a partir de outras colunas da mesma linha
+(ex.: processo/ano dos contratos da Tectrilha), mantidas sem recalcular a tabela toda.
+
+Cada coluna é definida por uma expressão SQL sobre as colunas de entrada e pode ser:
+
+    - incremental (padrão): coluna comum, preenchida por UPDATE só nas linhas inseridas
+      desde a última execução. A tabela _derivadas guarda, por coluna, a expressão e o
+      maior rowid já calculado; uma nova execução custa O(linhas novas). Se a expressão
+      mudar, a coluna é recalculada inteira uma vez;
+    - gerada: coluna GENERATED ALWAYS AS (...) VIRTUAL (SQLite >= 3.31), calculada na
+      leitura, nunca fica desatualizada e não tem custo por execução. Não aparece no
+      PRAGMA table_info, então não vai para as exportações que leem o schema por ele.
+
+A expressão deve dar NULL quando alguma entrada for NULL (como a concatenação do SQLite);
+isso permite achar com um índice parcial as linhas regravadas com rowid já visto.
+"""
+import argparse
+import sqlite3
+from pathlib import Path
+from typing import Dict
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+GERADA_NATIVA = sqlite3.sqlite_version_info >= (3, 31, 0)
+
+def _aspas(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+def inteiro_texto(coluna: str) -> str:
+    """
+    Expressão SQL com o valor da coluna como texto, sem o '.0' de números inteiros
+    gravados como REAL (2023.0) ou como texto ('2023.0'). Só o sufixo decimal é removido:
+    '10.05', '1.0.3' e '0012' ficam como estão.
+    """
+    col = _aspas(coluna)
+    return (f"CASE WHEN typeof({col}) = 'real' AND {col} = CAST({col} AS INTEGER) THEN CAST(CAST({col} AS INTEGER) AS TEXT) "
+            f"WHEN typeof({col}) = 'text' AND {col} GLOB '[0-9]*.*' AND {col} NOT GLOB '*[^0-9.]*' AND {col} NOT GLOB '*.*.*' "
+            f"AND rtrim(substr({col}, instr({col}, '.') + 1), '0') = '' THEN substr({col}, 1, instr({col}, '.') - 1) "
+            f"ELSE CAST({col} AS TEXT) END")
+
+def processo_ano(processo_col: str, ano_col: str) -> str:
+    """Expressão SQL de 'processo/ano' (NULL se faltar um dos dois)"""
+    return f"{inteiro_texto(processo_col)} || '/' || {inteiro_texto(ano_col)}"
+
+# Colunas derivadas de cada banco: {banco: {tabela: {coluna: definição}}}
+DERIVADAS = {
+    'tectrilha.db': {
+        'contratos': {
+            'processo_formatado': {
+                'expressao': processo_ano('Processo', 'AnoProcesso'),
+                'entradas': ['Processo', 'AnoProcesso'],
+                'indice': True,
+            },
+        },
+    },
+}
+
+def get_db_path(db_name: str) -> Path:
+    """Retorna o caminho absoluto para o banco de dados"""
+    db_path = PROJECT_ROOT / "bds" / db_name
+
+    if not db_path.exists():
+        raise FileNotFoundError(f"Banco de dados não encontrado em: {db_path}")
+
+    if not db_path.is_file():
+        raise ValueError(f"Caminho não é um arquivo: {db_path}")
+
+    return db_path
+
+def preparar_controle(conn: sqlite3.Connection):
+    """Cria a tabela _derivadas (expressão e último rowid calculado de cada coluna)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _derivadas (
+            tabela TEXT NOT NULL,
+            coluna TEXT NOT NULL,
+            expressao TEXT NOT NULL,
+            ultimo_rowid INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (tabela, coluna)
+        )
+    """)
+
+def _colunas(conn: sqlite3.Connection, tabela: str) -> Dict[str, int]:
+    """Colunas da tabela -> hidden do table_xinfo (0 comum, 2 e 3 geradas)"""
+    return {row[1]: row[6] for row in conn.execute(f"PRAGMA table_xinfo({_aspas(tabela)})")}
+
+def _criar_indice(conn: sqlite3.Connection, tabela: str, coluna: str):
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {_aspas(f'idx_{tabela}_{coluna}')} ON {_aspas(tabela)} ({_aspas(coluna)})")
+
+def atualizar_incremental(conn: sqlite3.Connection, tabela: str, coluna: str, definicao: Dict, completo: bool = False) -> int:
+    """
+    Preenche a coluna nas linhas inseridas desde a última execução.
+
+    Returns:
+        int: Linhas calculadas
+    """
+    expressao = definicao['expressao']
+    entradas = definicao['entradas']
+    colunas = _colunas(conn, tabela)
+    if colunas.get(coluna):
+        raise ValueError(f"'{tabela}.{coluna}' é uma coluna gerada; remova-a antes de usar o modo incremental")
+    if coluna not in colunas:
+        conn.execute(f"ALTER TABLE {_aspas(tabela)} ADD COLUMN {_aspas(coluna)} TEXT")
+
+    registro = conn.execute("SELECT expressao, ultimo_rowid FROM _derivadas WHERE tabela = ? AND coluna = ?",
+                            (tabela, coluna)).fetchone()
+    ultimo_rowid = 0 if completo or registro is None or registro[0] != expressao else registro[1]
+
+    maximo = conn.execute(f"SELECT max(rowid) FROM {_aspas(tabela)}").fetchone()[0] or 0
+    calculadas = conn.execute(f"UPDATE {_aspas(tabela)} SET {_aspas(coluna)} = {expressao} WHERE rowid > ?",
+                              (ultimo_rowid,)).rowcount
+
+    # Linhas apagadas e regravadas no fim da tabela (substituição de uma unidade pelo extrator)
+    # podem reaproveitar rowids <= ultimo_rowid; chegam com a coluna vazia e as entradas
+    # preenchidas, e o índice parcial encontra só essas sem percorrer a tabela
+    pendentes = ' AND '.join([f"{_aspas(coluna)} IS NULL"] + [f"{_aspas(col)} IS NOT NULL" for col in entradas])
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {_aspas(f'idx_{tabela}_{coluna}_pendentes')} "
+                 f"ON {_aspas(tabela)} ({_aspas(coluna)}) WHERE {pendentes}")
+    if ultimo_rowid:
+        calculadas += conn.execute(f"UPDATE {_aspas(tabela)} SET {_aspas(coluna)} = {expressao} "
+                                   f"WHERE {pendentes} AND rowid <= ?", (ultimo_rowid,)).rowcount
+
+    if definicao.get('indice'):
+        _criar_indice(conn, tabela, coluna)
+    conn.execute("INSERT OR REPLACE INTO _derivadas (tabela, coluna, expressao, ultimo_rowid) VALUES (?, ?, ?, ?)",
+                 (tabela, coluna, expressao, maximo))
+    return calculadas
+
+def criar_gerada(conn: sqlite3.Connection, tabela: str, coluna: str, definicao: Dict) -> bool:
+    """
+    Cria a coluna como GENERATED ... VIRTUAL (e o índice, se pedido).
+
+    Returns:
+        bool: True se a coluna foi criada agora
+    """
+    if not GERADA_NATIVA:
+        raise RuntimeError(f"Colunas geradas requerem SQLite >= 3.31 (versão atual: {sqlite3.sqlite_version})")
+    colunas = _colunas(conn, tabela)
+    criada = coluna not in colunas
+    if criada:
+        conn.execute(f"ALTER TABLE {_aspas(tabela)} ADD COLUMN {_aspas(coluna)} TEXT "
+                     f"GENERATED ALWAYS AS ({definicao['expressao']}) VIRTUAL")
+    elif not colunas[coluna]:
+        raise ValueError(f"'{tabela}.{coluna}' já existe como coluna comum; remova-a antes de usar o modo gerada")
+    conn.execute("DELETE FROM _derivadas WHERE tabela = ? AND coluna = ?", (tabela, coluna))
+    if definicao.get('indice'):
+        _criar_indice(conn, tabela, coluna)
+    return criada
+
+def atualizar_banco(db_path: Path, derivadas: Dict[str, Dict[str, Dict]], gerada: bool = False, completo: bool = False) -> bool:
+    """
+    Mantém as colunas derivadas de um banco, numa única transação.
+
+    Args:
+        derivadas: {tabela: {coluna: {'expressao', 'entradas', 'indice'}}}
+        gerada: Usa colunas geradas em vez de colunas incrementais
+        completo: Recalcula as colunas incrementais inteiras
+
+    Returns:
+        bool: True se a operação foi bem sucedida
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        conn.execute("BEGIN IMMEDIATE")
+        preparar_controle(conn)
+        for tabela, colunas in derivadas.items():
+            existentes = _colunas(conn, tabela)
+            if not existentes:
+                print(f"🟡 Tabela '{tabela}' não existe em {db_path.name}")
+                continue
+            for coluna, definicao in colunas.items():
+                faltantes = [col for col in definicao['entradas'] if col not in existentes]
+                if faltantes:
+                    raise ValueError(f"Colunas de entrada ausentes em '{tabela}': {faltantes}")
+                if gerada:
+                    criada = criar_gerada(conn, tabela, coluna, definicao)
+                    print(f"  🧮 {tabela}.{coluna}: coluna gerada {'criada' if criada else 'já existente'}")
+                else:
+                    calculadas = atualizar_incremental(conn, tabela, coluna, definicao, completo)
+                    print(f"  🧮 {tabela}.{coluna}: {calculadas} linhas calculadas")
+        conn.execute("COMMIT")
+        return True
+
+    except Exception as e:
+        if conn and conn.in_transaction:
+            conn.execute("ROLLBACK")
+        print(f"Erro ao atualizar as colunas derivadas: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Mantém as colunas derivadas (chaves calculadas) dos bancos em bds/',
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('db_names', nargs='*', help=f"Bancos (padrão: {', '.join(DERIVADAS)})")
+    parser.add_argument('--gerada', action='store_true', help='Cria as colunas como GENERATED ... VIRTUAL')
+    parser.add_argument('--completo', action='store_true', help='Recalcula as colunas incrementais inteiras')
+
+    args = parser.parse_args()
+
+    try:
+        for db_name in args.db_names or list(DERIVADAS):
+            if db_name not in DERIVADAS:
+                raise ValueError(f"Nenhuma coluna derivada definida para '{db_name}'")
+            db_path = get_db_path(db_name)
+            print(f"\n📁 Banco de dados: {db_path}")
+            if not atualizar_banco(db_path, DERIVADAS[db_name], args.gerada, args.completo):
+                print("\n❌ Falha na operação")
+                return
+
+        print("\n🎉 Colunas derivadas atualizadas")
+
+    except Exception as e:
+        print(f"\n❌ Erro: {str(e)}")
+
+if __name__ == "__main__":
+    main()
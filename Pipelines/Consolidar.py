@@ -0,0 +1,272 @@
+"""
+Consolida as tabelas das empresas em entidades canônicas (licitações, contratos,
+aditivos, servidores, pagamentos), a partir do registro declarativo em data/entidades.json:
+
+    {
+      "licitacoes": {
+        "colunas": {"modalidade": "TEXT", "valor_homologado": "REAL", ...},
+        "fontes": [
+          {"empresa": "portaltp", "banco": "portaltp.db", "tabela": "licitacoes",
+           "mapa": {"ValorHomologado": "valor_homologado"}},
+          ...
+        ]
+      }
+    }
+
+Cada coluna de uma fonte vai para a coluna canônica indicada no "mapa" ou, sem mapa,
+para a coluna canônica de mesmo nome ignorando maiúsculas, acentos e separadores
+(ValorHomologado, valor_homologado e VALOR HOMOLOGADO casam). As demais são descartadas.
+
+Cada entidade é gravada em bds/consolidado/<entidade>.db, com as colunas fixas dos
+extratores (municipio, prefeitura, ano, mes), a empresa e a fonte de cada linha.
+As entidades são construídas em paralelo (uma thread por entidade, cada uma com seu
+banco), com INSERT ... SELECT sobre os bancos das empresas anexados via ATTACH.
+
+Nas execuções seguintes só são refeitas as partições (município, ano, mês) com unidades
+que o ledger (_ledger) da fonte registrou com versão maior que a da última construção
+(baixadas de novo ou regravadas pela reconstrução; ver ledger.py). A versão é lida antes
+da cópia, então uma unidade gravada durante a construção entra na seguinte.
+Uma partição cujas unidades voltaram vazias tem as linhas removidas da entidade.
+Uma fonte sem ledger (ou com ledger anterior às versões), ou cujo mapeamento ou colunas
+mudaram, é refeita inteira.
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+from indices import nome_comparavel
+from ledger import versao_atual
+
+REGISTRO_PADRAO = PROJECT_ROOT / "data" / "entidades.json"
+
+# Colunas da unidade gravadas pelos extratores, copiadas quando a fonte as tem
+COLUNAS_FIXAS = {'municipio': 'TEXT', 'prefeitura': 'TEXT', 'ano': 'INTEGER', 'mes': 'INTEGER'}
+
+def carregar_registro(caminho: Path) -> Dict:
+    """Lê o registro de entidades e confere os campos obrigatórios"""
+    with open(caminho, encoding='utf-8') as f:
+        registro = json.load(f)
+    for entidade, spec in registro.items():
+        if not spec.get('colunas') or not spec.get('fontes'):
+            raise ValueError(f"Entidade '{entidade}' precisa de 'colunas' e 'fontes'")
+        for fonte in spec['fontes']:
+            faltantes = {'empresa', 'banco', 'tabela'} - set(fonte)
+            if faltantes:
+                raise ValueError(f"Fonte de '{entidade}' sem {sorted(faltantes)}: {fonte}")
+    return registro
+
+def mapear_colunas(colunas_fonte: List[str], colunas_canonicas: List[str], mapa: Optional[Dict] = None) -> Dict[str, str]:
+    """
+    {coluna canônica: coluna na fonte}. O mapa explícito tem precedência;
+    as demais colunas casam pelo nome comparável.
+    """
+    mapa = mapa or {}
+    existentes = set(colunas_fonte)
+    resultado = {}
+    for origem, destino in mapa.items():
+        if destino not in colunas_canonicas:
+            raise ValueError(f"Mapa aponta para coluna canônica inexistente: {origem} -> {destino}")
+        if origem in existentes:
+            resultado[destino] = origem
+
+    por_nome = {}
+    for coluna in colunas_fonte:
+        if coluna not in mapa:
+            por_nome.setdefault(nome_comparavel(coluna), coluna)
+    for canonica in colunas_canonicas:
+        if canonica not in resultado and nome_comparavel(canonica) in por_nome:
+            resultado[canonica] = por_nome[nome_comparavel(canonica)]
+    return resultado
+
+def assinatura(*partes) -> str:
+    return hashlib.sha1(json.dumps(partes, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def preparar_saida(conn: sqlite3.Connection, entidade: str, spec: Dict) -> bool:
+    """
+    Cria a tabela da entidade e a de controle (_fontes). Se as colunas canônicas mudaram,
+    a tabela é recriada e todas as fontes são refeitas.
+
+    Returns:
+        bool: True se a tabela foi (re)criada
+    """
+    colunas = {'_fonte': 'TEXT', 'empresa': 'TEXT', **COLUNAS_FIXAS, **spec['colunas']}
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS _fontes (
+            fonte TEXT PRIMARY KEY,
+            assinatura TEXT,
+            construido_em REAL,
+            versao INTEGER
+        )
+    """)
+    if 'versao' not in {col[1] for col in conn.execute("PRAGMA table_info(_fontes)")}:
+        # Construções anteriores às versões do ledger ficam sem versão e são refeitas inteiras
+        conn.execute("ALTER TABLE _fontes ADD COLUMN versao INTEGER")
+    atuais = [(col[1], col[2]) for col in conn.execute(f'PRAGMA table_info("{entidade}")')]
+    if atuais == list(colunas.items()):
+        return False
+
+    conn.execute(f'DROP TABLE IF EXISTS "{entidade}"')
+    definicoes = ', '.join(f'"{nome}" {tipo}' for nome, tipo in colunas.items())
+    conn.execute(f'CREATE TABLE "{entidade}" ({definicoes})')
+    conn.execute(f'CREATE INDEX "idx_{entidade}_particao" ON "{entidade}" (_fonte, municipio, ano, mes)')
+    conn.execute("DELETE FROM _fontes")
+    conn.commit()
+    return True
+
+def particoes_alteradas(conn: sqlite3.Connection, esquema: str, tabela: str, desde: int) -> List[Tuple]:
+    """
+    (municipio, ano, mes, com_linhas) das unidades da tabela gravadas com conteúdo novo ou
+    vazio depois da versão `desde` do ledger. com_linhas é falso quando todas as unidades da
+    partição voltaram vazias: as linhas antigas dela saem da entidade e nada é copiado.
+    """
+    return conn.execute(f"""
+        SELECT municipio, ano, mes, MAX(status = 'ok') FROM {esquema}._ledger
+        WHERE versao > ? AND endpoint = ? AND status IN ('ok', 'vazio')
+        GROUP BY municipio, ano, mes
+    """, (desde, tabela)).fetchall()
+
+def carregar_fonte(conn: sqlite3.Connection, entidade: str, spec: Dict, fonte: Dict, bds_dir: Path, completo: bool) -> Tuple[str, int]:
+    """
+    Copia (ou atualiza) as linhas de uma fonte na tabela da entidade.
+
+    Returns:
+        tuple: (descrição do que foi feito, linhas inseridas)
+    """
+    nome_fonte = f"{fonte['banco']}/{fonte['tabela']}"
+    caminho = bds_dir / fonte['banco']
+    if not caminho.exists():
+        return "banco não encontrado", 0
+
+    conn.execute("ATTACH DATABASE ? AS fonte", (f"file:{caminho}?mode=ro",))
+    try:
+        tabelas = {nome.lower(): nome for (nome,) in conn.execute("SELECT name FROM fonte.sqlite_master WHERE type='table'")}
+        tabela = tabelas.get(fonte['tabela'].lower())
+        if tabela is None:
+            return "tabela não encontrada", 0
+
+        colunas_fonte = [col[1] for col in conn.execute(f'PRAGMA fonte.table_info("{tabela}")')]
+        mapa = mapear_colunas([c for c in colunas_fonte if c not in COLUNAS_FIXAS], list(spec['colunas']), fonte.get('mapa'))
+        fixas = [col for col in COLUNAS_FIXAS if col in colunas_fonte]
+        # Lida antes da cópia: o que for gravado na fonte depois dela fica para a próxima construção
+        versao = versao_atual(conn, 'fonte') if '_ledger' in tabelas else None
+
+        assinatura_atual = assinatura(spec['colunas'], fonte, colunas_fonte)
+        estado = conn.execute("SELECT assinatura, versao FROM _fontes WHERE fonte = ?", (nome_fonte,)).fetchone()
+
+        destino = ['_fonte', 'empresa'] + fixas + list(mapa)
+        selecao = ['?', '?'] + [f'"{col}"' for col in fixas] + [f'"{col}"' for col in mapa.values()]
+        inserir = (f'INSERT INTO main."{entidade}" ({", ".join(f"{chr(34)}{c}{chr(34)}" for c in destino)}) '
+                   f'SELECT {", ".join(selecao)} FROM fonte."{tabela}"')
+        params = (nome_fonte, fonte['empresa'])
+
+        incremental = (not completo and versao is not None and estado is not None and estado[0] == assinatura_atual
+                       and estado[1] is not None)
+        if not incremental:
+            conn.execute(f'DELETE FROM main."{entidade}" WHERE _fonte = ?', (nome_fonte,))
+            inseridas = conn.execute(inserir, params).rowcount
+            descricao = "refeita inteira"
+        else:
+            particoes = particoes_alteradas(conn, 'fonte', tabela, estado[1])
+            inseridas = 0
+            for municipio, ano, mes, com_linhas in particoes:
+                # Fontes anuais (sem coluna mes) têm mes = 0 no ledger
+                filtro = ['municipio = ?', 'ano = ?'] + (['mes = ?'] if 'mes' in fixas else [])
+                valores = (municipio, ano) + ((mes,) if 'mes' in fixas else ())
+                conn.execute(f'DELETE FROM main."{entidade}" WHERE _fonte = ? AND {" AND ".join(filtro)}', (nome_fonte, *valores))
+                # Partição só com unidades vazias: o extrator não apaga as linhas antigas no banco da
+                # empresa, então elas não são copiadas de novo
+                if com_linhas:
+                    inseridas += conn.execute(f'{inserir} WHERE {" AND ".join(filtro)}', params + valores).rowcount
+            descricao = f"{len(particoes)} partições refeitas"
+
+        conn.execute("INSERT OR REPLACE INTO _fontes (fonte, assinatura, construido_em, versao) VALUES (?, ?, ?, ?)",
+                     (nome_fonte, assinatura_atual, time.time(), versao))
+        conn.commit()
+        return descricao, inseridas
+    finally:
+        conn.commit()
+        conn.execute("DETACH DATABASE fonte")
+
+def construir_entidade(entidade: str, spec: Dict, bds_dir: Path, saida: Path, completo: bool = False) -> List[str]:
+    """Constrói (ou atualiza) uma entidade no seu próprio banco; retorna as linhas do relatório"""
+    saida.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(saida / f"{entidade}.db", uri=True)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        relatorio = []
+        if preparar_saida(conn, entidade, spec):
+            relatorio.append(f"  🆕 {entidade}: tabela criada")
+        for fonte in spec['fontes']:
+            descricao, inseridas = carregar_fonte(conn, entidade, spec, fonte, bds_dir, completo)
+            relatorio.append(f"  📦 {entidade} <- {fonte['banco']}/{fonte['tabela']}: {descricao}, {inseridas} linhas inseridas")
+        return relatorio
+    finally:
+        conn.close()
+
+def consolidar(registro: Dict, entidades: Optional[List[str]] = None, bds_dir: Path = PROJECT_ROOT / "bds",
+               saida: Path = PROJECT_ROOT / "bds" / "consolidado", completo: bool = False, workers: Optional[int] = None) -> bool:
+    """
+    Constrói as entidades pedidas (todas, por padrão) em paralelo.
+
+    Returns:
+        bool: True se todas foram construídas
+    """
+    entidades = entidades or list(registro)
+    desconhecidas = [e for e in entidades if e not in registro]
+    if desconhecidas:
+        raise ValueError(f"Entidades fora do registro: {desconhecidas}. Disponíveis: {list(registro)}")
+
+    sucesso = True
+    with ThreadPoolExecutor(max_workers=workers or len(entidades)) as executor:
+        futures = {executor.submit(construir_entidade, entidade, registro[entidade], bds_dir, saida, completo): entidade
+                   for entidade in entidades}
+        for future in as_completed(futures):
+            entidade = futures[future]
+            try:
+                print('\n'.join(future.result()))
+            except Exception as e:
+                print(f"  ❌ {entidade}: {str(e)}")
+                sucesso = False
+    return sucesso
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Consolida as tabelas das empresas nas entidades canônicas do registro',
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('entidades', nargs='*', help='Entidades a construir (padrão: todas do registro)')
+    parser.add_argument('--registro', default=str(REGISTRO_PADRAO), help='Registro de entidades (padrão: data/entidades.json)')
+    parser.add_argument('--bds', default=str(PROJECT_ROOT / 'bds'), help='Diretório dos bancos das empresas (padrão: bds/)')
+    parser.add_argument('--saida', default=str(PROJECT_ROOT / 'bds' / 'consolidado'),
+                        help='Diretório dos bancos consolidados (padrão: bds/consolidado/)')
+    parser.add_argument('--completo', action='store_true', help='Refaz todas as fontes, não só as partições alteradas')
+    parser.add_argument('--workers', type=int, help='Entidades construídas ao mesmo tempo (padrão: todas)')
+
+    args = parser.parse_args()
+
+    try:
+        registro = carregar_registro(Path(args.registro))
+        inicio = time.perf_counter()
+        print(f"\n⚙️ Consolidando {', '.join(args.entidades or registro)}...")
+        if consolidar(registro, args.entidades, Path(args.bds), Path(args.saida), args.completo, args.workers):
+            print(f"\n🎉 Consolidação concluída em {time.perf_counter() - inicio:.1f}s")
+        else:
+            print("\n❌ Falha na operação")
+            sys.exit(1)
+
+    except Exception as e:
+        print(f"\n❌ Erro: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
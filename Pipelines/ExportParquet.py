@@ -0,0 +1,287 @@
+"""
+Exporta as tabelas dos bancos em bds/ para Parquet, no layout particionado:
+
+    parquet/<banco>/<tabela>/ano=2024/mes=3/municipio=vit%C3%B3ria/parte.parquet
+
+Cada arquivo tem as colunas com o tipo declarado no SQLite (INTEGER -> int64,
+REAL -> float64, o resto texto) e as colunas de texto codificadas em dicionário;
+ano/mes/municipio ficam só no caminho (partições no estilo hive). Uma leitura
+analítica de um ano lê apenas as partições do ano, e só as colunas usadas:
+
+    pyarrow.dataset.dataset('parquet/portaltp/despesas', partitioning='hive')
+
+Nas execuções seguintes só são escritas as partições novas e as que têm unidades que o
+ledger (_ledger) registrou com versão maior que a da última exportação (baixadas de novo,
+vazias ou regravadas pela reconstrução; ver ledger.py). A versão exportada fica em
+<tabela>/_exportacao.json e é lida antes das linhas, então o que for gravado durante a
+exportação entra na seguinte. As partições que não existem mais na tabela são apagadas.
+Sem ledger (ou com ledger anterior às versões) só as partições novas são escritas.
+Requer o pacote pyarrow.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import quote
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+from ledger import versao_atual
+
+# Colunas usadas como partição, na ordem dos diretórios (as que existirem na tabela)
+COLUNAS_PARTICAO = ('ano', 'mes', 'municipio')
+
+NOME_ARQUIVO = 'parte.parquet'
+
+# Versão do ledger da última exportação de cada tabela (o prefixo _ faz o pyarrow ignorá-lo)
+ARQUIVO_ESTADO = '_exportacao.json'
+
+def get_db_path(db_name: str) -> Path:
+    """Retorna o caminho absoluto para o banco de dados"""
+    db_path = PROJECT_ROOT / "bds" / db_name
+
+    if not db_path.exists():
+        raise FileNotFoundError(f"Banco de dados não encontrado em: {db_path}")
+
+    if not db_path.is_file():
+        raise ValueError(f"Caminho não é um arquivo: {db_path}")
+
+    return db_path
+
+def listar_tabelas(conn: sqlite3.Connection) -> List[str]:
+    """Tabelas de dados do banco (sem as internas do SQLite e do extrator, que começam com _)"""
+    cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+    return [nome for (nome,) in cursor if not nome.startswith(('sqlite_', '_'))]
+
+def tipo_arrow(tipo_sqlite: str):
+    """Tipo Arrow a partir do tipo declarado da coluna (afinidade do SQLite)"""
+    import pyarrow as pa
+
+    tipo = (tipo_sqlite or '').upper()
+    if 'INT' in tipo:
+        return pa.int64()
+    if any(nome in tipo for nome in ('REAL', 'FLOA', 'DOUB')):
+        return pa.float64()
+    return pa.string()
+
+def montar_coluna(valores: list, tipo):
+    """
+    Coluna Arrow com o tipo declarado; se algum valor não couber no tipo (ex.: texto
+    numa coluna REAL), a coluna vai como texto. Colunas de texto são codificadas em dicionário.
+    """
+    import pyarrow as pa
+
+    if tipo != pa.string():
+        try:
+            return pa.array(valores, type=tipo)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            pass
+    texto = [None if valor is None else str(valor) for valor in valores]
+    return pa.array(texto, type=pa.string()).dictionary_encode()
+
+def caminho_particao(destino: Path, chave: Dict) -> Path:
+    """Diretório da partição; os valores são codificados como URI, como o pyarrow espera no estilo hive"""
+    for coluna, valor in chave.items():
+        destino = destino / f"{coluna}={quote(str(valor), safe='')}"
+    return destino
+
+def listar_particoes(conn: sqlite3.Connection, tabela: str, colunas_particao: List[str]) -> List[Dict]:
+    """Valores distintos das colunas de partição presentes na tabela"""
+    if not colunas_particao:
+        return [{}]
+    colunas = ', '.join(f'"{col}"' for col in colunas_particao)
+    cursor = conn.execute(f'SELECT DISTINCT {colunas} FROM "{tabela}"')
+    return [dict(zip(colunas_particao, row)) for row in cursor]
+
+def particoes_alteradas(conn: sqlite3.Connection, tabela: str, colunas_particao: List[str], desde: int) -> Set[tuple]:
+    """
+    Chaves de partição (valores de colunas_particao) com unidades gravadas com conteúdo
+    novo ou vazio depois da versão `desde` do ledger
+    """
+    colunas = ''.join(f', {col}' for col in colunas_particao)
+    cursor = conn.execute(f"SELECT DISTINCT 1{colunas} FROM _ledger WHERE versao > ? AND endpoint = ? AND status IN ('ok', 'vazio')",
+                          (desde, tabela))
+    return {row[1:] for row in cursor}
+
+def ler_estado(pasta: Path) -> Optional[int]:
+    """Versão do ledger gravada na última exportação da tabela (None se não houver)"""
+    try:
+        with open(pasta / ARQUIVO_ESTADO, encoding='utf-8') as f:
+            return json.load(f).get('versao')
+    except (OSError, ValueError):
+        return None
+
+def gravar_estado(pasta: Path, versao: int):
+    pasta.mkdir(parents=True, exist_ok=True)
+    temporario = pasta / (ARQUIVO_ESTADO + '.tmp')
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump({'versao': versao}, f)
+    os.replace(temporario, pasta / ARQUIVO_ESTADO)
+
+def apagar_particoes_antigas(pasta: Path, atuais: Set[Path]) -> int:
+    """Apaga os arquivos das partições exportadas que não estão em `atuais` (e os diretórios que ficarem vazios)"""
+    apagadas = 0
+    for arquivo in sorted(pasta.rglob(NOME_ARQUIVO)):
+        if arquivo.parent in atuais:
+            continue
+        arquivo.unlink()
+        apagadas += 1
+        diretorio = arquivo.parent
+        while diretorio != pasta and not any(diretorio.iterdir()):
+            diretorio.rmdir()
+            diretorio = diretorio.parent
+    return apagadas
+
+def escrever_particao(linhas: List[tuple], colunas: List[Tuple[str, str]], arquivo: Path):
+    """Escreve as linhas de uma partição (colunas de dados apenas) num arquivo Parquet"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    valores = list(zip(*linhas)) if linhas else [()] * len(colunas)
+    tabela_arrow = pa.table({nome: montar_coluna(list(coluna), tipo_arrow(tipo))
+                             for (nome, tipo), coluna in zip(colunas, valores)})
+
+    # Escreve num temporário e renomeia, para que uma interrupção não deixe partição pela metade
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    temporario = arquivo.with_suffix('.tmp')
+    pq.write_table(tabela_arrow, temporario, compression='zstd')
+    os.replace(temporario, arquivo)
+
+def exportar_tabela(conn: sqlite3.Connection, tabela: str, destino: Path, completo: bool = False) -> Tuple[int, int, int, int]:
+    """
+    Exporta uma tabela para destino/<tabela>/, uma partição por (ano, mes, municipio).
+
+    A tabela é lida uma vez, ordenada pelas colunas de partição; as linhas das
+    partições que não precisam ser escritas são só percorridas.
+
+    Args:
+        completo: Reescreve todas as partições, mesmo as já exportadas
+
+    Returns:
+        tuple: (partições escritas, partições mantidas, partições apagadas, linhas escritas)
+    """
+    colunas = [(col[1], col[2]) for col in conn.execute(f'PRAGMA table_info("{tabela}")')]
+    nomes = {nome for nome, _ in colunas}
+    colunas_particao = [col for col in COLUNAS_PARTICAO if col in nomes]
+    colunas_dados = [(nome, tipo) for nome, tipo in colunas if nome not in colunas_particao]
+    pasta = destino / tabela
+
+    # Lida antes das linhas: o que for gravado depois dela fica para a próxima exportação
+    tem_ledger = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='_ledger'").fetchone() is not None
+    versao = versao_atual(conn) if tem_ledger else None
+    desde = ler_estado(pasta)
+    if completo or (versao is not None and desde is None):
+        # Sem a versão da última exportação não há como saber o que mudou: tudo é reescrito
+        alteradas = None
+    elif versao is None:
+        alteradas = set()
+    else:
+        alteradas = particoes_alteradas(conn, tabela, colunas_particao, desde)
+
+    chaves = listar_particoes(conn, tabela, colunas_particao)
+    a_escrever = set()
+    mantidas = 0
+    for chave in chaves:
+        arquivo = caminho_particao(pasta, chave) / NOME_ARQUIVO
+        if alteradas is not None and arquivo.exists() and tuple(chave.values()) not in alteradas:
+            mantidas += 1
+            continue
+        a_escrever.add(tuple(chave.values()))
+
+    # Partições sem linhas na tabela (unidades que voltaram vazias, dados apagados) saem da exportação
+    apagadas = apagar_particoes_antigas(pasta, {caminho_particao(pasta, chave) for chave in chaves}) if pasta.exists() else 0
+    if not a_escrever:
+        if versao is not None:
+            gravar_estado(pasta, versao)
+        return 0, mantidas, apagadas, 0
+
+    selecao = ', '.join(f'"{nome}"' for nome in colunas_particao + [nome for nome, _ in colunas_dados])
+    ordem = f' ORDER BY {", ".join(f"{chr(34)}{col}{chr(34)}" for col in colunas_particao)}' if colunas_particao else ''
+    cursor = conn.execute(f'SELECT {selecao} FROM "{tabela}"{ordem}')
+
+    n = len(colunas_particao)
+    linhas = 0
+    for valores_chave, grupo in groupby(cursor, key=lambda row: row[:n]):
+        if valores_chave not in a_escrever:
+            continue
+        dados = [row[n:] for row in grupo]
+        arquivo = caminho_particao(pasta, dict(zip(colunas_particao, valores_chave))) / NOME_ARQUIVO
+        escrever_particao(dados, colunas_dados, arquivo)
+        linhas += len(dados)
+    if versao is not None:
+        gravar_estado(pasta, versao)
+    return len(a_escrever), mantidas, apagadas, linhas
+
+def exportar_banco(db_path: Path, saida: Path, tabelas: Optional[List[str]] = None, completo: bool = False) -> bool:
+    """
+    Exporta as tabelas de um banco para saida/<nome do banco>/.
+
+    Returns:
+        bool: True se a operação foi bem sucedida
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        existentes = listar_tabelas(conn)
+        for tabela in tabelas or existentes:
+            if tabela not in existentes:
+                print(f"🟡 Tabela '{tabela}' não existe em {db_path.name}")
+                continue
+            inicio = time.perf_counter()
+            escritas, mantidas, apagadas, linhas = exportar_tabela(conn, tabela, saida / db_path.stem, completo)
+            print(f"  📦 {tabela}: {escritas} partições escritas ({linhas} linhas), {mantidas} já exportadas, "
+                  f"{apagadas} apagadas ({time.perf_counter() - inicio:.1f}s)")
+        return True
+
+    except Exception as e:
+        print(f"Erro durante a exportação: {str(e)}")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Exporta as tabelas dos bancos para Parquet particionado por ano/mes/municipio',
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('db_names', nargs='*', help='Bancos em bds/ (padrão: todos os .db)')
+    parser.add_argument('--tabelas', nargs='+', help='Só estas tabelas')
+    parser.add_argument('--saida', default=str(PROJECT_ROOT / 'parquet'), help='Diretório de saída (padrão: parquet/)')
+    parser.add_argument('--completo', action='store_true', help='Reescreve todas as partições, não só as novas')
+
+    args = parser.parse_args()
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("\n❌ Erro: a exportação para Parquet requer o pacote pyarrow (pip install pyarrow)")
+        sys.exit(1)
+
+    try:
+        db_names = args.db_names or sorted(p.name for p in (PROJECT_ROOT / 'bds').glob('*.db'))
+        if not db_names:
+            print("\n🟡 Nenhum banco encontrado em bds/")
+            return
+
+        for db_name in db_names:
+            db_path = get_db_path(db_name)
+            print(f"\n📁 Banco de dados: {db_path}")
+            if not exportar_banco(db_path, Path(args.saida), args.tabelas, args.completo):
+                print("\n❌ Falha na operação")
+                sys.exit(1)
+
+        print(f"\n🎉 Exportação concluída em {args.saida}")
+
+    except Exception as e:
+        print(f"\n❌ Erro: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import sqlite3
 import os
 from sqlite3 import Error
+from ColunasDerivadas import preparar_controle, atualizar_incremental, processo_ano
 
 def create_connection(db_path):
     conn = None
@@ -32,25 +33,12 @@ def combine_processo_ano(conn, table_name, processo_col, ano_col, output_col='pr
         
         # Se output_table não for fornecido, atualiza a tabela existente
         if output_table is None:
-            # Adiciona a nova coluna se ela não existir
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = [column[1] for column in cursor.fetchall()]
-            
-            if output_col not in columns:
-                cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {output_col} TEXT")
-            
-            # Atualiza os valores (removendo o .0 dos números)
-            update_sql = f"""
-            UPDATE {table_name}
-            SET {output_col} = 
-                CASE 
-                    WHEN {processo_col} IS NOT NULL AND {ano_col} IS NOT NULL 
-                    THEN CAST(REPLACE({processo_col}, '.0', '') AS TEXT) || '/' || CAST(REPLACE({ano_col}, '.0', '') AS TEXT)
-                    ELSE NULL
-                END
-            """
-            cursor.execute(update_sql)
-            print(f"Coluna '{output_col}' atualizada na tabela '{table_name}'")
+            # Coluna derivada incremental: só as linhas inseridas desde a última execução
+            # são calculadas (ver ColunasDerivadas)
+            preparar_controle(conn)
+            definicao = {'expressao': processo_ano(processo_col, ano_col), 'entradas': [processo_col, ano_col], 'indice': True}
+            calculadas = atualizar_incremental(conn, table_name, output_col, definicao)
+            print(f"Coluna '{output_col}' atualizada na tabela '{table_name}' ({calculadas} linhas calculadas)")
         
         # Se output_table for fornecido, cria uma nova tabela
         else:
@@ -64,11 +52,7 @@ def combine_processo_ano(conn, table_name, processo_col, ano_col, output_col='pr
             insert_sql = f"""
             INSERT INTO {output_table}
             SELECT *, 
-                CASE 
-                    WHEN {processo_col} IS NOT NULL AND {ano_col} IS NOT NULL 
-                    THEN CAST(REPLACE({processo_col}, '.0', '') AS TEXT) || '/' || CAST(REPLACE({ano_col}, '.0', '') AS TEXT)
-                    ELSE NULL
-                END AS {output_col}
+                {processo_ano(processo_col, ano_col)} AS {output_col}
             FROM {table_name}
             """
             cursor.execute(insert_sql)
@@ -76,7 +60,7 @@ def combine_processo_ano(conn, table_name, processo_col, ano_col, output_col='pr
         
         conn.commit()
         
-    except Error as e:
+    except (Error, ValueError) as e:
         print(f"Erro ao processar a tabela: {e}")
         conn.rollback()
 
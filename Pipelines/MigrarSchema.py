@@ -0,0 +1,509 @@
+"""
+Migração de schema das tabelas SQLite: renomear, remover e mudar o tipo de colunas.
+
+Um plano descreve as mudanças de várias tabelas de um banco, sempre pelos nomes atuais
+das colunas:
+
+    {
+      "licitacoes": {"renomear": {"Numero": "numero"}, "remover": ["Documento"], "tipos": {"Valor": "REAL"}},
+      "contratos": {"renomear": {"Valor": "valor"}, "indices": [["municipio", "ano", "mes"]]}
+    }
+
+Os índices (lista de colunas, ou {"colunas": [...], "unico": true, "nome": "..."}) usam
+os nomes das colunas depois da migração e só são criados se ainda não existirem.
+
+Cada tabela segue o caminho mais barato:
+
+    - nativo: ALTER TABLE ... RENAME COLUMN (SQLite >= 3.25) e DROP COLUMN (>= 3.35),
+      que só mexem no schema (o DROP reescreve as linhas, mas sem copiar a tabela);
+    - reconstrução: quando há mudança de tipo, o SQLite é antigo ou o DROP nativo não é
+      permitido (coluna indexada, chave, ...), a tabela é copiada uma única vez, já com
+      todas as renomeações, remoções e tipos novos, em lotes com progresso.
+
+O DDL da tabela nova é montado a partir do PRAGMA table_xinfo, e não do texto do CREATE.
+Do texto do CREATE vêm só as expressões das colunas geradas (GENERATED ALWAYS AS, mantidas
+na tabela nova e fora da cópia das linhas) e as restrições CHECK, que passam para a tabela
+nova com os nomes novos das colunas; um CHECK ou uma coluna gerada que use coluna removida
+impede a migração.
+Todas as tabelas do plano são migradas numa única transação: se algo falhar, o banco
+fica como estava.
+"""
+import argparse
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+RENOMEAR_NATIVO = sqlite3.sqlite_version_info >= (3, 25, 0)
+REMOVER_NATIVO = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Linhas copiadas por INSERT ... SELECT na reconstrução
+TAMANHO_LOTE = 100000
+
+def get_db_path(db_name: str) -> Path:
+    """Retorna o caminho absoluto para o banco de dados"""
+    db_path = PROJECT_ROOT / "bds" / db_name
+
+    if not db_path.exists():
+        raise FileNotFoundError(f"Banco de dados não encontrado em: {db_path}")
+
+    if not db_path.is_file():
+        raise ValueError(f"Caminho não é um arquivo: {db_path}")
+
+    return db_path
+
+def _aspas(nome: str) -> str:
+    return '"' + nome.replace('"', '""') + '"'
+
+def validar_plano(conn: sqlite3.Connection, plano: Dict) -> Dict:
+    """
+    Confere tabelas e colunas do plano e devolve, por tabela, as mudanças normalizadas
+    ({'renomear': {}, 'remover': [], 'tipos': {}, 'indices': []}). Levanta ValueError no primeiro problema.
+    """
+    normalizado = {}
+    for tabela, mudancas in plano.items():
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabela,)).fetchone():
+            raise ValueError(f"Tabela '{tabela}' não existe no banco de dados")
+
+        desconhecidas = set(mudancas) - {'renomear', 'remover', 'tipos', 'indices'}
+        if desconhecidas:
+            raise ValueError(f"Operações desconhecidas para '{tabela}': {sorted(desconhecidas)}")
+        renomear = dict(mudancas.get('renomear') or {})
+        remover = list(mudancas.get('remover') or [])
+        tipos = dict(mudancas.get('tipos') or {})
+
+        existentes = [col[1] for col in conn.execute(f"PRAGMA table_xinfo({_aspas(tabela)})")]
+        for coluna in list(renomear) + remover + list(tipos):
+            if coluna not in existentes:
+                raise ValueError(f"Coluna '{coluna}' não existe na tabela '{tabela}'")
+        for coluna in remover:
+            if coluna in renomear or coluna in tipos:
+                raise ValueError(f"Coluna '{coluna}' de '{tabela}' não pode ser removida e alterada no mesmo plano")
+        finais = [renomear.get(col, col) for col in existentes if col not in remover]
+        repetidas = {col for col in finais if finais.count(col) > 1}
+        if repetidas:
+            raise ValueError(f"Coluna(s) {sorted(repetidas)} ficariam repetidas na tabela '{tabela}'")
+        if not finais:
+            raise ValueError(f"A tabela '{tabela}' deve ter pelo menos uma coluna restante")
+
+        indices = []
+        for indice in mudancas.get('indices') or []:
+            indice = dict(indice) if isinstance(indice, dict) else {'colunas': list(indice)}
+            faltantes = [col for col in indice.get('colunas') or [] if col not in finais]
+            if not indice.get('colunas') or faltantes:
+                raise ValueError(f"Índice inválido em '{tabela}': {indice} (colunas inexistentes: {faltantes})")
+            indice.setdefault('nome', f"idx_{tabela}_{'_'.join(indice['colunas'])}")
+            indices.append(indice)
+
+        normalizado[tabela] = {'renomear': renomear, 'remover': remover, 'tipos': tipos, 'indices': indices}
+    return normalizado
+
+def tamanho_tabela(conn: sqlite3.Connection, tabela: str) -> Optional[int]:
+    """Bytes ocupados pela tabela e seus índices (None se o SQLite não tiver a tabela virtual dbstat)"""
+    nomes = [tabela] + [row[1] for row in conn.execute(f"PRAGMA index_list({_aspas(tabela)})")]
+    try:
+        return conn.execute(f"SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name IN ({', '.join('?' for _ in nomes)})",
+                            nomes).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+def caminho_previsto(conn: sqlite3.Connection, tabela: str, mudancas: Dict, reconstruir: bool = False) -> str:
+    """
+    'nativo' ou 'reconstrucao', sem alterar nada (usado na simulação). O DROP COLUMN
+    nativo é recusado pelo SQLite para colunas em chave primária, índice ou chave estrangeira.
+    """
+    if reconstruir or mudancas['tipos']:
+        return 'reconstrucao'
+    if (mudancas['renomear'] and not RENOMEAR_NATIVO) or (mudancas['remover'] and not REMOVER_NATIVO):
+        return 'reconstrucao'
+    if mudancas['remover']:
+        presas = {col[1] for col in conn.execute(f"PRAGMA table_info({_aspas(tabela)})") if col[5]}
+        for _, indice, *_ in conn.execute(f"PRAGMA index_list({_aspas(tabela)})"):
+            presas.update(c[2] for c in conn.execute(f"PRAGMA index_info({_aspas(indice)})"))
+        presas.update(fk[3] for fk in conn.execute(f"PRAGMA foreign_key_list({_aspas(tabela)})"))
+        if presas.intersection(mudancas['remover']):
+            return 'reconstrucao'
+    return 'nativo'
+
+def criar_indices(conn: sqlite3.Connection, tabela: str, indices: List[Dict]) -> int:
+    """Cria os índices do plano que ainda não existem; retorna quantos foram criados"""
+    criados = 0
+    for indice in indices:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (indice['nome'],)).fetchone():
+            continue
+        colunas = ', '.join(_aspas(col) for col in indice['colunas'])
+        conn.execute(f"CREATE {'UNIQUE ' if indice.get('unico') else ''}INDEX {_aspas(indice['nome'])} "
+                     f"ON {_aspas(tabela)} ({colunas})")
+        criados += 1
+    return criados
+
+def _padrao_colunas(colunas) -> str:
+    """Regex de um nome de coluna no texto SQL: sem aspas (palavra inteira) ou entre aspas duplas"""
+    nomes = sorted(colunas, key=len, reverse=True)
+    return '|'.join(rf'(?<![\w"]){re.escape(col)}(?![\w"])|"{re.escape(col.replace(chr(34), chr(34) * 2))}"' for col in nomes)
+
+def _renomear_no_sql(sql: str, renomear: Dict[str, str]) -> str:
+    """Troca, numa só passada, os nomes antigos das colunas pelos novos num trecho SQL"""
+    if not renomear:
+        return sql
+    def trocar(m):
+        nome = m.group(0)
+        nome = nome[1:-1].replace('""', '"') if nome.startswith('"') else nome
+        return _aspas(renomear[nome])
+    return re.sub(_padrao_colunas(renomear), trocar, sql)
+
+def _usa_colunas(sql: str, colunas) -> bool:
+    return bool(colunas) and re.search(_padrao_colunas(colunas), sql) is not None
+
+def _fim_trecho(texto: str, inicio: int) -> int:
+    """
+    Posição que fecha o trecho aberto em texto[inicio]: literal ou nome entre aspas
+    ('...', "...", `...`, [...]) ou grupo entre parênteses, com aspas dentro dele
+    """
+    abre = texto[inicio]
+    if abre == '[':
+        return texto.index(']', inicio)
+    if abre in '\'"`':
+        fim = texto.index(abre, inicio + 1)
+        while texto.startswith(abre, fim + 1):
+            fim = texto.index(abre, fim + 2)
+        return fim
+    i = inicio + 1
+    while i < len(texto):
+        if texto[i] == ')':
+            return i
+        if texto[i] in '\'"`[(':
+            i = _fim_trecho(texto, i)
+        i += 1
+    raise ValueError("parênteses desbalanceados no CREATE TABLE")
+
+def _definicoes_create(create_sql: str) -> List[str]:
+    """Definições de primeiro nível (colunas e restrições) do texto de um CREATE TABLE"""
+    abre = create_sql.index('(')
+    corpo = create_sql[abre + 1:_fim_trecho(create_sql, abre)]
+    definicoes, inicio, i = [], 0, 0
+    while i < len(corpo):
+        if corpo[i] in '\'"`[(':
+            i = _fim_trecho(corpo, i)
+        elif corpo[i] == ',':
+            definicoes.append(corpo[inicio:i].strip())
+            inicio = i + 1
+        i += 1
+    definicoes.append(corpo[inicio:].strip())
+    return [definicao for definicao in definicoes if definicao]
+
+def _nome_definicao(definicao: str) -> Tuple[str, str]:
+    """Nome da coluna no início de uma definição (sem aspas) e o resto da definição"""
+    if definicao[0] in '"`[':
+        fim = _fim_trecho(definicao, 0)
+        fecha = definicao[fim]
+        nome = definicao[1:fim] if fecha == ']' else definicao[1:fim].replace(fecha * 2, fecha)
+        return nome, definicao[fim + 1:]
+    nome = re.match(r"[^\s(]+", definicao).group(0)
+    return nome, definicao[len(nome):]
+
+def _expressoes(definicao: str, palavra: str) -> List[str]:
+    """Expressões entre parênteses que seguem `palavra` (regex: CHECK, AS) no primeiro nível de uma definição"""
+    padrao = re.compile(rf'\b{palavra}\s*\(', re.IGNORECASE)
+    expressoes, i = [], 0
+    while i < len(definicao):
+        m = padrao.match(definicao, i)
+        if m:
+            i = _fim_trecho(definicao, m.end() - 1)
+            expressoes.append(definicao[m.end():i].strip())
+        elif definicao[i] in '\'"`[(':
+            i = _fim_trecho(definicao, i)
+        i += 1
+    return expressoes
+
+def _restricoes_create(create_sql: str) -> Tuple[Dict[str, str], List[str]]:
+    """Do texto do CREATE: {coluna gerada: expressão} e as expressões CHECK (de coluna e de tabela)"""
+    geradas, checks = {}, []
+    for definicao in _definicoes_create(create_sql):
+        if definicao[0] not in '"`[' and re.match(r'(CONSTRAINT|PRIMARY|UNIQUE|CHECK|FOREIGN)\b', definicao, re.IGNORECASE):
+            checks.extend(_expressoes(definicao, 'CHECK'))
+            continue
+        nome, resto = _nome_definicao(definicao)
+        gerada = _expressoes(resto, r'(GENERATED\s+ALWAYS\s+)?AS')
+        if gerada:
+            geradas[nome] = gerada[0]
+        checks.extend(_expressoes(resto, 'CHECK'))
+    return geradas, checks
+
+def _ddl_reconstruida(conn: sqlite3.Connection, tabela: str, nova: str, mudancas: Dict) -> str:
+    """CREATE TABLE da tabela nova, a partir de PRAGMA table_xinfo / index_list / foreign_key_list"""
+    renomear, remover, tipos = mudancas['renomear'], set(mudancas['remover']), mudancas['tipos']
+    create_sql = conn.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (tabela,)).fetchone()[0] or ''
+    colunas = conn.execute(f"PRAGMA table_xinfo({_aspas(tabela)})").fetchall()
+    chaves = [col for col in sorted(colunas, key=lambda c: c[5]) if col[5]]
+    geradas, checks = _restricoes_create(create_sql)
+
+    definicoes = []
+    for cid, nome, tipo, notnull, padrao, pk, oculta in colunas:
+        if nome in remover:
+            continue
+        tipo = tipos.get(nome, tipo)
+        definicao = f"{_aspas(renomear.get(nome, nome))} {tipo}".rstrip()
+        if oculta in (2, 3):
+            expressao = geradas[nome]
+            if _usa_colunas(expressao, remover):
+                raise ValueError(f"A coluna gerada '{tabela}.{nome}' usa coluna removida; remova-a também")
+            definicao += f" GENERATED ALWAYS AS ({_renomear_no_sql(expressao, renomear)}) {'STORED' if oculta == 3 else 'VIRTUAL'}"
+        if pk and len(chaves) == 1:
+            definicao += " PRIMARY KEY"
+            if 'AUTOINCREMENT' in create_sql.upper():
+                definicao += " AUTOINCREMENT"
+        if notnull:
+            definicao += " NOT NULL"
+        if padrao is not None:
+            definicao += f" DEFAULT {padrao}"
+        definicoes.append(definicao)
+
+    if len(chaves) > 1:
+        definicoes.append(f"PRIMARY KEY ({', '.join(_aspas(renomear.get(c[1], c[1])) for c in chaves)})")
+
+    # Restrições UNIQUE declaradas na tabela (índices automáticos de origem 'u')
+    for _, indice, unico, origem, *_ in conn.execute(f"PRAGMA index_list({_aspas(tabela)})"):
+        if origem == 'u':
+            cols = [c[2] for c in conn.execute(f"PRAGMA index_info({_aspas(indice)})")]
+            if not remover.intersection(cols):
+                definicoes.append(f"UNIQUE ({', '.join(_aspas(renomear.get(c, c)) for c in cols)})")
+
+    chaves_estrangeiras = {}
+    for id_chave, _, destino, de, para, *_ in conn.execute(f"PRAGMA foreign_key_list({_aspas(tabela)})"):
+        chaves_estrangeiras.setdefault((id_chave, destino), []).append((de, para))
+    for (_, destino), pares in chaves_estrangeiras.items():
+        if not remover.intersection(de for de, _ in pares):
+            origem = ', '.join(_aspas(renomear.get(de, de)) for de, _ in pares)
+            alvo = ', '.join(_aspas(para) for _, para in pares if para)
+            definicoes.append(f"FOREIGN KEY ({origem}) REFERENCES {_aspas(destino)}" + (f" ({alvo})" if alvo else ''))
+
+    for check in checks:
+        if _usa_colunas(check, remover):
+            raise ValueError(f"A restrição CHECK ({check}) de '{tabela}' usa coluna removida")
+        definicoes.append(f"CHECK ({_renomear_no_sql(check, renomear)})")
+
+    sem_rowid = ' WITHOUT ROWID' if re.search(r'WITHOUT\s+ROWID', create_sql, re.IGNORECASE) else ''
+    return f"CREATE TABLE {_aspas(nova)} ({', '.join(definicoes)}){sem_rowid}"
+
+def _recriar_indices(conn: sqlite3.Connection, tabela: str, indices: List, mudancas: Dict):
+    """Recria os índices explícitos com os nomes novos das colunas; os que usam colunas removidas são descartados"""
+    renomear, remover = mudancas['renomear'], set(mudancas['remover'])
+    for nome, sql, colunas, unico, parcial in indices:
+        if remover.intersection(col for col, _ in colunas if col):
+            print(f"  ⚠️ Índice {nome} descartado (usa coluna removida)")
+            continue
+        if any(col is None for col, _ in colunas) or parcial:
+            # Índice de expressão ou parcial: renomeia as colunas no texto original
+            conn.execute(_renomear_no_sql(sql, renomear))
+            continue
+        lista = ', '.join(_aspas(renomear.get(col, col)) + (' DESC' if desc else '') for col, desc in colunas)
+        conn.execute(f"CREATE {'UNIQUE ' if unico else ''}INDEX {_aspas(nome)} ON {_aspas(tabela)} ({lista})")
+
+def reconstruir_tabela(conn: sqlite3.Connection, tabela: str, mudancas: Dict, tamanho_lote: int = TAMANHO_LOTE,
+                       progresso: Optional[Callable[[str, int, int], None]] = None):
+    """
+    Aplica todas as mudanças da tabela numa única cópia: cria a tabela nova, copia as linhas
+    em lotes de rowid, troca as tabelas e recria os índices. Não faz commit.
+    """
+    renomear, remover = mudancas['renomear'], set(mudancas['remover'])
+    nova = f"_{tabela}_migracao"
+
+    indices = []
+    for _, nome, unico, origem, parcial in conn.execute(f"PRAGMA index_list({_aspas(tabela)})"):
+        if origem != 'c':
+            continue
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE type='index' AND name=?", (nome,)).fetchone()[0]
+        colunas = [(c[2], c[3]) for c in conn.execute(f"PRAGMA index_xinfo({_aspas(nome)})") if c[5]]
+        indices.append((nome, sql, colunas, unico, parcial))
+
+    conn.execute(f"DROP TABLE IF EXISTS {_aspas(nova)}")
+    conn.execute(_ddl_reconstruida(conn, tabela, nova, mudancas))
+
+    # Colunas geradas (oculta 2 ou 3) são recalculadas pela tabela nova e não entram na cópia
+    antigas = [col[1] for col in conn.execute(f"PRAGMA table_xinfo({_aspas(tabela)})")
+               if col[1] not in remover and col[6] not in (2, 3)]
+    destino = ', '.join(_aspas(renomear.get(col, col)) for col in antigas)
+    origem = ', '.join(_aspas(col) for col in antigas)
+    copiar = f"INSERT INTO {_aspas(nova)} ({destino}) SELECT {origem} FROM {_aspas(tabela)}"
+
+    total = conn.execute(f"SELECT COUNT(*) FROM {_aspas(tabela)}").fetchone()[0]
+    minimo, maximo = (None, None)
+    if not re.search(r'WITHOUT\s+ROWID', conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (tabela,)).fetchone()[0] or '', re.IGNORECASE):
+        minimo, maximo = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {_aspas(tabela)}").fetchone()
+
+    copiadas = 0
+    if minimo is None:
+        copiadas = conn.execute(copiar).rowcount
+    else:
+        for inicio in range(minimo - 1, maximo, tamanho_lote):
+            copiadas += conn.execute(f"{copiar} WHERE rowid > ? AND rowid <= ?", (inicio, inicio + tamanho_lote)).rowcount
+            if progresso:
+                progresso(tabela, copiadas, total)
+
+    conn.execute(f"DROP TABLE {_aspas(tabela)}")
+    conn.execute(f"ALTER TABLE {_aspas(nova)} RENAME TO {_aspas(tabela)}")
+    _recriar_indices(conn, tabela, indices, mudancas)
+
+def _mudancas_nativas(conn: sqlite3.Connection, tabela: str, mudancas: Dict) -> bool:
+    """
+    Tenta aplicar as mudanças com ALTER TABLE (num savepoint). Retorna False, desfazendo
+    o que foi feito, se for preciso reconstruir a tabela.
+    """
+    if mudancas['tipos'] or (mudancas['renomear'] and not RENOMEAR_NATIVO) or (mudancas['remover'] and not REMOVER_NATIVO):
+        return False
+    conn.execute("SAVEPOINT nativo")
+    try:
+        for antigo, novo in mudancas['renomear'].items():
+            conn.execute(f"ALTER TABLE {_aspas(tabela)} RENAME COLUMN {_aspas(antigo)} TO {_aspas(novo)}")
+        for coluna in mudancas['remover']:
+            conn.execute(f"ALTER TABLE {_aspas(tabela)} DROP COLUMN {_aspas(coluna)}")
+    except sqlite3.OperationalError as e:
+        # Ex.: "cannot drop UNIQUE column", "error in index ... after drop column"
+        print(f"  ↪️ {tabela}: ALTER TABLE nativo não permitido ({str(e)}); reconstruindo")
+        conn.execute("ROLLBACK TO nativo")
+        conn.execute("RELEASE nativo")
+        return False
+    conn.execute("RELEASE nativo")
+    return True
+
+def _imprimir_progresso(tabela: str, copiadas: int, total: int):
+    percentual = copiadas / total * 100 if total else 100
+    print(f"  ⏳ {tabela}: {copiadas}/{total} linhas copiadas ({percentual:.0f}%)")
+
+def migrar(db_path: Path, plano: Dict, reconstruir: bool = False, tamanho_lote: int = TAMANHO_LOTE,
+           progresso: Optional[Callable[[str, int, int], None]] = _imprimir_progresso, simular: bool = False,
+           relatorio: Optional[List[Dict]] = None) -> bool:
+    """
+    Aplica um plano de migração (ver docstring do módulo) numa única transação.
+
+    Args:
+        db_path: Caminho para o arquivo SQLite
+        plano: {tabela: {'renomear': {antigo: novo}, 'remover': [colunas], 'tipos': {coluna: tipo}, 'indices': [...]}}
+        reconstruir: Força a reconstrução mesmo quando o ALTER TABLE nativo bastaria
+        progresso: Chamada com (tabela, linhas copiadas, total) a cada lote da reconstrução
+        simular: Só valida o plano e prevê o caminho de cada tabela, sem alterar o banco
+        relatorio: Lista que recebe, por tabela, {'tabela', 'caminho', 'segundos', 'bytes', 'indices'};
+                   'bytes' é o que foi (ou seria) reescrito: a tabela e seus índices, zero num RENAME nativo
+
+    Returns:
+        bool: True se a operação foi bem sucedida
+    """
+    conn = None
+    relatorio = relatorio if relatorio is not None else []
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro" if simular else str(db_path), uri=simular, isolation_level=None)
+        conn.execute("PRAGMA foreign_keys=OFF")
+        plano = validar_plano(conn, plano)
+
+        if simular:
+            for tabela, mudancas in plano.items():
+                caminho = caminho_previsto(conn, tabela, mudancas, reconstruir)
+                reescreve = caminho == 'reconstrucao' or mudancas['remover']
+                relatorio.append({'tabela': tabela, 'caminho': caminho, 'segundos': 0.0,
+                                  'bytes': tamanho_tabela(conn, tabela) if reescreve else 0, 'indices': len(mudancas['indices'])})
+                print(f"  🔍 {tabela}: {caminho}, {mudancas}")
+            return True
+
+        conn.execute("BEGIN IMMEDIATE")
+        for tabela, mudancas in plano.items():
+            inicio = time.perf_counter()
+            tamanho = tamanho_tabela(conn, tabela)
+            if not (mudancas['renomear'] or mudancas['remover'] or mudancas['tipos']):
+                caminho, reescritos = 'nativo', 0
+            elif not reconstruir and _mudancas_nativas(conn, tabela, mudancas):
+                caminho, reescritos = 'nativo', tamanho if mudancas['remover'] else 0
+                print(f"  ⚡ {tabela}: alterada com ALTER TABLE (sem copiar a tabela)")
+            else:
+                reconstruir_tabela(conn, tabela, mudancas, tamanho_lote, progresso)
+                caminho, reescritos = 'reconstrucao', tamanho
+                print(f"  🔁 {tabela}: reconstruída")
+            criados = criar_indices(conn, tabela, mudancas['indices'])
+            relatorio.append({'tabela': tabela, 'caminho': caminho, 'segundos': round(time.perf_counter() - inicio, 3),
+                              'bytes': reescritos, 'indices': criados})
+        conn.execute("COMMIT")
+
+        for tabela, mudancas in plano.items():
+            for antigo, novo in mudancas['renomear'].items():
+                print(f"  {tabela}.{antigo} → {novo}")
+            for coluna in mudancas['remover']:
+                print(f"  {tabela}.{coluna} removida")
+            for coluna, tipo in mudancas['tipos'].items():
+                print(f"  {tabela}.{coluna}: → {tipo}")
+            for indice in mudancas['indices']:
+                print(f"  {tabela}: índice {indice['nome']} ({', '.join(indice['colunas'])})")
+        return True
+
+    except Exception as e:
+        print(f"Erro durante a migração: {str(e)}")
+        if conn and conn.in_transaction:
+            conn.execute("ROLLBACK")
+        return False
+    finally:
+        if conn:
+            conn.close()
+
+def _ler_alteracoes(itens: Optional[List[str]], plano: Dict, operacao: str):
+    """Acrescenta ao plano itens 'tabela.coluna[:valor]' da linha de comando"""
+    for item in itens or []:
+        alvo, _, valor = item.partition(':')
+        tabela, ponto, coluna = alvo.partition('.')
+        if not ponto or not coluna or (operacao != 'remover' and not valor):
+            formato = 'tabela.coluna' if operacao == 'remover' else 'tabela.coluna:valor'
+            raise ValueError(f"Formato inválido: '{item}'. Use {formato}")
+        mudancas = plano.setdefault(tabela.strip(), {})
+        if operacao == 'remover':
+            mudancas.setdefault('remover', []).append(coluna.strip())
+        else:
+            mudancas.setdefault(operacao, {})[coluna.strip()] = valor.strip()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Renomeia, remove e muda o tipo de colunas de várias tabelas SQLite numa única migração',
+        formatter_class=argparse.RawTextHelpFormatter,
+        epilog='Exemplo:\n  python Pipelines/MigrarSchema.py portaltp.db --renomear licitacoes.Numero:numero '
+               '--remover licitacoes.Documento --tipo contratos.Valor:REAL'
+    )
+    parser.add_argument('db_name', help='Nome do banco de dados (na pasta bds)')
+    parser.add_argument('--renomear', nargs='+', help='tabela.coluna:novo_nome')
+    parser.add_argument('--remover', nargs='+', help='tabela.coluna')
+    parser.add_argument('--tipo', nargs='+', help='tabela.coluna:NOVO_TIPO')
+    parser.add_argument('--reconstruir', action='store_true', help='Reconstrói as tabelas mesmo quando o ALTER TABLE bastaria')
+    parser.add_argument('--sim', action='store_true', help='Não pede confirmação')
+
+    args = parser.parse_args()
+
+    try:
+        plano = {}
+        _ler_alteracoes(args.renomear, plano, 'renomear')
+        _ler_alteracoes(args.remover, plano, 'remover')
+        _ler_alteracoes(args.tipo, plano, 'tipos')
+        if not plano:
+            parser.error("nenhuma alteração informada")
+
+        db_path = get_db_path(args.db_name)
+        print(f"\n📁 Banco de dados: {db_path} (SQLite {sqlite3.sqlite_version})")
+        for tabela, mudancas in plano.items():
+            print(f"📊 {tabela}: {mudancas}")
+
+        if not args.sim:
+            confirm = input("\n⚠️ Confirmar? (s/n): ").strip().lower()
+            if confirm != 's':
+                print("\nOperação cancelada")
+                return
+
+        print("\n⚙️ Processando...")
+        if migrar(db_path, plano, args.reconstruir):
+            print("\n🎉 Operação concluída com sucesso!")
+        else:
+            print("\n❌ Falha na operação")
+
+    except Exception as e:
+        print(f"\n❌ Erro: {str(e)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import argparse
+import hashlib
 import sqlite3
 from pathlib import Path
 import pandas as pd
@@ -163,13 +165,236 @@ def unificar_tabelas_sqlite(
         if 'conn_saida' in locals():
             conn_saida.close()
 
+# Linhas copiadas por INSERT ... SELECT (uma transação por lote)
+TAMANHO_LOTE = 50000
+
+# Coluna da saída com o hash das colunas chave (nenhuma coluna das origens pode ter este nome)
+COLUNA_CHAVE = '_chave'
+
+def valor_numerico(valor):
+    """
+    Conversão da coluna valor (função registrada no SQLite), com o mesmo resultado de
+    pd.to_numeric(errors='coerce') da unificação antiga: números viram REAL e o texto
+    que não é um número ('1.234,56', 'R$ 10') vira NULL
+    """
+    if isinstance(valor, (int, float)):
+        numero = float(valor)
+    elif isinstance(valor, str) and '_' not in valor:
+        try:
+            numero = float(valor)
+        except ValueError:
+            return None
+    else:
+        return None
+    return None if numero != numero else numero
+
+def _valor_da_chave(valor):
+    """Representação estável de um valor para o hash da chave (1, 1.0 e '1' não se confundem com NULL)"""
+    if valor is None:
+        return '\x00'
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor)
+
+def hash_chave(*valores):
+    """Hash de 16 bytes das colunas chave de uma linha (função registrada no SQLite)"""
+    texto = '\x1f'.join(_valor_da_chave(valor) for valor in valores)
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=16).digest()
+
+def _colunas_normalizadas(conn, esquema, tabela, mapeamento=None):
+    """
+    Colunas da tabela como (nome na origem, nome na saída, tipo declarado).
+    Os nomes de saída são normalizados (strip + minúsculas) e depois passam pelo mapeamento;
+    repetições (case-insensitive) ficam só com a primeira. A coluna id do extrator é descartada.
+    """
+    mapeamento = {origem.strip().lower(): destino for origem, destino in (mapeamento or {}).items()}
+    colunas = []
+    vistas = set()
+    for col in conn.execute(f'PRAGMA {esquema}.table_info("{tabela}")'):
+        nome = col[1].strip().lower()
+        nome = mapeamento.get(nome, nome)
+        if nome == 'id' or nome in vistas:
+            continue
+        vistas.add(nome)
+        colunas.append((col[1], nome, col[2]))
+    return colunas
+
+def _tabela_real(conn, esquema, nome_tabela):
+    """Nome da tabela no banco anexado, com busca case-insensitive"""
+    tabelas = [nome for (nome,) in conn.execute(f"SELECT name FROM {esquema}.sqlite_master WHERE type='table'")]
+    validas = [t for t in tabelas if t.lower() == nome_tabela.lower()]
+    if not validas:
+        raise ValueError(f"Tabela {nome_tabela} não encontrada. Tabelas disponíveis: {tabelas}")
+    return validas[0]
+
+def unificar_tabelas_attach(
+        caminho_bd1: str,
+        nome_tabela1: str,
+        caminho_bd2: str,
+        nome_tabela2: str,
+        caminho_bd_saida: str,
+        nome_tabela_saida: str,
+        colunas_chave: list = None,
+        mapeamento1: dict = None,
+        mapeamento2: dict = None,
+        substituir: bool = True,
+        tamanho_lote: int = TAMANHO_LOTE
+):
+    """
+    Unifica as tabelas dentro do SQLite, sem carregá-las na memória.
+
+    Os dois bancos são anexados (ATTACH) ao banco de saída e as linhas são copiadas
+    com INSERT ... SELECT em lotes de rowid, uma transação por lote. Cada linha leva o
+    hash das colunas chave numa coluna _chave com índice único, e INSERT OR IGNORE
+    descarta as repetidas: a deduplicação acontece no B-tree do índice, em disco.
+    A memória usada não depende do tamanho das tabelas.
+
+    Diferente de unificar_tabelas_sqlite, as tabelas são empilhadas (UNION das colunas,
+    sem merge pelas colunas em comum) e a coluna id dos extratores é descartada. A coluna
+    valor é convertida como lá (valor_numerico). Uma coluna de origem chamada _chave é recusada.
+
+    Parâmetros:
+        colunas_chave: Colunas (nomes de saída) que identificam uma linha; sem elas, todas as colunas
+        mapeamento1, mapeamento2: {coluna na origem: coluna na saída} de cada tabela (opcional)
+        substituir: Recria a tabela de saída; com False as linhas novas são acrescentadas,
+                    deduplicadas contra as que já estão lá
+        tamanho_lote: Linhas de origem por INSERT ... SELECT
+    """
+    caminho_bd1 = Path(caminho_bd1).absolute()
+    caminho_bd2 = Path(caminho_bd2).absolute()
+    print(f"\nVerificando bancos de dados:")
+    print(f"- BD1: {caminho_bd1} {'EXISTE' if caminho_bd1.exists() else 'NÃO ENCONTRADO'}")
+    print(f"- BD2: {caminho_bd2} {'EXISTE' if caminho_bd2.exists() else 'NÃO ENCONTRADO'}")
+
+    if not caminho_bd1.exists() or not caminho_bd2.exists():
+        raise FileNotFoundError("Um ou mais bancos de dados não foram encontrados")
+
+    conn = sqlite3.connect(caminho_bd_saida, uri=True)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.create_function('hash_chave', -1, hash_chave, deterministic=True)
+        conn.create_function('valor_numerico', 1, valor_numerico, deterministic=True)
+        # Bancos de origem em modo somente leitura
+        conn.execute(f"ATTACH DATABASE ? AS bd1", (f"file:{caminho_bd1}?mode=ro",))
+        conn.execute(f"ATTACH DATABASE ? AS bd2", (f"file:{caminho_bd2}?mode=ro",))
+
+        tabela1 = _tabela_real(conn, 'bd1', nome_tabela1)
+        tabela2 = _tabela_real(conn, 'bd2', nome_tabela2)
+        origens = [('bd1', tabela1, _colunas_normalizadas(conn, 'bd1', tabela1, mapeamento1)),
+                   ('bd2', tabela2, _colunas_normalizadas(conn, 'bd2', tabela2, mapeamento2))]
+
+        # Colunas de saída: as da tabela 1 e depois as exclusivas da tabela 2
+        tipos_saida = {}
+        for _, _, colunas in origens:
+            for _, nome, tipo in colunas:
+                tipos_saida.setdefault(nome, tipo)
+        if COLUNA_CHAVE in tipos_saida:
+            raise ValueError(f"A coluna '{COLUNA_CHAVE}' é reservada para o hash da chave; renomeie-a com --mapa1/--mapa2")
+        if 'valor' in tipos_saida:
+            tipos_saida['valor'] = 'REAL'
+
+        chave = [col.strip().lower() for col in colunas_chave or []]
+        faltantes = [col for col in chave if col not in tipos_saida]
+        if faltantes:
+            print(f"\nAVISO: Colunas chave não encontradas: {faltantes}")
+            print("Removendo duplicatas completas (todas as colunas)")
+            chave = []
+        chave = chave or list(tipos_saida)
+        print(f"\nRemovendo duplicatas pelo hash das colunas: {chave}")
+
+        if substituir:
+            conn.execute(f'DROP TABLE IF EXISTS main."{nome_tabela_saida}"')
+        definicoes = ', '.join(f'"{nome}" {tipo}'.strip() for nome, tipo in tipos_saida.items())
+        conn.execute(f'CREATE TABLE IF NOT EXISTS main."{nome_tabela_saida}" ({definicoes}, {COLUNA_CHAVE} BLOB)')
+        colunas_existentes = {col[1] for col in conn.execute(f'PRAGMA main.table_info("{nome_tabela_saida}")')}
+        for nome, tipo in tipos_saida.items():
+            if nome not in colunas_existentes:
+                conn.execute(f'ALTER TABLE main."{nome_tabela_saida}" ADD COLUMN "{nome}" {tipo}')
+        conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS main."idx_{nome_tabela_saida}_chave" '
+                     f'ON "{nome_tabela_saida}" ({COLUNA_CHAVE})')
+        conn.commit()
+
+        print("\nProcessando unificação...")
+        for esquema, tabela, colunas in origens:
+            origem_de = {nome: origem for origem, nome, _ in colunas}
+            destino = ', '.join(f'"{nome}"' for nome in origem_de)
+            # valor convertida como na unificação antiga (texto que não é número vira NULL)
+            selecao = ', '.join(f'valor_numerico("{origem}")' if nome == 'valor' else f'"{origem}"'
+                                for nome, origem in origem_de.items())
+            # Colunas chave ausentes nesta tabela entram no hash como NULL
+            expressao_chave = ', '.join('NULL' if col not in origem_de else f'valor_numerico("{origem_de[col]}")'
+                                        if col == 'valor' else f'"{origem_de[col]}"' for col in chave)
+            inserir = (f'INSERT OR IGNORE INTO main."{nome_tabela_saida}" ({destino}, {COLUNA_CHAVE}) '
+                       f'SELECT {selecao}, hash_chave({expressao_chave}) FROM {esquema}."{tabela}" '
+                       f'WHERE rowid > ? AND rowid <= ?')
+
+            minimo, maximo = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM {esquema}."{tabela}"').fetchone()
+            lidas = inseridas = 0
+            if minimo is not None:
+                for inicio in range(minimo - 1, maximo, tamanho_lote):
+                    cursor = conn.execute(inserir, (inicio, inicio + tamanho_lote))
+                    inseridas += cursor.rowcount
+                    conn.commit()
+                lidas = conn.execute(f'SELECT COUNT(*) FROM {esquema}."{tabela}"').fetchone()[0]
+            print(f"- {esquema}.{tabela}: {lidas} registros lidos, {inseridas} inseridos, {lidas - inseridas} duplicados")
+
+        total = conn.execute(f'SELECT COUNT(*) FROM main."{nome_tabela_saida}"').fetchone()[0]
+        if 'valor' in tipos_saida:
+            nulos = conn.execute(f'SELECT COUNT(*) FROM main."{nome_tabela_saida}" WHERE valor IS NULL').fetchone()[0]
+            if nulos:
+                print(f"\nAVISO: {nulos} valores não numéricos foram convertidos para NULL na coluna 'valor'")
+        print(f"\nUnificação concluída com sucesso!")
+        print(f"Tabela criada em: {Path(caminho_bd_saida).absolute()}")
+        print(f"Total de registros: {total}")
+        print(f"Colunas: {', '.join(tipos_saida)}")
+
+    except Exception as e:
+        print(f"\nERRO CRÍTICO: {str(e)}")
+        raise
+    finally:
+        conn.close()
+
+def _ler_mapeamento(pares):
+    """['origem:destino', ...] -> {origem: destino}"""
+    mapeamento = {}
+    for par in pares or []:
+        if ':' not in par:
+            raise ValueError(f"Formato inválido: '{par}'. Use coluna_origem:coluna_saida")
+        origem, destino = par.split(':', 1)
+        mapeamento[origem] = destino
+    return mapeamento
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Unifica tabelas de dois bancos SQLite em uma nova tabela',
+        formatter_class=argparse.RawTextHelpFormatter,
+        epilog='Exemplo:\n  python Pipelines/Unir_bds.py bds/portaltp.db bensimoveis bds/tectrilha.db bensImoveis '
+               'bds/bensImoveis.db bensImoveis'
+    )
+    parser.add_argument('bd1', help='Primeiro banco de dados')
+    parser.add_argument('tabela1', help='Tabela no primeiro banco')
+    parser.add_argument('bd2', help='Segundo banco de dados')
+    parser.add_argument('tabela2', help='Tabela no segundo banco')
+    parser.add_argument('bd_saida', help='Banco de dados de saída')
+    parser.add_argument('tabela_saida', help='Tabela de saída')
+    parser.add_argument('--chave', nargs='+', help='Colunas chave para remover duplicatas (padrão: todas)')
+    parser.add_argument('--mapa1', nargs='+', help='Renomeações da tabela 1 no formato origem:saida')
+    parser.add_argument('--mapa2', nargs='+', help='Renomeações da tabela 2 no formato origem:saida')
+    parser.add_argument('--acrescentar', action='store_true', help='Acrescenta à tabela de saída em vez de recriá-la')
+    parser.add_argument('--pandas', action='store_true',
+                        help='Usa a unificação antiga em memória (merge pelas colunas em comum)')
+
+    args = parser.parse_args()
+
+    if args.pandas:
+        unificar_tabelas_sqlite(args.bd1, args.tabela1, args.bd2, args.tabela2, args.bd_saida, args.tabela_saida,
+                                colunas_chave=args.chave or [])
+        return
+
+    unificar_tabelas_attach(args.bd1, args.tabela1, args.bd2, args.tabela2, args.bd_saida, args.tabela_saida,
+                            colunas_chave=args.chave, mapeamento1=_ler_mapeamento(args.mapa1),
+                            mapeamento2=_ler_mapeamento(args.mapa2), substituir=not args.acrescentar)
+
 if __name__ == "__main__":
-    unificar_tabelas_sqlite(
-        caminho_bd1="bds/portaltp.db",
-        nome_tabela1="bensimoveis",
-        caminho_bd2="bds/tectrilha.db",
-        nome_tabela2="bensImoveis",
-        caminho_bd_saida="bds/bensImoveis.db",
-        nome_tabela_saida="bensImoveis",
-        colunas_chave=[]
-    )
\ No newline at end of file
+    main()
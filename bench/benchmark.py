@@ -0,0 +1,254 @@
+"""
+Benchmark dos extratores contra o servidor simulado (bench/portal_mock.py).
+
+Para cada extrator sobe um processo com os hosts simulados, gera um prefeituras.csv
+temporário apontando para eles, roda a extração completa num banco temporário e
+calcula as métricas a partir do ledger (_ledger): requisições/s, linhas/s, MB/s e
+latência p50/p99 por unidade, além das conexões HTTP novas e reutilizadas.
+
+Exemplos:
+    python bench/benchmark.py
+    python bench/benchmark.py --extratores portaltp --linhas 2000 --latencia 0.1 --streaming
+    python bench/benchmark.py --saida bench/baseline.json
+    python bench/benchmark.py --comparar bench/baseline.json
+    python bench/benchmark.py --reconstruir
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from portal_mock import iniciar_host, url_host_morto, EMPRESAS
+from rate_limiter import RateLimiter
+from extrator import run_extraction, reconstruir
+from cache_respostas import CacheRespostas
+from conexoes import CONTADORES
+from metricas import METRICAS
+from circuit_breaker import CircuitBreaker
+
+# Nome da empresa na coluna 'empresa' de prefeituras.csv
+NOME_EMPRESA = {'portaltp': 'portaltp', 'tectrilha': 'tectrilha', 'agape': 'Agape'}
+
+ANO = 2024
+
+def _servir(empresa, hosts, config, fila):
+    """Processo filho: sobe os hosts simulados e devolve as URLs pela fila"""
+    urls = [iniciar_host(empresa, porta=0, **config)[1] for _ in range(hosts)]
+    fila.put(urls)
+    while True:
+        time.sleep(3600)
+
+def iniciar_mock(empresa, args):
+    """Sobe os hosts num processo separado, para não disputar o GIL com o extrator medido"""
+    config = {'linhas': args.linhas, 'latencia': args.latencia, 'taxa_erro': args.taxa_erro, 'taxa_vazio': args.taxa_vazio,
+              'etag': args.etag}
+    fila = multiprocessing.Queue()
+    processo = multiprocessing.Process(target=_servir, args=(empresa, args.hosts, config, fila), daemon=True)
+    processo.start()
+    urls = fila.get(timeout=30)
+    urls += [url_host_morto(empresa) for _ in range(args.hosts_mortos)]
+    return processo, urls
+
+def preparar_arquivos(empresa, urls, pasta, args):
+    """Gera prefeituras.csv e o arquivo de endpoints/assuntos (primeiras entradas dos arquivos reais)"""
+    prefeituras_file = os.path.join(pasta, 'prefeituras.csv')
+    with open(prefeituras_file, 'w', encoding='utf-8') as f:
+        f.write("id,prefeitura,municipio,url,empresa,unidadegestora\n")
+        for i, url in enumerate(urls, start=1):
+            unidade_gestora = 1 if empresa == 'tectrilha' else ''
+            f.write(f"{i},Prefeitura Municipal de Bench {i},bench {i},{url},{NOME_EMPRESA[empresa]},{unidade_gestora}\n")
+
+    if empresa == 'tectrilha':
+        origem, destino, cabecalho = 'assuntos_tectrilha.csv', 'assuntos.csv', 1
+    else:
+        origem, destino, cabecalho = f'endpoints_{empresa}.txt', 'endpoints.txt', 0
+    with open(os.path.join(RAIZ, 'data', origem), encoding='utf-8') as f:
+        linhas = [linha for linha in f if linha.strip()][:cabecalho + args.endpoints]
+    endpoints_file = os.path.join(pasta, destino)
+    with open(endpoints_file, 'w', encoding='utf-8') as f:
+        f.writelines(linhas)
+    return prefeituras_file, endpoints_file
+
+def carregar_extrator(empresa):
+    if empresa == 'agape':
+        # O nome do arquivo tem '&', então não dá para usar import normal
+        caminho = os.path.join(RAIZ, 'src', 'agape&alphatec.py')
+        spec = importlib.util.spec_from_file_location('agape_alphatec', caminho)
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        return modulo
+    return importlib.import_module(empresa)
+
+def executar_extrator(empresa, endpoints_file, prefeituras_file, db_file, args, atualizar=False, cache=None):
+    adaptador = carregar_extrator(empresa).ADAPTADOR
+    rate_limiter = RateLimiter(taxa=args.taxa, rajada=max(1, int(args.taxa)), taxa_max=args.taxa)
+    circuit_breaker = CircuitBreaker()
+    opcoes = {'rate_limiter': rate_limiter, 'circuit_breaker': circuit_breaker, 'streaming': args.streaming, 'atualizar': atualizar,
+              'cache': cache}
+
+    if adaptador.anual:
+        run_extraction(adaptador, ANO - args.periodos + 1, ANO, endpoints_file, prefeituras_file, db_file, **opcoes)
+    else:
+        run_extraction(adaptador, (ANO, 1), (ANO, args.periodos), endpoints_file, prefeituras_file, db_file, **opcoes)
+
+def percentil(valores, p):
+    """Percentil pelo método do posto mais próximo"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+def metricas_do_ledger(db_file, tempo_total):
+    conn = sqlite3.connect(db_file)
+    requisicoes, linhas, total_bytes = conn.execute(
+        "SELECT COALESCE(SUM(tentativas), 0), COALESCE(SUM(linhas), 0), COALESCE(SUM(bytes), 0) FROM _ledger"
+    ).fetchone()
+    por_status = dict(conn.execute("SELECT status, COUNT(*) FROM _ledger GROUP BY status").fetchall())
+    duracoes = [row[0] for row in conn.execute("SELECT duracao FROM _ledger WHERE duracao IS NOT NULL")]
+    conn.close()
+    return {
+        'tempo_s': round(tempo_total, 3),
+        'unidades': por_status,
+        'requisicoes': requisicoes,
+        'linhas': linhas,
+        'mb': round(total_bytes / 1024 / 1024, 3),
+        'requisicoes_s': round(requisicoes / tempo_total, 2),
+        'linhas_s': round(linhas / tempo_total, 1),
+        'mb_s': round(total_bytes / 1024 / 1024 / tempo_total, 3),
+        'p50_ms': round(percentil(duracoes, 50) * 1000, 1) if duracoes else None,
+        'p99_ms': round(percentil(duracoes, 99) * 1000, 1) if duracoes else None,
+    }
+
+def zerar_metricas(db_file):
+    """Zera os contadores do ledger, mantendo status e validadores"""
+    conn = sqlite3.connect(db_file)
+    conn.execute("UPDATE _ledger SET tentativas = 0, linhas = 0, bytes = 0, duracao = NULL")
+    conn.commit()
+    conn.close()
+
+def etapas_medidas():
+    """Segundos por etapa da parte medida (somados em todas as threads)"""
+    return {etapa: total['segundos'] for etapa, total in METRICAS.relatorio()['por_etapa'].items()}
+
+def medir(empresa, args):
+    pasta = tempfile.mkdtemp(prefix=f'bench_{empresa}_')
+    processo, urls = iniciar_mock(empresa, args)
+    try:
+        prefeituras_file, endpoints_file = preparar_arquivos(empresa, urls, pasta, args)
+        db_file = os.path.join(pasta, f'{empresa}.db')
+
+        saida = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        if args.reconstruir:
+            # A extração (não medida) enche o cache; mede-se a reconstrução offline
+            cache = CacheRespostas(os.path.join(pasta, 'cache'))
+            with saida:
+                executar_extrator(empresa, endpoints_file, prefeituras_file, db_file, args, cache=cache)
+            METRICAS.iniciar(empresa)
+            inicio = time.perf_counter()
+            with saida:
+                reconstruir(carregar_extrator(empresa).ADAPTADOR, db_file, cache, streaming=args.streaming)
+            metricas = metricas_do_ledger(db_file, time.perf_counter() - inicio)
+            metricas['etapas'] = etapas_medidas()
+            # Nenhuma requisição na reconstrução: linhas e MB são os do conteúdo relido do cache
+            metricas.update({'requisicoes': 0, 'requisicoes_s': 0, 'p50_ms': None, 'p99_ms': None})
+            return metricas
+        if args.atualizar:
+            # A primeira passada (não medida) extrai tudo; mede-se a revalidação
+            with saida:
+                executar_extrator(empresa, endpoints_file, prefeituras_file, db_file, args)
+            zerar_metricas(db_file)
+        METRICAS.iniciar(empresa)
+        inicio = time.perf_counter()
+        with saida:
+            executar_extrator(empresa, endpoints_file, prefeituras_file, db_file, args, atualizar=args.atualizar)
+        tempo_total = time.perf_counter() - inicio
+        metricas = metricas_do_ledger(db_file, tempo_total)
+        metricas['http'] = CONTADORES.resumo()
+        metricas['etapas'] = etapas_medidas()
+        return metricas
+    finally:
+        processo.terminate()
+        processo.join()
+        if not args.manter:
+            shutil.rmtree(pasta, ignore_errors=True)
+        else:
+            print(f"📁 Arquivos de {empresa} mantidos em {pasta}")
+
+def imprimir(resultados, baseline=None):
+    colunas = ('tempo_s', 'requisicoes_s', 'linhas_s', 'mb_s', 'p50_ms', 'p99_ms')
+    print(f"\n{'extrator':<10}" + ''.join(f"{col:>15}" for col in colunas))
+    for empresa, metricas in resultados.items():
+        print(f"{empresa:<10}" + ''.join(f"{str(metricas[col]):>15}" for col in colunas))
+        anterior = (baseline or {}).get('resultados', {}).get(empresa)
+        if anterior:
+            variacoes = []
+            for col in colunas:
+                if metricas[col] is None or not anterior.get(col):
+                    variacoes.append('-')
+                else:
+                    variacoes.append(f"{(metricas[col] - anterior[col]) / anterior[col] * 100:+.1f}%")
+            print(f"{'  vs base':<10}" + ''.join(f"{v:>15}" for v in variacoes))
+        print(f"{'':<10}unidades: {metricas['unidades']}  linhas: {metricas['linhas']}  MB: {metricas['mb']}")
+        http = metricas.get('http')
+        if http:
+            print(f"{'':<10}conexões: {http['conexoes_novas']} novas, {http['conexoes_reutilizadas']} reutilizadas "
+                  f"em {http['requisicoes']} requisições")
+        etapas = metricas.get('etapas')
+        if etapas:
+            print(f"{'':<10}etapas: " + ', '.join(f"{etapa} {segundos:.2f}s" for etapa, segundos in etapas.items()))
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos extratores contra portais simulados')
+    parser.add_argument('--extratores', nargs='+', choices=EMPRESAS, default=list(EMPRESAS))
+    parser.add_argument('--hosts', type=int, default=4, help='Hosts (prefeituras) simulados por extrator')
+    parser.add_argument('--hosts-mortos', type=int, default=0, help='Hosts adicionais que recusam conexão')
+    parser.add_argument('--endpoints', type=int, default=3, help='Endpoints/assuntos usados de cada arquivo em data/')
+    parser.add_argument('--periodos', type=int, default=3, help='Meses (portaltp/agape) ou anos (tectrilha)')
+    parser.add_argument('--linhas', type=int, default=200, help='Registros por resposta')
+    parser.add_argument('--latencia', type=float, default=0.02, help='Latência do servidor por requisição (s)')
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração de respostas 503')
+    parser.add_argument('--taxa-vazio', type=float, default=0.0, help='Fração de respostas vazias')
+    parser.add_argument('--taxa', type=float, default=50.0, help='Requisições/s por host no rate limiter')
+    parser.add_argument('--streaming', action='store_true', help='Usa a leitura incremental (portaltp/tectrilha)')
+    parser.add_argument('--etag', action='store_true', help='Servidor envia ETag e responde 304 a requisições condicionais')
+    parser.add_argument('--atualizar', action='store_true', help='Mede uma segunda passada em modo atualizar (revalidação)')
+    parser.add_argument('--reconstruir', action='store_true', help='Mede a reconstrução das tabelas a partir do cache de respostas')
+    parser.add_argument('--saida', help='Grava os resultados em JSON (ex.: baseline)')
+    parser.add_argument('--comparar', help='JSON de um benchmark anterior para comparação')
+    parser.add_argument('--manter', action='store_true', help='Não apaga os bancos e arquivos temporários')
+    parser.add_argument('--verbose', action='store_true', help='Mostra a saída dos extratores')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    resultados = {}
+    for empresa in args.extratores:
+        print(f"⏱️ Medindo {empresa}...")
+        resultados[empresa] = medir(empresa, args)
+
+    imprimir(resultados, baseline)
+
+    if args.saida:
+        configuracao = {k: v for k, v in vars(args).items() if k not in ('saida', 'comparar', 'manter', 'verbose')}
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({'configuracao': configuracao, 'resultados': resultados}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados salvos em {args.saida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Servidor HTTP local que imita as APIs dos portais de transparência.
+
+Cada "host" é um servidor numa porta própria (assim o agrupamento por host dos
+extratores funciona como em produção) e responde no formato de uma empresa:
+
+    portaltp:  /api/<Area>/Get<X>?ano=&mes=                 -> array JSON plano (UTF-8)
+    tectrilha: /api/<assunto>?unidadeGestoraId=&exercicio=  -> array JSON plano (UTF-8)
+    agape:     /transparencia/api/<endpoint>?ano=&mes=      -> array JSON aninhado (UTF-8 com BOM)
+
+Com --etag as respostas levam ETag e uma requisição com If-None-Match igual recebe 304.
+
+Uso isolado (para apontar os extratores manualmente):
+    python bench/portal_mock.py --empresa portaltp --hosts 3 --linhas 500 --latencia 0.05
+"""
+import argparse
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+EMPRESAS = ('portaltp', 'tectrilha', 'agape')
+
+# Marcador trocado pelo caminho da requisição, para que cada resposta tenha conteúdo próprio
+_MARCADOR = '@@CHAVE@@'
+
+# Caminho base da API de cada empresa, como aparece em data/prefeituras.csv
+CAMINHO_BASE = {
+    'portaltp': '/api/',
+    'tectrilha': '/api/',
+    'agape': '/transparencia/api/',
+}
+
+def gerar_registros(empresa, linhas, chave):
+    """Registros sintéticos com tipos variados; `chave` entra na descrição de cada registro"""
+    semente = random.Random(empresa)
+    registros = []
+    for i in range(linhas):
+        registro = {
+            'Numero': i,
+            'Valor': round(semente.uniform(0, 100000), 2),
+            'Data': f"2024-{semente.randint(1, 12):02d}-{semente.randint(1, 28):02d}",
+            'Descricao': f"Registro {i} de {chave}",
+            'Favorecido': f"FORNECEDOR {semente.randint(1, 5000)} LTDA",
+            'Documento': f"{semente.randint(0, 99999999999999):014d}",
+        }
+        if empresa == 'agape':
+            registro['Itens'] = [{'item': j, 'quantidade': semente.randint(1, 50)} for j in range(2)]
+            registro['Orgao'] = {'codigo': semente.randint(1, 30), 'nome': 'SECRETARIA MUNICIPAL'}
+        registros.append(registro)
+    return registros
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Preenchidos pela subclasse criada em iniciar_host
+    empresa = None
+    modelo = ''
+    latencia = 0.0
+    taxa_erro = 0.0
+    taxa_vazio = 0.0
+    etag = False
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        caminho = urlparse(self.path)
+        if not caminho.path.startswith(CAMINHO_BASE[self.empresa]):
+            self._responder(404, b'')
+            return
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self.taxa_erro and random.random() < self.taxa_erro:
+            self._responder(503, b'')
+            return
+
+        # O conteúdo de cada caminho não muda durante a vida do servidor
+        etag = f'"{hashlib.md5(self.path.encode()).hexdigest()}"' if self.etag else None
+        if etag and self.headers.get('If-None-Match') == etag:
+            self._responder(304, b'', etag)
+            return
+
+        if self.taxa_vazio and random.random() < self.taxa_vazio:
+            corpo = b''
+        else:
+            # O JSON é serializado uma vez por host; aqui só se troca o marcador
+            texto = self.modelo.replace(_MARCADOR, json.dumps(self.path)[1:-1])
+            corpo = texto.encode('utf-8-sig' if self.empresa == 'agape' else 'utf-8')
+        self._responder(200, corpo, etag)
+
+    def _responder(self, status, corpo, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(corpo)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(corpo)
+
+def iniciar_host(empresa, linhas=100, latencia=0.0, taxa_erro=0.0, taxa_vazio=0.0, porta=0, etag=False):
+    """
+    Sobe um host simulado numa thread.
+
+    Returns:
+        tuple: (servidor, URL base no formato de data/prefeituras.csv)
+    """
+    modelo = json.dumps(gerar_registros(empresa, linhas, _MARCADOR), ensure_ascii=False)
+    handler = type(f'Handler_{empresa}', (_Handler,), {
+        'empresa': empresa, 'modelo': modelo, 'latencia': latencia,
+        'taxa_erro': taxa_erro, 'taxa_vazio': taxa_vazio, 'etag': etag,
+    })
+    servidor = ThreadingHTTPServer(('127.0.0.1', porta), handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name=f'mock-{empresa}', daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}{CAMINHO_BASE[empresa]}"
+
+def url_host_morto(empresa):
+    """URL de um host que recusa conexões (porta livre sem ninguém escutando)"""
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        porta = s.getsockname()[1]
+    return f"http://127.0.0.1:{porta}{CAMINHO_BASE[empresa]}"
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor local que imita os portais de transparência')
+    parser.add_argument('--empresa', choices=EMPRESAS, default='portaltp')
+    parser.add_argument('--hosts', type=int, default=1, help='Quantidade de hosts (portas)')
+    parser.add_argument('--porta', type=int, default=8800, help='Porta do primeiro host')
+    parser.add_argument('--linhas', type=int, default=100, help='Registros por resposta')
+    parser.add_argument('--latencia', type=float, default=0.0, help='Segundos de espera por requisição')
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help='Fração de respostas 503')
+    parser.add_argument('--taxa-vazio', type=float, default=0.0, help='Fração de respostas com corpo vazio')
+    parser.add_argument('--etag', action='store_true', help='Envia ETag e responde 304 a requisições condicionais')
+    args = parser.parse_args()
+
+    for i in range(args.hosts):
+        _, url = iniciar_host(args.empresa, args.linhas, args.latencia, args.taxa_erro, args.taxa_vazio, args.porta + i, args.etag)
+        print(f"🌐 {args.empresa}: {url}")
+    print("Ctrl+C para encerrar")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,144 +1,159 @@
-"""Welcome to Julius!
-
-This is a simple code created to extract data from all City Transparency Portals of the state of Espírito Santo, Brazil.
-Every portal has your own API, but they have similar patterns (depends on the company that create them).
-We catalog them in 4 diferent patterns to extract data in a efficient way.
-
-You have 2 ways to execute this code. Using threads or not.
-If you choose use threading you can select how API methods (data clusters) u want extract.
-A full extract consumes 4gb of you hard disk.
-
-###############################################################
-
-Bem-vindo à Julius!
-
-Este é um código simples criado para extrair dados de todos os Portais de Transparência da Cidade do Estado do Espírito Santo, Brasil.
-Cada portal tem sua própria API, mas têm padrões semelhantes (depende da empresa que os cria).
-Nós os catalogamos em 4 padrões diferentes para extrair dados de uma maneira eficiente.
-
-Você tem 2 maneiras de executar este código. Usando ou não threads.
-Se você escolher usar threading você pode selecionar como os métodos API (clusters de dados) você quer extrair.
-Um extrato completo consome 4gb de seu disco rígido.
-
-Todos comentários estão em inglês pq a ideia é esse projeto também ser uma ferramenta de aprendizado e prática
-
-Insira a API da sua cidade e colabore para unificar as fontes de dados públicos no Brasil"""
-
-"""All starts here"""
-
-
-import scr.tectrilha as tectrilha
-import scr.agape as agape
-import sqlite3
-import scr.portaltp as portaltp
-
-
-
-def main():
-#    empresa_escolhida = str(input('Escolha qual empresa você quer rodar: \n 0: Todas \n 1: Tectrilha \n 2: Ágape \n 3: Portaltp \n '))
-#    funcao_escolhida = str(input('Escolha o que você quer fazer: \n 1: Rodar todo o script (lê apenas urls que não foram lidas ainda) \n 2: Rodar apenas as leituras com erro \n'))
-
-    empresa_escolhida = '0'
-    funcao_escolhida = '1'
-
-    if(empresa_escolhida=='1'):
-        #Conexão com o banco tectrilha
-        conn_tectrilha=sqlite3.connect('output/tectrilha.db')
-        type(conn_tectrilha)
-        cur_tectrilha = conn_tectrilha.cursor()
-        type(cur_tectrilha)
-        print('Tectrilha Connected!')
-        if(funcao_escolhida=='1'):
-            tectrilha.readData_tectrilha_Total(conn_tectrilha)
-        if(funcao_escolhida=='2'):
-            tectrilha.readData_Tectrilha_ComErro(conn_tectrilha)
-        conn_tectrilha.close()
-
-    if(empresa_escolhida=='2'):
-        #Conexão com o banco Agape
-        conn_agape=sqlite3.connect('output/agape.db')
-        type(conn_agape)
-        cur_agape = conn_agape.cursor()
-        type(cur_agape)
-        print('Agape Connected!')
-        if(funcao_escolhida=='1'):
-            agape.readData_Agape_Total(conn_agape, cur_agape)
-        if(funcao_escolhida=='2'):
-            agape.readData_Agape_ComErro(conn_agape,cur_agape)
-        conn_agape.close()
-
-    if(empresa_escolhida=='3'):
-        #Conexão com o banco portaltp
-        conn_portaltp=sqlite3.connect('output/portaltp.db')
-        type(conn_portaltp)
-        cur_portaltp = conn_portaltp.cursor()
-        type(cur_portaltp)
-        print('Portaltp Connected!')
-        if(funcao_escolhida=='1'):
-            portaltp.readData_portaltp_Total(conn_portaltp)   
-        if(funcao_escolhida=='2'):
-            portaltp.readData_Portaltp_ComErro(conn_portaltp)
-        conn_portaltp.close()
-
-    if(empresa_escolhida=='0'):
-        if(funcao_escolhida=='1'):
-            #Conexão com o banco Agape
-            print('empresa e funcao escolhidas')
-            conn_agape=sqlite3.connect('output/agape.db')
-            type(conn_agape)
-            cur_agape = conn_agape.cursor()
-            type(cur_agape)
-            print('Agape Connected!')
-            agape.readData_Agape_Total(conn_agape,cur_agape)
-            conn_agape.close()
-
-            #Conexão com o banco tectrilha
-            conn_tectrilha=sqlite3.connect('output/tectrilha.db')
-            type(conn_tectrilha)
-            cur = conn_tectrilha.cursor()
-            type(cur)
-            print('Tectrilha Connected!')
-            tectrilha.readData_tectrilha_Total(conn_tectrilha)
-            conn_tectrilha.close()
-
-            #Conexão com o banco portaltp
-            conn_portaltp=sqlite3.connect('output/portaltp.db')
-            type(conn_portaltp)
-            cur = conn_portaltp.cursor()
-            type(cur)
-            print('Portaltp Connected!')
-            portaltp.readData_portaltp_Total(conn_portaltp)
-            conn_portaltp.close()
-            
-        if(funcao_escolhida=='2'):
-            #Conexão com o banco Agape
-            conn_agape=sqlite3.connect('output/agape.db')
-            type(conn_agape)
-            cur_agape = conn_agape.cursor()
-            type(cur_agape)
-            print('Agape Connected!')
-            agape.readData_Agape_ComErro(conn_agape,cur_agape)
-            conn_agape.close()
-
-            #Conexão com o banco tectrilha
-            conn_tectrilha=sqlite3.connect('output/tectrilha.db')
-            type(conn_tectrilha)
-            cur = conn_tectrilha.cursor()
-            type(cur)
-            print('Tectrilha Connected!')
-            tectrilha.readData_Tectrilha_ComErro(conn_tectrilha)
-            conn_tectrilha.close()
-
-            #Conexão com o banco portaltp
-            conn_portaltp=sqlite3.connect('output/portaltp.db')
-            type(conn_portaltp)
-            cur = conn_portaltp.cursor()
-            type(cur)
-            print('Portaltp Connected!')
-            portaltp.readData_Portaltp_ComErro(conn_portaltp)
-            conn_portaltp.close()
-            
-  
-
-if __name__ == "__main__":
-    main()
+"""Welcome to Julius!
+
+This is a simple code created to extract data from all City Transparency Portals of the state of Espírito Santo, Brazil.
+Every portal has your own API, but they have similar patterns (depends on the company that create them).
+We catalog them in 4 diferent patterns to extract data in a efficient way.
+
+You have 2 ways to execute this code. Using threads or not.
+If you choose use threading you can select how API methods (data clusters) u want extract.
+A full extract consumes 4gb of you hard disk.
+
+###############################################################
+
+Bem-vindo à Julius!
+
+Este é um código simples criado para extrair dados de todos os Portais de Transparência da Cidade do Estado do Espírito Santo, Brasil.
+Cada portal tem sua própria API, mas têm padrões semelhantes (depende da empresa que os cria).
+Nós os catalogamos em 4 padrões diferentes para extrair dados de uma maneira eficiente.
+
+Você tem 2 maneiras de executar este código. Usando ou não threads.
+Se você escolher usar threading você pode selecionar como os métodos API (clusters de dados) você quer extrair.
+Um extrato completo consome 4gb de seu disco rígido.
+
+Todos comentários estão em inglês pq a ideia é esse projeto também ser uma ferramenta de aprendizado e prática
+
+Insira a API da sua cidade e colabore para unificar as fontes de dados públicos no Brasil"""
+
+"""All starts here"""
+
+import argparse
+import importlib
+import importlib.util
+import os
+import sys
+from datetime import datetime
+from multiprocessing import Process
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+sys.path.insert(0, SRC_DIR)
+
+import extrator
+from condicional import periodo_recente
+
+# Empresa -> arquivo do adaptador em src/
+EXTRATORES = {
+    'portaltp': 'portaltp.py',
+    'tectrilha': 'tectrilha.py',
+    'agape': 'agape&alphatec.py',
+}
+MODOS = extrator.MODOS
+
+EXEMPLOS = """exemplos:
+  python main.py --modo incremental
+  python main.py --empresas portaltp --modo completo --inicio 01/2024 --fim 06/2024 --workers 8
+  python main.py --empresas tectrilha --modo completo --inicio 2023 --fim 2024 --endpoints contratos
+  python main.py --empresas portaltp agape --modo completo --inicio 2024 --municipios "afonso claudio" vitória
+  python main.py --modo falhas
+  python main.py --modo falhas --tipos-erro ReadTimeout ConnectionError --ignorar-espera
+  python main.py --modo atualizar --ultimos 3
+  python main.py --empresas agape --modo reconstruir --endpoints despesas
+  python main.py --empresas portaltp --modo atualizar --perfil
+"""
+
+def carregar_extrator(empresa):
+    arquivo = EXTRATORES[empresa]
+    if '&' in arquivo:
+        # O nome do arquivo tem '&', então não dá para usar import normal
+        spec = importlib.util.spec_from_file_location(empresa, os.path.join(SRC_DIR, arquivo))
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        return modulo
+    return importlib.import_module(arquivo[:-3])
+
+def ler_data(texto, final=False):
+    """Converte 'MM/AAAA' em (ano, mes). Só 'AAAA' vale janeiro, ou dezembro se for a data final"""
+    partes = texto.strip().split('/')
+    try:
+        if len(partes) == 1:
+            return int(partes[0]), 12 if final else 1
+        mes, ano = int(partes[0]), int(partes[1])
+    except (ValueError, IndexError):
+        raise argparse.ArgumentTypeError(f"data inválida: {texto} (use MM/AAAA ou AAAA)")
+    if not 1 <= mes <= 12:
+        raise argparse.ArgumentTypeError(f"mês inválido: {texto}")
+    return ano, mes
+
+def executar_empresa(empresa, args):
+    """Roda o extrator de uma empresa no modo pedido. Retorna True se a execução aconteceu"""
+    adaptador = carregar_extrator(empresa).ADAPTADOR
+    periodo = None
+    if args.modo in ('completo', 'atualizar'):
+        # Adaptadores anuais (tectrilha) trabalham com exercícios, os demais com meses
+        periodo = (args.inicio[0], args.fim[0]) if adaptador.anual else (args.inicio, args.fim)
+
+    print(f"\n🚀 {empresa}: modo {args.modo}")
+    return extrator.executar(adaptador, args.modo, periodo, args.endpoints, args.municipios, args.workers, args.streaming,
+                             args.tipos_erro, args.ignorar_espera, not args.sem_cache, args.cache_mb, args.perfil)
+
+def _processo_empresa(empresa, args):
+    sys.exit(0 if executar_empresa(empresa, args) else 1)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Extrai os dados dos portais de transparência dos municípios do ES',
+        epilog=EXEMPLOS, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--empresas', nargs='+', choices=list(EXTRATORES), default=list(EXTRATORES),
+                        help='Extratores a rodar (padrão: todos)')
+    parser.add_argument('--modo', choices=MODOS, default='incremental',
+                        help='completo: período informado; falhas: unidades com erro no ledger; incremental: desde a última execução; '
+                             'atualizar: revalida o período com requisições condicionais; '
+                             'reconstruir: refaz as tabelas a partir do cache de respostas, sem baixar nada')
+    parser.add_argument('--inicio', help='Início do período no modo completo (MM/AAAA ou AAAA)')
+    parser.add_argument('--fim', help='Fim do período no modo completo (padrão: mês atual)')
+    parser.add_argument('--ultimos', type=int, default=3, help='Meses revalidados no modo atualizar sem --inicio (padrão: 3)')
+    parser.add_argument('--endpoints', nargs='+', help='Só estes endpoints/assuntos (ex.: Compras/GetLicitacoes, licitacoes, contratos)')
+    parser.add_argument('--municipios', nargs='+', help='Só estes municípios (como na coluna municipio de prefeituras.csv)')
+    parser.add_argument('--workers', type=int, help='Threads de rede por extrator (padrão: uma por host)')
+    parser.add_argument('--streaming', action='store_true', help='Lê e grava as respostas grandes em lotes')
+    parser.add_argument('--tipos-erro', nargs='+', help='No modo falhas, só estes tipos de erro (ex.: ReadTimeout HTTPError CircuitoAberto)')
+    parser.add_argument('--ignorar-espera', action='store_true', help='No modo falhas, tenta já as unidades ainda em espera')
+    parser.add_argument('--sem-cache', action='store_true', help='Não guarda as respostas baixadas no cache local (cache/)')
+    parser.add_argument('--cache-mb', type=int, default=extrator.LIMITE_MB,
+                        help=f'Tamanho máximo do cache de cada empresa em MB (padrão: {extrator.LIMITE_MB})')
+    parser.add_argument('--sequencial', action='store_true', help='Roda as empresas uma após a outra, no mesmo processo')
+    parser.add_argument('--perfil', action='store_true',
+                        help='Roda o cProfile em todas as threads; o .prof fica em logs/metricas/, ao lado do relatório JSON')
+    args = parser.parse_args()
+
+    if args.modo == 'atualizar' and not args.inicio:
+        args.inicio, args.fim = periodo_recente(args.ultimos)
+    elif args.modo in ('completo', 'atualizar'):
+        if not args.inicio:
+            parser.error('--inicio é obrigatório no modo completo')
+        try:
+            args.inicio = ler_data(args.inicio)
+            args.fim = ler_data(args.fim, final=True) if args.fim else (datetime.now().year, datetime.now().month)
+        except argparse.ArgumentTypeError as e:
+            parser.error(str(e))
+        if args.inicio > args.fim:
+            parser.error('--inicio deve ser anterior ou igual a --fim')
+
+    empresas = list(dict.fromkeys(args.empresas))
+    if len(empresas) == 1 or args.sequencial:
+        falhas = [empresa for empresa in empresas if not executar_empresa(empresa, args)]
+    else:
+        # Cada empresa tem seu banco e seus hosts: rodam em paralelo, um processo por empresa
+        processos = {empresa: Process(target=_processo_empresa, args=(empresa, args), name=empresa) for empresa in empresas}
+        for processo in processos.values():
+            processo.start()
+        for processo in processos.values():
+            processo.join()
+        falhas = [empresa for empresa, processo in processos.items() if processo.exitcode != 0]
+
+    if falhas:
+        print(f"\n🔴 Falharam: {', '.join(falhas)}")
+        sys.exit(1)
+    print("\n✅ Todas as empresas concluídas")
+
+if __name__ == "__main__":
+    main()
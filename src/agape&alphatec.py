@@ -1,451 +1,148 @@
-import requests
-import pandas as pd
-from pandas import json_normalize
-import sqlite3
-from time import sleep, time
-import os
-from datetime import datetime
-from urllib.parse import urlparse
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+"""
+Adaptador dos portais da Agape e da Alphatec (mesma API).
+
+API: <url da prefeitura>/<endpoint>?ano=AAAA&mes=MM, com um array JSON aninhado (UTF-8
+com BOM). Objetos aninhados viram colunas <campo>_<subcampo>; arrays de objetos vão para
+tabelas filhas <endpoint>__<campo> (id_pai = id da linha do endpoint) e as demais listas
+são gravadas como texto JSON.
+"""
+import codecs
 import json
-
-def normalizar_url(url):
-    url = url.strip()
-    if not url.startswith('http'):
-        url = 'https://' + url.strip().lstrip('/')
-    return url.rstrip('/')
-
-def get_retry_session():
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=2, status_forcelist=[500, 502, 503, 504])
-    session.mount('http://', HTTPAdapter(max_retries=retries))
-    session.mount('https://', HTTPAdapter(max_retries=retries))
-    return session
-
-def main():
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    data_dir = os.path.join(base_dir, 'data')
-    bds_dir = os.path.join(base_dir, 'bds')
-    logs_dir = os.path.join(base_dir, 'logs')
-
-    endpoints_file = os.path.join(data_dir, 'endpoints_agape.txt')
-    prefeituras_file = os.path.join(data_dir, 'prefeituras.csv')
-    db_file = os.path.join(bds_dir, 'agape&alphatec.db')
-    error_log_file = os.path.join(logs_dir, 'agape_alphatec_errors.log')
-    execution_log_file = os.path.join(logs_dir, 'agape_alphatec_execution.log')
-    last_run_file = os.path.join(logs_dir, 'agape_alphatec_last_run.txt')
-
-    os.makedirs(bds_dir, exist_ok=True)
-    os.makedirs(logs_dir, exist_ok=True)
-
-    while True:
-        print("\n" + "="*50)
-        print("MENU PRINCIPAL - AGAPE & ALPHATEC DATA EXTRACTOR")
-        print("="*50)
-        print("1. Rodar código para um período específico")
-        print("2. Rodar URLs que falharam (do arquivo de log)")
-        print("3. Continuar extração desde a última data")
-        print("4. Sair")
-
-        choice = input("\nEscolha uma opção (1-4): ")
-
-        if choice == '1':
-            start_time = time()
-            log_execution(execution_log_file, "Opção 1: Rodar código para período específico")
-            data_inicio, data_fim = get_periodo_usuario()
-            run_extraction(data_inicio, data_fim, endpoints_file, prefeituras_file, db_file, error_log_file)
-            save_last_run(last_run_file, data_fim)
-            log_execution_time(execution_log_file, start_time)
-
-        elif choice == '2':
-            start_time = time()
-            log_execution(execution_log_file, "Opção 2: Rodar URLs que falharam")
-            run_failed_urls(error_log_file, endpoints_file, prefeituras_file, db_file)
-            log_execution_time(execution_log_file, start_time)
-
-        elif choice == '3':
-            start_time = time()
-            log_execution(execution_log_file, "Opção 3: Continuar desde última data")
-            data_inicio = get_last_run(last_run_file)
-            if data_inicio is None:
-                print("\n🔴 Nenhuma execução anterior encontrada. Use a opção 1 primeiro.")
+import threading
+from itertools import repeat
+from extrator import Adaptador, menu
+from metricas import METRICAS
+from writer import extrair_filhas
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Layouts (prefixo, chaves) guardados pelo Achatador; registros com chaves muito variáveis não crescem o cache sem limite
+LIMITE_LAYOUTS = 10000
+
+class AgapeAlphatec(Adaptador):
+    empresa = 'agape&alphatec'
+    titulo = 'AGAPE & ALPHATEC DATA EXTRACTOR'
+    # Agape primeiro, depois Alphatec
+    nomes_na_planilha = ('Agape', 'Alphatec')
+    arquivo_endpoints = 'endpoints_agape.txt'
+    banco = 'agape&alphatec.db'
+    prefixo_logs = 'agape_alphatec'
+    # O achatamento do JSON aninhado precisa do documento inteiro
+    streaming = False
+
+    def __init__(self):
+        self.achatador = Achatador()
+
+    def ler_resposta(self, response):
+        return processar_resposta(response, self.achatador)
+
+    def gravar(self, writer, tabela, dados, fixos, resultado, substituir):
+        # Metadados no fim de todas as linhas, substituindo colunas de mesmo nome vindas da API
+        nomes_fixos = {col.lower() for col in fixos}
+        colunas = [col for col in dados.colunas if col.lower() not in nomes_fixos]
+        # repeat limitado ao número de registros: sem colunas da API (ex.: [{}]) o zip só teria os fixos
+        linhas = list(zip(*(dados.colunas[col] for col in colunas), *(repeat(valor, len(dados)) for valor in fixos.values())))
+        with METRICAS.etapa('filhas', tabela):
+            colunas, linhas, filhas = extrair_filhas(tabela, colunas + list(fixos), linhas, self.achatador.linhas)
+
+        # O writer cria as colunas novas e grava as filhas e o resultado no ledger no mesmo lote
+        writer.gravar(tabela, colunas, linhas, None, resultado, substituir, filhas)
+
+class Colunas:
+    """Registros achatados, como {coluna: lista de valores}; len() é o número de registros"""
+
+    def __init__(self, colunas=None, registros=0):
+        self.colunas = colunas or {}
+        self.registros = registros
+
+    def __len__(self):
+        return self.registros
+
+class Achatador:
+    """
+    Achata listas de objetos JSON aninhados direto em colunas, numa única passada.
+
+    Os nomes das colunas de cada objeto dependem só do prefixo e das chaves dele; o
+    nome achatado de cada chave fica em cache por (prefixo, chaves), então as páginas
+    seguintes de um endpoint (registros com as mesmas chaves) não refazem a descoberta.
+    Listas ficam como vieram (writer.extrair_filhas separa as tabelas filhas) e objetos
+    vazios não geram coluna, como no json_normalize(sep='_'). Um nome repetido (chave 'a_b' e objeto a com chave b)
+    fica com o último valor.
+    """
+
+    def __init__(self, sep='_'):
+        self.sep = sep
+        self._layouts = {}
+        self._lock = threading.Lock()
+
+    def _nomes(self, prefixo, chaves):
+        nomes = self._layouts.get((prefixo, chaves))
+        if nomes is None:
+            nomes = tuple(f"{prefixo}{chave}" for chave in chaves)
+            with self._lock:
+                if len(self._layouts) >= LIMITE_LAYOUTS:
+                    self._layouts.clear()
+                self._layouts[(prefixo, chaves)] = nomes
+        return nomes
+
+    def _achatar(self, objeto, prefixo, colunas, indice, total):
+        for nome, valor in zip(self._nomes(prefixo, tuple(objeto)), objeto.values()):
+            tipo = type(valor)
+            if tipo is dict:
+                self._achatar(valor, nome + self.sep, colunas, indice, total)
                 continue
-
-            data_fim = (datetime.now().year, datetime.now().month)
-            run_extraction(data_inicio, data_fim, endpoints_file, prefeituras_file, db_file, error_log_file)
-            save_last_run(last_run_file, data_fim)
-            log_execution_time(execution_log_file, start_time)
-
-        elif choice == '4':
-            print("\nSaindo...")
-            break
-
-        else:
-            print("\n🔴 Opção inválida. Tente novamente.")
-
-def get_periodo_usuario():
-    print("\n" + "="*50)
-    print("DEFINIR PERÍODO DE EXTRAÇÃO")
-    print("="*50)
-
-    while True:
+            coluna = colunas.get(nome)
+            if coluna is None:
+                # O total de registros é conhecido: a coluna nasce com todas as posições
+                coluna = colunas[nome] = [None] * total
+            coluna[indice] = valor
+
+    def achatar(self, registros):
+        """Colunas com os registros (dicts) achatados; itens que não são objetos viram a coluna 'valor'"""
+        colunas = {}
+        total = len(registros)
+        for indice, registro in enumerate(registros):
+            self._achatar(registro if isinstance(registro, dict) else {'valor': registro}, '', colunas, indice, total)
+        return Colunas(colunas, total)
+
+    def linhas(self, registros):
+        """Registros achatados como (colunas, linhas), o formato do writer (usado nas tabelas filhas)"""
+        colunas = self.achatar(registros).colunas
+        return list(colunas), list(zip(*colunas.values()))
+
+def carregar_json(conteudo):
+    """json.loads, ou o orjson (bem mais rápido) quando estiver instalado"""
+    if orjson:
         try:
-            inicio = input("Data inicial (MM/AAAA): ").split('/')
-            mes_inicio = int(inicio[0])
-            ano_inicio = int(inicio[1])
-
-            fim = input("Data final (MM/AAAA): ").split('/')
-            mes_fim = int(fim[0])
-            ano_fim = int(fim[1])
-
-            if (ano_inicio > ano_fim) or (ano_inicio == ano_fim and mes_inicio > mes_fim):
-                print("🔴 Data inicial deve ser anterior à data final. Tente novamente.")
-                continue
-
-            if mes_inicio < 1 or mes_inicio > 12 or mes_fim < 1 or mes_fim > 12:
-                print("🔴 Mês inválido. Deve ser entre 1 e 12. Tente novamente.")
-                continue
-
-            return (ano_inicio, mes_inicio), (ano_fim, mes_fim)
-
-        except (ValueError, IndexError):
-            print("🔴 Formato inválido. Use MM/AAAA (ex: 01/2024). Tente novamente.")
-
-def run_extraction(data_inicio, data_fim, endpoints_file, prefeituras_file, db_file, error_log_file):
-    endpoints = load_endpoints(endpoints_file)
-    prefeituras = load_prefeituras(prefeituras_file)
-    prefeituras_agape = prefeituras[prefeituras['empresa'] == 'Agape']
-    prefeituras_alphatec = prefeituras[prefeituras['empresa'] == 'Alphatec']
-
-    if prefeituras_agape.empty and prefeituras_alphatec.empty:
-        print("\n🔴 Nenhuma prefeitura com empresa 'Agape' ou 'Alphatec' encontrada.")
-        return
-
-    session = get_retry_session()
-    conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
-
-    for endpoint in endpoints:
-        endpoint_name = endpoint.split('/')[-1].replace('Get', '').lower()
-        print(f"\n{'='*50}\n🔧 Processando endpoint: {endpoint_name}")
-
-        cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS {endpoint_name} (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                municipio TEXT,
-                prefeitura TEXT,
-                ano INTEGER,
-                mes INTEGER
-            )
-        ''')
-        conn.commit()
-
-        # Processar Agape
-        for _, prefeitura in prefeituras_agape.iterrows():
-            processar_prefeitura(session, conn, cursor, prefeitura, endpoint, endpoint_name, data_inicio, data_fim, error_log_file)
-
-        # Processar Alphatec
-        for _, prefeitura in prefeituras_alphatec.iterrows():
-            processar_prefeitura(session, conn, cursor, prefeitura, endpoint, endpoint_name, data_inicio, data_fim, error_log_file)
-
-    conn.close()
-    print("\n\n✅ EXTRAÇÃO CONCLUÍDA!")
-
-def processar_resposta(response):
-    """Processa a resposta HTTP e retorna um DataFrame normalizado"""
+            return orjson.loads(conteudo)
+        except orjson.JSONDecodeError:
+            # Entradas que o orjson recusa e o json aceita (NaN, inteiros acima de 64 bits)
+            pass
+    return json.loads(conteudo.decode('utf-8'))
+
+def processar_resposta(response, achatador=None):
+    """Processa a resposta HTTP e retorna os registros achatados em colunas"""
     try:
-        content = response.content.decode('utf-8-sig')
+        content = response.content
+        if content.startswith(codecs.BOM_UTF8):
+            content = content[len(codecs.BOM_UTF8):]
         if not content.strip():
-            return pd.DataFrame()
-        
-        dados = json.loads(content)
-        
-        # Se for uma lista de objetos
+            return Colunas()
+
+        dados = carregar_json(content)
+        achatador = achatador or Achatador()
         if isinstance(dados, list):
-            if not dados:
-                return pd.DataFrame()
-            
-            # Tenta normalizar com json_normalize do pandas
-            try:
-                df = json_normalize(dados, sep='_')
-                return df
-            except:
-                # Fallback para tratamento manual se json_normalize falhar
-                records = []
-                for item in dados:
-                    if isinstance(item, dict):
-                        records.append(flatten_dict(item))
-                if records:
-                    return pd.DataFrame(records)
-                return pd.DataFrame(dados)
-        
-        # Se for um único dicionário
-        elif isinstance(dados, dict):
-            return pd.DataFrame([flatten_dict(dados)])
-        
-        # Valor simples (string, número, etc)
-        else:
-            return pd.DataFrame({'valor': [dados]})
+            return achatador.achatar(dados)
+        # Um único objeto ou um valor simples (string, número, etc)
+        return achatador.achatar([dados])
 
     except Exception as e:
         raise ValueError(f"Erro ao processar resposta: {str(e)}")
 
-def flatten_dict(d, parent_key='', sep='_'):
-    """Aplaina um dicionário aninhado de forma mais simples"""
-    items = []
-    for k, v in d.items():
-        new_key = f"{parent_key}{sep}{k}" if parent_key else k
-        if isinstance(v, dict):
-            items.extend(flatten_dict(v, new_key, sep=sep).items())
-        elif isinstance(v, list):
-            # Para listas, verificamos se contém dicionários
-            if v and isinstance(v[0], dict):
-                for i, item in enumerate(v):
-                    items.extend(flatten_dict(item, f"{new_key}_{i}", sep=sep).items())
-            else:
-                items.append((new_key, json.dumps(v) if v else None))
-        else:
-            items.append((new_key, v))
-    return dict(items)
-
-def processar_prefeitura(session, conn, cursor, prefeitura, endpoint, endpoint_name, data_inicio, data_fim, error_log_file):
-    municipio = prefeitura['municipio']
-    prefeitura_nome = prefeitura['prefeitura']
-    base_url = normalizar_url(prefeitura['url'])
-    print(f"\n🏛️ Prefeitura: {prefeitura_nome} ({municipio})")
-
-    for ano, mes in generate_months_range(data_inicio, data_fim):
-        print(f"📅 {mes:02d}/{ano}", end=' ', flush=True)
-        
-        cursor.execute(f'''
-            SELECT 1 FROM {endpoint_name} 
-            WHERE municipio = ? AND prefeitura = ? AND ano = ? AND mes = ?
-            LIMIT 1
-        ''', (municipio, prefeitura_nome, ano, mes))
-
-        if cursor.fetchone():
-            print("✅ Já existe no BD", end=' ')
-            continue
-
-        url = f"{base_url}/{endpoint}?ano={ano}&mes={mes:02d}"
-        try:
-            response = session.get(url, timeout=30)
-            response.raise_for_status()
-            
-            df = processar_resposta(response)
-            
-            if df.empty:
-                print("🟡 Dados vazios", end=' ')
-                continue
-
-            # Adiciona metadados
-            df['municipio'] = municipio
-            df['prefeitura'] = prefeitura_nome
-            df['ano'] = ano
-            df['mes'] = mes
-
-            # Verifica e adapta estrutura da tabela
-            cursor.execute(f"PRAGMA table_info({endpoint_name})")
-            existing_columns = [col[1] for col in cursor.fetchall()]
-            
-            # Converte listas/dicionários para JSON string
-            for col in df.columns:
-                if df[col].apply(lambda x: isinstance(x, (list, dict))).any():
-                    df[col] = df[col].apply(lambda x: json.dumps(x, ensure_ascii=False) if isinstance(x, (list, dict)) else x)
-            
-            # Adiciona novas colunas se necessário
-            for col in df.columns:
-                if col not in existing_columns and col != 'id':
-                    col_type = 'TEXT'
-                    if pd.api.types.is_numeric_dtype(df[col]):
-                        col_type = 'REAL' if df[col].dtype == float else 'INTEGER'
-                    cursor.execute(f"ALTER TABLE {endpoint_name} ADD COLUMN {col} {col_type}")
-                    conn.commit()
-            
-            # Insere os dados
-            df.to_sql(endpoint_name, conn, if_exists='append', index=False)
-            print("✅ Dados salvos", end=' ')
-
-        except Exception as e:
-            error_msg = f"Erro: {type(e).__name__} - {str(e)}"
-            print(f"🔴 {error_msg}", end=' ')
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            with open(error_log_file, 'a', encoding='utf-8') as f:
-                f.write(f"{timestamp}|{url}|{error_msg}\n")
-        
-        sleep(1)
-
-def log_error(log_file, url, error_msg):
-    """Registra erros no arquivo de log"""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_file, 'a', encoding='utf-8') as f:
-        f.write(f"{timestamp}|{url}|{error_msg}\n")
-
-def run_failed_urls(error_log_file, endpoints_file, prefeituras_file, db_file):
-    if not os.path.exists(error_log_file):
-        print("\n🔴 Nenhum arquivo de log de erros encontrado.")
-        return
-
-    failed_urls = []
-    with open(error_log_file, 'r') as f:
-        for line in f:
-            partes = line.strip().split('|')
-            if len(partes) >= 2:
-                failed_urls.append(partes[1])
-
-    if not failed_urls:
-        print("\n✅ Nenhuma URL com erro para reprocessar.")
-        return
-
-    print(f"\n🔧 Reprocessando {len(failed_urls)} URLs com erro")
-    session = get_retry_session()
-    prefeituras = load_prefeituras(prefeituras_file)
-    conn = sqlite3.connect(db_file)
-    cursor = conn.cursor()
-    success_count = 0
-    temp_error_file = error_log_file + ".temp"
-
-    for url in failed_urls:
-        try:
-            print(f"🔁 Tentando novamente: {url}", end=' ', flush=True)
-            url = normalizar_url(url).replace('//', '/').replace('https:/', 'https://')
-            parsed = urlparse(url)
-            base_url = f"{parsed.scheme}://{parsed.netloc}"
-            if '?' not in url:
-                print("🟡 URL sem parâmetros. Ignorando.")
-                continue
-
-            query_params = parsed.query
-            params_dict = dict(param.split('=', 1) for param in query_params.split('&'))
-            ano = int(params_dict.get('ano', 0))
-            mes = int(params_dict.get('mes', 0))
-
-            prefeitura_match = prefeituras[prefeituras['url'].str.strip().apply(normalizar_url) == base_url]
-            if prefeitura_match.empty:
-                print("🟡 Prefeitura não encontrada. Ignorando.")
-                continue
-
-            prefeitura = prefeitura_match.iloc[0]
-            municipio = prefeitura['municipio']
-            prefeitura_nome = prefeitura['prefeitura']
-            endpoint_name = parsed.path.split('/')[-1].replace('Get', '').lower()
-
-            response = session.get(url, timeout=60)
-            response.raise_for_status()
-            if not response.content.strip():
-                print("🟡 Resposta vazia. Ignorando.")
-                continue
-
-            # Tratamento do encoding UTF-8 com BOM
-            try:
-                dados = response.json()
-            except json.JSONDecodeError:
-                dados = json.loads(response.content.decode('utf-8-sig'))
-
-            if isinstance(dados, dict):
-                if all(isinstance(v, list) for v in dados.values()):
-                    lengths = [len(v) for v in dados.values()]
-                    if len(set(lengths)) > 1:
-                        raise ValueError("All arrays must be of the same length")
-                    dados = [dict(zip(dados.keys(), values)) for values in zip(*dados.values())]
-                else:
-                    dados = [dados]
-
-            if not isinstance(dados, list):
-                raise ValueError("Formato inesperado (não é lista)")
-
-            df = pd.DataFrame(dados)
-
-            if not df.empty:
-                df['municipio'] = municipio
-                df['prefeitura'] = prefeitura_nome
-                df['ano'] = ano
-                df['mes'] = mes
-
-                cursor.execute(f"PRAGMA table_info({endpoint_name})")
-                existing_columns = [col[1] for col in cursor.fetchall()]
-
-                for column in df.columns:
-                    if column not in existing_columns and column != 'id':
-                        col_type = 'TEXT'
-                        if pd.api.types.is_numeric_dtype(df[column]):
-                            col_type = 'REAL'
-                        elif pd.api.types.is_integer_dtype(df[column]):
-                            col_type = 'INTEGER'
-                        cursor.execute(f"ALTER TABLE {endpoint_name} ADD COLUMN {column} {col_type}")
-                        conn.commit()
-
-                for col in df.columns:
-                    df[col] = df[col].apply(lambda x: json.dumps(x) if isinstance(x, (list, dict)) else x)
-
-                df.to_sql(endpoint_name, conn, if_exists='append', index=False)
-                success_count += 1
-                print("✅ Sucesso")
-
-        except Exception as e:
-            print(f"🔴 Falhou novamente: {str(e)}")
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            with open(temp_error_file, 'a') as f:
-                f.write(f"{timestamp}|{url}|{type(e).__name__}|{str(e)}\n")
-        sleep(1)
-
-    conn.close()
-    os.replace(temp_error_file, error_log_file)
-    print(f"\n✅ Concluído! {success_count}/{len(failed_urls)} URLs reprocessadas com sucesso.")
-
-def generate_months_range(data_inicio, data_fim):
-    meses = []
-    ano_inicio, mes_inicio = data_inicio
-    ano_fim, mes_fim = data_fim
-    ano_atual, mes_atual = ano_inicio, mes_inicio
-
-    while (ano_atual < ano_fim) or (ano_atual == ano_fim and mes_atual <= mes_fim):
-        meses.append((ano_atual, mes_atual))
-        mes_atual += 1
-        if mes_atual > 12:
-            mes_atual = 1
-            ano_atual += 1
-
-    return meses
-
-def save_last_run(last_run_file, data_fim):
-    with open(last_run_file, 'w') as f:
-        f.write(f"{data_fim[0]},{data_fim[1]}")
-
-def get_last_run(last_run_file):
-    if not os.path.exists(last_run_file):
-        return None
-    with open(last_run_file, 'r') as f:
-        ano, mes = map(int, f.read().strip().split(','))
-        return (ano, mes)
-
-def log_execution(log_file, message):
-    timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    with open(log_file, 'a') as f:
-        f.write(f"[{timestamp}] {message}\n")
-
-def log_execution_time(log_file, start_time):
-    elapsed = time() - start_time
-    minutes, seconds = divmod(elapsed, 60)
-    timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    with open(log_file, 'a') as f:
-        f.write(f"[{timestamp}] Tempo de execução: {int(minutes)} minutos e {int(seconds)} segundos\n\n")
-
-def load_prefeituras(filename):
-    try:
-        return pd.read_csv(filename)
-    except Exception as e:
-        print(f"\n🔴 ERRO ao ler arquivo de prefeituras: {str(e)}")
-        return pd.DataFrame()
-
-def load_endpoints(filename):
-    try:
-        with open(filename, 'r', encoding='utf-8-sig') as file:  # Alterado para utf-8-sig
-            return [line.strip() for line in file if line.strip()]
-    except Exception as e:
-        print(f"\n🔴 ERRO ao ler arquivo de endpoints: {str(e)}")
-        return []
+ADAPTADOR = AgapeAlphatec()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    menu(ADAPTADOR)
@@ -0,0 +1,196 @@
+"""
+Cache local das respostas brutas dos portais.
+
+Cada corpo baixado é guardado comprimido (zstd se o pacote `zstandard` estiver
+instalado, senão gzip) num arquivo com o nome do seu hash sha256:
+
+    cache/<empresa>/ab/abcdef....json.zst
+
+O índice requisição -> conteúdo é o próprio ledger (coluna hash de cada unidade), então
+respostas iguais (o mesmo mês reprocessado, portais que devolvem o mesmo documento)
+ocupam espaço uma vez só. O tamanho total é limitado: os arquivos acessados há mais
+tempo (mtime, atualizado a cada uso) são apagados primeiro.
+
+Com o cache, mudar o achatamento ou o tratamento de colunas não obriga a baixar tudo
+de novo: extrator.reconstruir refaz as tabelas lendo daqui.
+"""
+import gzip
+import json
+import os
+import threading
+import uuid
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Limite padrão do cache de cada empresa
+LIMITE_MB = 2048
+
+_EXTENSOES = ('.json.zst', '.json.gz')
+
+class GravacaoCache:
+    """Arquivo temporário comprimido que recebe um corpo em pedaços e, no fim, é renomeado para o hash"""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.extensao = '.json.zst' if zstandard else '.json.gz'
+        self._temporario = os.path.join(cache.pasta, f'.{uuid.uuid4().hex}.tmp')
+        self._arquivo = open(self._temporario, 'wb')
+        if zstandard:
+            self._saida = zstandard.ZstdCompressor(level=3).stream_writer(self._arquivo)
+        else:
+            self._saida = gzip.GzipFile(fileobj=self._arquivo, mode='wb', compresslevel=6)
+
+    def write(self, pedaco):
+        self._saida.write(pedaco)
+
+    def concluir(self, hash):
+        self._saida.close()
+        self._arquivo.close()
+        if self.cache.contem(hash):
+            # Conteúdo já guardado: só renova o acesso
+            os.remove(self._temporario)
+            self.cache.tocar(hash)
+            return
+        destino = self.cache.caminho(hash, self.extensao)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        os.replace(self._temporario, destino)
+
+    def descartar(self):
+        try:
+            self._saida.close()
+            self._arquivo.close()
+        finally:
+            if os.path.exists(self._temporario):
+                os.remove(self._temporario)
+
+class RespostaEmCache:
+    """Corpo lido do cache com a parte da interface de requests.Response usada pelos extratores"""
+
+    status_code = 200
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.headers = {}
+        self._content = None
+
+    def _abrir(self):
+        arquivo = open(self.caminho, 'rb')
+        if self.caminho.endswith('.zst'):
+            return zstandard.ZstdDecompressor().stream_reader(arquivo, closefd=True)
+        return gzip.GzipFile(fileobj=arquivo, mode='rb')
+
+    @property
+    def content(self):
+        if self._content is None:
+            with self._abrir() as entrada:
+                self._content = entrada.read()
+        return self._content
+
+    def json(self):
+        return json.loads(self.content.decode('utf-8-sig'))
+
+    def iter_content(self, tamanho):
+        with self._abrir() as entrada:
+            while True:
+                pedaco = entrada.read(tamanho)
+                if not pedaco:
+                    return
+                yield pedaco
+
+    def close(self):
+        pass
+
+class CacheRespostas:
+    """
+    Cache endereçado por conteúdo de uma empresa.
+
+    Args:
+        pasta: Diretório do cache
+        limite_mb: Tamanho máximo; `podar` apaga os arquivos menos usados até caber
+    """
+
+    def __init__(self, pasta, limite_mb=LIMITE_MB):
+        self.pasta = pasta
+        self.limite_bytes = limite_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+
+    def caminho(self, hash, extensao):
+        return os.path.join(self.pasta, hash[:2], hash + extensao)
+
+    def _existente(self, hash):
+        if not hash:
+            return None
+        for extensao in _EXTENSOES:
+            caminho = self.caminho(hash, extensao)
+            if os.path.exists(caminho) and (extensao != '.json.zst' or zstandard):
+                return caminho
+        return None
+
+    def contem(self, hash):
+        return self._existente(hash) is not None
+
+    def tocar(self, hash):
+        """Marca o conteúdo como usado agora (para a poda por LRU)"""
+        caminho = self._existente(hash)
+        if caminho:
+            try:
+                os.utime(caminho)
+            except OSError:
+                pass
+
+    def guardar(self, hash, conteudo):
+        """Guarda um corpo já carregado; não faz nada se o hash já estiver no cache"""
+        if not conteudo or self.contem(hash):
+            self.tocar(hash)
+            return
+        gravacao = self.gravacao()
+        try:
+            gravacao.write(conteudo)
+            gravacao.concluir(hash)
+        except Exception:
+            gravacao.descartar()
+            raise
+
+    def gravacao(self):
+        """Gravação em pedaços, para respostas lidas em fluxo"""
+        return GravacaoCache(self)
+
+    def abrir(self, hash):
+        """RespostaEmCache com o conteúdo do hash, ou None se ele não estiver no cache"""
+        caminho = self._existente(hash)
+        if caminho is None:
+            return None
+        self.tocar(hash)
+        return RespostaEmCache(caminho)
+
+    def podar(self):
+        """
+        Apaga os arquivos usados há mais tempo até o cache caber no limite.
+
+        Returns:
+            tuple: (arquivos apagados, bytes liberados)
+        """
+        with self._lock:
+            arquivos = []
+            for raiz, _, nomes in os.walk(self.pasta):
+                for nome in nomes:
+                    if nome.endswith(_EXTENSOES):
+                        caminho = os.path.join(raiz, nome)
+                        estado = os.stat(caminho)
+                        arquivos.append((estado.st_mtime, estado.st_size, caminho))
+
+            total = sum(tamanho for _, tamanho, _ in arquivos)
+            apagados = 0
+            liberados = 0
+            for _, tamanho, caminho in sorted(arquivos):
+                if total <= self.limite_bytes:
+                    break
+                os.remove(caminho)
+                total -= tamanho
+                apagados += 1
+                liberados += tamanho
+            return apagados, liberados
@@ -0,0 +1,95 @@
+import threading
+from time import monotonic
+import requests
+
+FECHADO = 'fechado'
+ABERTO = 'aberto'
+MEIO_ABERTO = 'meio_aberto'
+
+class _Circuito:
+    __slots__ = ('estado', 'falhas', 'aberto_em', 'sondando')
+
+    def __init__(self):
+        self.estado = FECHADO
+        self.falhas = 0
+        self.aberto_em = 0.0
+        self.sondando = False
+
+class CircuitBreaker:
+    """
+    Disjuntor por host, seguro para uso entre threads.
+
+    Depois de `limite_falhas` falhas de conexão seguidas o circuito do host abre e
+    as requisições seguintes são puladas. Passados `tempo_reabertura` segundos o
+    circuito fica meio aberto e deixa passar uma única requisição de sondagem:
+    se ela funcionar o host volta ao normal, senão o circuito abre de novo.
+
+    Args:
+        limite_falhas: Falhas de conexão consecutivas para abrir o circuito
+        tempo_reabertura: Segundos até a sondagem de um host com circuito aberto
+    """
+
+    def __init__(self, limite_falhas=3, tempo_reabertura=300):
+        self.limite_falhas = limite_falhas
+        self.tempo_reabertura = tempo_reabertura
+        self._circuitos = {}
+        self._lock = threading.Lock()
+
+    def _circuito(self, host):
+        circuito = self._circuitos.get(host)
+        if circuito is None:
+            circuito = self._circuitos.setdefault(host, _Circuito())
+        return circuito
+
+    def permitir(self, host):
+        """Indica se uma requisição para o host pode ser feita agora"""
+        with self._lock:
+            circuito = self._circuito(host)
+            if circuito.estado == FECHADO:
+                return True
+            if circuito.estado == ABERTO and monotonic() - circuito.aberto_em >= self.tempo_reabertura:
+                circuito.estado = MEIO_ABERTO
+                circuito.sondando = False
+            if circuito.estado == MEIO_ABERTO and not circuito.sondando:
+                circuito.sondando = True
+                return True
+            return False
+
+    def registrar_sucesso(self, host):
+        with self._lock:
+            circuito = self._circuito(host)
+            circuito.estado = FECHADO
+            circuito.falhas = 0
+            circuito.sondando = False
+
+    def registrar_falha(self, host):
+        """Conta uma falha de conexão. Retorna True se o circuito do host (re)abriu"""
+        with self._lock:
+            circuito = self._circuito(host)
+            circuito.falhas += 1
+            if circuito.estado == MEIO_ABERTO or circuito.falhas >= self.limite_falhas:
+                abriu = circuito.estado != ABERTO
+                circuito.estado = ABERTO
+                circuito.aberto_em = monotonic()
+                circuito.sondando = False
+                return abriu
+            return False
+
+    def liberar_sonda(self, host):
+        """
+        Encerra uma sondagem que não terminou em registrar_sucesso nem em registrar_falha
+        (erro que não é de conexão): a próxima requisição ao host faz uma nova sondagem.
+        Não faz nada se não houver sondagem em andamento.
+        """
+        with self._lock:
+            circuito = self._circuito(host)
+            if circuito.estado == MEIO_ABERTO:
+                circuito.sondando = False
+
+    def estado(self, host):
+        with self._lock:
+            return self._circuito(host).estado
+
+def eh_falha_de_conexao(erro):
+    """Falhas que indicam host fora do ar (e não um problema na resposta)"""
+    return isinstance(erro, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
@@ -0,0 +1,47 @@
+"""
+Revalidação barata de unidades já extraídas.
+
+Cada busca guarda no ledger o hash do conteúdo e, quando o portal envia, o ETag e o
+Last-Modified. Na próxima busca da mesma unidade esses validadores viram cabeçalhos
+condicionais (If-None-Match / If-Modified-Since); se o portal responder 304, ou se o
+corpo tiver o mesmo hash da última vez, a unidade é marcada como inalterada e nada é
+gravado no banco.
+"""
+import hashlib
+from datetime import datetime
+from ledger import PENDENTE
+
+def cabecalhos_condicionais(unidade):
+    """Cabeçalhos condicionais a partir dos validadores guardados no ledger"""
+    cabecalhos = {}
+    if unidade.get('etag'):
+        cabecalhos['If-None-Match'] = unidade['etag']
+    if unidade.get('last_modified'):
+        cabecalhos['If-Modified-Since'] = unidade['last_modified']
+    return cabecalhos
+
+def hash_conteudo(conteudo):
+    return hashlib.sha256(conteudo).hexdigest()
+
+def validadores(response, hash=None):
+    """Validadores da resposta no formato aceito por montar_resultado"""
+    return {'hash': hash, 'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+
+def inalterado(unidade, response, hash=None):
+    """True se o portal respondeu 304 ou o corpo é igual ao da última busca bem-sucedida"""
+    if response.status_code == 304:
+        return True
+    return hash is not None and hash == unidade.get('hash')
+
+def pode_ter_linhas(unidade):
+    """
+    Indica se a unidade pode já ter linhas no banco (busca anterior ou importação).
+    Nesse caso uma versão nova do conteúdo substitui as linhas antigas em vez de somar a elas.
+    """
+    return unidade.get('status') != PENDENTE or bool(unidade.get('tentativas'))
+
+def periodo_recente(meses=3):
+    """((ano, mes), (ano, mes)) dos últimos `meses` meses, incluindo o atual"""
+    hoje = datetime.now()
+    total = hoje.year * 12 + hoje.month - 1 - (meses - 1)
+    return (total // 12, total % 12 + 1), (hoje.year, hoje.month)
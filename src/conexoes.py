@@ -0,0 +1,111 @@
+"""
+Camada HTTP compartilhada pelas threads de um extrator.
+
+Uma única sessão atende todos os hosts: o pool do urllib3 guarda uma fila de conexões
+keep-alive por host, dimensionada para a quantidade de hosts da execução (o padrão do
+requests são 10 pools; com 60+ prefeituras os pools seriam descartados e recriados o
+tempo todo, pagando conexão TCP e handshake TLS de novo a cada troca de host).
+
+As conexões são instrumentadas: CONTADORES soma conexões novas e reutilizadas,
+handshakes TLS e consultas DNS, para conferir que o keep-alive está funcionando.
+"""
+import ipaddress
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+# Conexões keep-alive guardadas por host. Cada host é atendido por uma thread só,
+# então uma conexão por host é o uso normal; a segunda cobre a troca após um erro.
+CONEXOES_POR_HOST = 2
+
+class ContadoresHTTP:
+    """Contadores de conexões, seguros para uso por várias threads"""
+
+    CAMPOS = ('requisicoes', 'conexoes_novas', 'handshakes_tls', 'consultas_dns')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+
+    def somar(self, campo, quantidade=1):
+        with self._lock:
+            self._valores[campo] += quantidade
+
+    def zerar(self):
+        with self._lock:
+            self._valores = dict.fromkeys(self.CAMPOS, 0)
+
+    def resumo(self):
+        """Valores atuais; toda requisição além da primeira de cada conexão reutilizou uma conexão aberta"""
+        with self._lock:
+            resumo = dict(self._valores)
+        resumo['conexoes_reutilizadas'] = max(0, resumo['requisicoes'] - resumo['conexoes_novas'])
+        return resumo
+
+    def __str__(self):
+        r = self.resumo()
+        reuso = r['conexoes_reutilizadas'] / r['requisicoes'] * 100 if r['requisicoes'] else 0
+        return (f"{r['requisicoes']} requisições, {r['conexoes_novas']} conexões novas, "
+                f"{r['conexoes_reutilizadas']} reutilizadas ({reuso:.0f}%), "
+                f"{r['handshakes_tls']} handshakes TLS, {r['consultas_dns']} consultas DNS")
+
+CONTADORES = ContadoresHTTP()
+
+def _eh_ip(host):
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+        return True
+    except ValueError:
+        return False
+
+class _ConexaoContada(HTTPConnection):
+    """Conexão que conta aberturas (com a consulta DNS) e requisições"""
+
+    def connect(self):
+        CONTADORES.somar('conexoes_novas')
+        if not _eh_ip(self.host):
+            CONTADORES.somar('consultas_dns')
+        super().connect()
+
+    def request(self, *args, **kwargs):
+        CONTADORES.somar('requisicoes')
+        return super().request(*args, **kwargs)
+
+class _ConexaoContadaTLS(_ConexaoContada, HTTPSConnection):
+    def connect(self):
+        super().connect()
+        CONTADORES.somar('handshakes_tls')
+
+class _PoolContado(HTTPConnectionPool):
+    ConnectionCls = _ConexaoContada
+
+class _PoolContadoTLS(HTTPSConnectionPool):
+    ConnectionCls = _ConexaoContadaTLS
+
+class AdaptadorHTTP(HTTPAdapter):
+    """HTTPAdapter do requests com pools instrumentados"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': _PoolContado, 'https': _PoolContadoTLS}
+
+def criar_sessao(hosts=1, conexoes_por_host=CONEXOES_POR_HOST, cabecalhos=None):
+    """
+    Sessão com retry e pool dimensionado para `hosts` hosts simultâneos.
+
+    Args:
+        hosts: Hosts atendidos ao mesmo tempo (um pool keep-alive para cada)
+        conexoes_por_host: Conexões keep-alive guardadas por host
+        cabecalhos: Cabeçalhos enviados em todas as requisições
+    """
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=2, status_forcelist=[500, 502, 503, 504])
+    adapter = AdaptadorHTTP(pool_connections=max(1, hosts), pool_maxsize=conexoes_por_host, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if cabecalhos:
+        session.headers.update(cabecalhos)
+    return session
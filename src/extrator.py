@@ -0,0 +1,692 @@
+"""
+Núcleo comum dos extratores.
+
+Planejamento e reserva das unidades (ledger), HTTP (sessão com retry, rate limiter e
+circuit breaker por host, requisições condicionais), gravação (SQLiteWriter), índices,
+leitura incremental, cache das respostas, reprocessamento de falhas, métricas, logs e menu ficam aqui,
+uma vez só. Cada
+empresa entra com um adaptador (subclasse de Adaptador) que descreve apenas:
+
+    - o arquivo de endpoints e como montar a URL de uma unidade;
+    - a granularidade do período (mensal ou anual, por exercício);
+    - o formato da resposta (registros planos, por padrão, ou JSON aninhado).
+
+Uma empresa nova (ex.: CR2, portalfacil em prefeituras.csv) é um adaptador novo em src/
+mais uma entrada em EXTRATORES no main.py.
+"""
+import os
+import sqlite3
+from time import time
+from datetime import datetime
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from conexoes import criar_sessao, CONTADORES
+from rate_limiter import RateLimiter, get_com_limite
+from circuit_breaker import CircuitBreaker, eh_falha_de_conexao
+from ledger import (criar_ledger, endpoints_no_ledger, planejar_unidades, importar_existentes, liberar_reservas,
+                    reservar_pendentes, unidades_com_conteudo, ids_com_linhas, montar_resultado, regravacao, resumo_falhas,
+                    importar_log_de_erros, OK, VAZIO, ERRO, ADIADO, INALTERADO, STATUS_A_BUSCAR, STATUS_A_ATUALIZAR, STATUS_FALHA,
+                    TIPO_CIRCUITO_ABERTO)
+from writer import SQLiteWriter, configurar_conexao, registros_da_resposta, descendentes
+from streaming import gravar_em_fluxo, baixar_corpo
+from cache_respostas import CacheRespostas, LIMITE_MB
+from indices import garantir_indices
+from normalizacao import Normalizador
+from metricas import METRICAS
+from condicional import cabecalhos_condicionais, hash_conteudo, validadores, inalterado, pode_ter_linhas, periodo_recente
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODOS = ('completo', 'falhas', 'incremental', 'atualizar', 'reconstruir')
+
+# Tipo SQLite das colunas fixas, criadas junto com a tabela de cada endpoint
+_TIPOS_FIXOS = {'municipio': 'TEXT', 'prefeitura': 'TEXT', 'unidadegestora': 'TEXT', 'ano': 'INTEGER', 'mes': 'INTEGER'}
+
+class Adaptador:
+    """
+    Descrição de uma empresa de portais. As subclasses preenchem os atributos e, quando
+    o portal foge do padrão (URL por /<caminho>?ano=&mes=, JSON com lista de registros
+    planos), sobrescrevem os métodos.
+
+    Atributos:
+        empresa: Nome da empresa no ledger
+        titulo: Nome exibido no menu
+        nomes_na_planilha: Valores da coluna 'empresa' de prefeituras.csv atendidos, na ordem de extração
+        arquivo_endpoints: Arquivo de endpoints em data/
+        banco: Arquivo do banco em bds/
+        prefixo_logs: Prefixo dos arquivos em logs/
+        anual: Períodos por exercício (ano) em vez de mês
+        colunas_fixas: Colunas da unidade gravadas em todas as linhas (substituem as de mesmo nome da API)
+        streaming: A resposta pode ser lida e gravada em lotes, sem ser carregada inteira
+        cabecalhos: Cabeçalhos HTTP enviados em todas as requisições
+    """
+    empresa = None
+    titulo = None
+    nomes_na_planilha = ()
+    arquivo_endpoints = None
+    banco = None
+    prefixo_logs = None
+    anual = False
+    colunas_fixas = ('municipio', 'prefeitura', 'ano', 'mes')
+    streaming = True
+    cabecalhos = {}
+
+    def carregar_endpoints(self, arquivo):
+        """Lista de (tabela, caminho na API) a partir do arquivo de endpoints"""
+        return [(endpoint.split('/')[-1].replace('Get', '').lower(), endpoint) for endpoint in load_endpoints(arquivo)]
+
+    def unidade_gestora(self, prefeitura):
+        """Unidade gestora da linha de prefeituras.csv ('' quando a empresa não usa)"""
+        return ''
+
+    def url(self, prefeitura, tabela, caminho, ano, mes):
+        return f"{normalizar_url(prefeitura['url'])}/{caminho}?ano={ano}&mes={mes:02d}"
+
+    def ler_resposta(self, response):
+        """Dados da resposta, prontos para `gravar` (len() == 0 quando não há linhas)"""
+        return registros_da_resposta(response)
+
+    def gravar(self, writer, tabela, dados, fixos, resultado, substituir):
+        writer.gravar_registros(tabela, dados, fixos, resultado, substituir)
+
+    def caminhos(self):
+        """Caminhos dos arquivos de entrada, do banco, dos logs e do cache do extrator (cria bds/ e logs/)"""
+        data_dir = os.path.join(BASE_DIR, 'data')
+        bds_dir = os.path.join(BASE_DIR, 'bds')
+        logs_dir = os.path.join(BASE_DIR, 'logs')
+
+        os.makedirs(bds_dir, exist_ok=True)
+        os.makedirs(logs_dir, exist_ok=True)
+
+        return {
+            'endpoints_file': os.path.join(data_dir, self.arquivo_endpoints),
+            'prefeituras_file': os.path.join(data_dir, 'prefeituras.csv'),
+            'db_file': os.path.join(bds_dir, self.banco),
+            'error_log_file': os.path.join(logs_dir, f'{self.prefixo_logs}_errors.log'),
+            'execution_log_file': os.path.join(logs_dir, f'{self.prefixo_logs}_execution.log'),
+            'last_run_file': os.path.join(logs_dir, f'{self.prefixo_logs}_last_run.txt'),
+            'cache_dir': os.path.join(BASE_DIR, 'cache', self.prefixo_logs),
+            'metricas_dir': os.path.join(logs_dir, 'metricas'),
+        }
+
+def normalizar_url(url):
+    url = url.strip()
+    if not url.startswith('http'):
+        url = 'https://' + url.strip().lstrip('/')
+    return url.rstrip('/')
+
+def executar(adaptador, modo, periodo=None, filtro_endpoints=None, filtro_municipios=None, max_workers=None, streaming=False,
+             tipos_erro=None, ignorar_espera=False, usar_cache=True, cache_mb=LIMITE_MB, perfil=False):
+    """
+    Execução não interativa, usada pelo menu e pelo main.py da raiz.
+
+    Args:
+        modo: 'completo' (período informado), 'falhas' (unidades com erro no ledger),
+              'atualizar' (revalida o período, por padrão os últimos 3 meses, com requisições condicionais) ou
+              'incremental' (da última execução até hoje) ou
+              'reconstruir' (refaz as tabelas a partir do cache de respostas, sem acessar os portais)
+        periodo: ((ano, mes), (ano, mes)), ou (ano_inicio, ano_fim) nos adaptadores anuais, para os modos completo e atualizar
+        filtro_endpoints, filtro_municipios: Restringem a extração (todos os modos menos falhas)
+        max_workers: Threads de rede (uma por host, por padrão)
+        streaming: Lê e grava as respostas em lotes, sem carregá-las inteiras (se o adaptador permitir)
+        tipos_erro: No modo falhas, reprocessa só estes tipos de erro (ex.: ['ReadTimeout'])
+        ignorar_espera: No modo falhas, não espera a próxima tentativa agendada de cada unidade
+        usar_cache: Guarda as respostas baixadas no cache local (cache/<empresa>/)
+        cache_mb: Tamanho máximo do cache; as respostas usadas há mais tempo são apagadas primeiro
+        perfil: Roda o cProfile nas threads da execução; o .prof fica ao lado do relatório de métricas
+
+    Returns:
+        bool: False se o modo incremental não encontrou execução anterior
+    """
+    c = adaptador.caminhos()
+    start_time = time()
+    METRICAS.iniciar(adaptador.empresa, perfil)
+    with METRICAS.perfilar():
+        if not _executar_modo(adaptador, modo, c, periodo, filtro_endpoints, filtro_municipios, max_workers, streaming,
+                              tipos_erro, ignorar_espera, usar_cache, cache_mb):
+            return False
+
+    log_execution_time(c['execution_log_file'], start_time)
+    relatorio = METRICAS.salvar(c['metricas_dir'], adaptador.prefixo_logs, {'modo': modo, 'http': CONTADORES.resumo()})
+    log_execution(c['execution_log_file'], f"Relatório de métricas: {relatorio}")
+    return True
+
+def _executar_modo(adaptador, modo, c, periodo, filtro_endpoints, filtro_municipios, max_workers, streaming,
+                   tipos_erro, ignorar_espera, usar_cache, cache_mb):
+    """Roda o modo pedido (argumentos de executar); False se o modo incremental não encontrou execução anterior"""
+    cache = CacheRespostas(c['cache_dir'], cache_mb) if usar_cache or modo == 'reconstruir' else None
+    opcoes = {'filtro_endpoints': filtro_endpoints, 'filtro_municipios': filtro_municipios, 'max_workers': max_workers, 'streaming': streaming,
+              'cache': cache}
+
+    if modo == 'completo':
+        log_execution(c['execution_log_file'], "Opção 1: Rodar código para período específico")
+        inicio, fim = periodo
+        run_extraction(adaptador, inicio, fim, c['endpoints_file'], c['prefeituras_file'], c['db_file'], **opcoes)
+        save_last_run(adaptador, c['last_run_file'], fim)
+
+    elif modo == 'falhas':
+        log_execution(c['execution_log_file'], "Opção 2: Reprocessar unidades que falharam")
+        run_failed_urls(adaptador, c['db_file'], c['error_log_file'], tipos_erro, ignorar_espera, max_workers=max_workers, streaming=streaming,
+                        cache=cache)
+
+    elif modo == 'incremental':
+        log_execution(c['execution_log_file'], "Opção 3: Continuar desde a última execução")
+        ultima = get_last_run(adaptador, c['last_run_file'])
+        if ultima is None:
+            print("\n🔴 Nenhuma execução anterior encontrada. Use a opção 1 primeiro.")
+            return False
+
+        # O ano da última execução já foi extraído por inteiro; o último mês pode ter sido parcial
+        hoje = datetime.now()
+        inicio, fim = (ultima + 1, hoje.year) if adaptador.anual else (ultima, (hoje.year, hoje.month))
+        run_extraction(adaptador, inicio, fim, c['endpoints_file'], c['prefeituras_file'], c['db_file'], **opcoes)
+        save_last_run(adaptador, c['last_run_file'], fim)
+
+    elif modo == 'atualizar':
+        log_execution(c['execution_log_file'], "Atualização: revalida o período com requisições condicionais")
+        if periodo is None:
+            periodo = periodo_recente()
+            if adaptador.anual:
+                periodo = (periodo[0][0], periodo[1][0])
+        inicio, fim = periodo
+        run_extraction(adaptador, inicio, fim, c['endpoints_file'], c['prefeituras_file'], c['db_file'], atualizar=True, **opcoes)
+
+    elif modo == 'reconstruir':
+        log_execution(c['execution_log_file'], "Reconstrução das tabelas a partir do cache de respostas")
+        reconstruir(adaptador, c['db_file'], cache, filtro_endpoints, filtro_municipios, streaming)
+
+    else:
+        raise ValueError(f"Modo inválido: {modo}")
+
+    return True
+
+def menu(adaptador):
+    while True:
+        print("\n" + "="*50)
+        print(f"MENU PRINCIPAL - {adaptador.titulo}")
+        print("="*50)
+        print("1. Rodar código para um período específico")
+        print("2. Reprocessar unidades que falharam")
+        print(f"3. Continuar extração desde {'o último ano' if adaptador.anual else 'a última data'}")
+        print("4. Reconstruir tabelas a partir do cache (sem baixar)")
+        print("5. Sair")
+
+        choice = input("\nEscolha uma opção (1-5): ")
+
+        if choice == '1':
+            executar(adaptador, 'completo', get_periodo_usuario(adaptador))
+
+        elif choice == '2':
+            executar(adaptador, 'falhas')
+
+        elif choice == '3':
+            if not executar(adaptador, 'incremental'):
+                continue
+
+        elif choice == '4':
+            executar(adaptador, 'reconstruir')
+
+        elif choice == '5':
+            print("\nSaindo...")
+            break
+
+        else:
+            print("\n🔴 Opção inválida. Tente novamente.")
+
+def get_periodo_usuario(adaptador):
+    print("\n" + "="*50)
+    print("DEFINIR PERÍODO DE EXTRAÇÃO")
+    print("="*50)
+
+    while True:
+        try:
+            if adaptador.anual:
+                ano_inicio = int(input("Ano inicial (AAAA): "))
+                ano_fim = int(input("Ano final (AAAA): "))
+
+                if ano_inicio > ano_fim:
+                    print("🔴 Ano inicial deve ser anterior ou igual ao ano final. Tente novamente.")
+                    continue
+
+                current_year = datetime.now().year
+                if ano_inicio < 2000 or ano_inicio > current_year or ano_fim < 2000 or ano_fim > current_year:
+                    print(f"🔴 Ano inválido. Deve ser entre 2000 e {current_year}. Tente novamente.")
+                    continue
+
+                return ano_inicio, ano_fim
+
+            inicio = input("Data inicial (MM/AAAA): ").split('/')
+            mes_inicio = int(inicio[0])
+            ano_inicio = int(inicio[1])
+
+            fim = input("Data final (MM/AAAA): ").split('/')
+            mes_fim = int(fim[0])
+            ano_fim = int(fim[1])
+
+            if (ano_inicio > ano_fim) or (ano_inicio == ano_fim and mes_inicio > mes_fim):
+                print("🔴 Data inicial deve ser anterior à data final. Tente novamente.")
+                continue
+
+            if mes_inicio < 1 or mes_inicio > 12 or mes_fim < 1 or mes_fim > 12:
+                print("🔴 Mês inválido. Deve ser entre 1 e 12. Tente novamente.")
+                continue
+
+            return (ano_inicio, mes_inicio), (ano_fim, mes_fim)
+
+        except (ValueError, IndexError):
+            print(f"🔴 Formato inválido. Use {'AAAA (ex: 2024)' if adaptador.anual else 'MM/AAAA (ex: 01/2024)'}. Tente novamente.")
+
+def run_extraction(adaptador, inicio, fim, endpoints_file, prefeituras_file, db_file, max_workers=None, rate_limiter=None,
+                   circuit_breaker=None, streaming=False, filtro_endpoints=None, filtro_municipios=None, atualizar=False, cache=None):
+    """
+    Planeja no ledger as unidades (endpoint x prefeitura x período), reserva as que faltam e as busca.
+
+    Args:
+        inicio, fim: (ano, mes), ou ano nos adaptadores anuais
+        atualizar: Revalida também as unidades já extraídas (requisições condicionais)
+        cache: CacheRespostas onde guardar os corpos baixados (opcional)
+    """
+    endpoints = adaptador.carregar_endpoints(endpoints_file)
+    prefeituras = load_prefeituras(prefeituras_file)
+    if filtro_endpoints:
+        # Aceita o caminho na API (Compras/GetLicitacoes) ou o nome da tabela (licitacoes)
+        filtro = {endpoint.lower() for endpoint in filtro_endpoints}
+        endpoints = [(tabela, caminho) for tabela, caminho in endpoints if tabela.lower() in filtro or str(caminho).lower() in filtro]
+        if not endpoints:
+            print("\n🔴 Nenhum endpoint corresponde ao filtro informado.")
+            return
+    prefeituras = pd.concat([prefeituras[prefeituras['empresa'] == nome] for nome in adaptador.nomes_na_planilha])
+    if filtro_municipios:
+        filtro = {municipio.lower() for municipio in filtro_municipios}
+        prefeituras = prefeituras[prefeituras['municipio'].str.lower().isin(filtro)]
+
+    if prefeituras.empty:
+        print(f"\n🔴 Nenhuma prefeitura com empresa {' ou '.join(repr(nome) for nome in adaptador.nomes_na_planilha)} encontrada.")
+        return
+
+    # Esta conexão só planeja e reserva as unidades; as gravações passam pelo SQLiteWriter
+    conn = configurar_conexao(sqlite3.connect(db_file))
+    criar_ledger(conn)
+    liberar_reservas(conn, adaptador.empresa)
+    endpoints_planejados = endpoints_no_ledger(conn, adaptador.empresa)
+
+    # Planeja todas as unidades (endpoint x prefeitura x período) de uma vez
+    periodos = [(ano, 0) for ano in range(inicio, fim + 1)] if adaptador.anual else generate_months_range(inicio, fim)
+    colunas = ', '.join(f"{col} {_TIPOS_FIXOS[col]}" for col in adaptador.colunas_fixas)
+    unidades = []
+    for tabela, caminho in endpoints:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {tabela} (id INTEGER PRIMARY KEY AUTOINCREMENT, {colunas})")
+
+        for _, prefeitura in prefeituras.iterrows():
+            unidade_gestora = adaptador.unidade_gestora(prefeitura)
+            for ano, mes in periodos:
+                unidades.append({
+                    'empresa': adaptador.empresa,
+                    'endpoint': tabela,
+                    'municipio': prefeitura['municipio'],
+                    'prefeitura': prefeitura['prefeitura'],
+                    'unidadegestora': unidade_gestora,
+                    'ano': ano,
+                    'mes': mes,
+                    'url': adaptador.url(prefeitura, tabela, caminho, ano, mes),
+                })
+    conn.commit()
+
+    novas = planejar_unidades(conn, unidades)
+    colunas_chave = tuple(col if col in adaptador.colunas_fixas else None for col in ('municipio', 'unidadegestora', 'ano', 'mes'))
+    for tabela in dict.fromkeys(tabela for tabela, _ in endpoints):
+        if tabela not in endpoints_planejados:
+            # Banco anterior ao ledger: aproveita o que já foi extraído
+            importar_existentes(conn, adaptador.empresa, tabela, tabela, colunas_chave)
+
+    limites = ((inicio, 0), (fim, 0)) if adaptador.anual else (inicio, fim)
+    pendentes = reservar_pendentes(
+        conn, adaptador.empresa, *limites, STATUS_A_ATUALIZAR if atualizar else STATUS_A_BUSCAR,
+        endpoints=[tabela for tabela, _ in endpoints] if filtro_endpoints else None,
+        municipios=list(prefeituras['municipio']) if filtro_municipios else None)
+    print(f"\n📋 {len(unidades)} unidades no período ({novas} novas no ledger), {len(pendentes)} a buscar")
+
+    if not pendentes:
+        conn.close()
+        print("\n✅ Nada a extrair: todas as unidades do período já foram processadas.")
+        return
+
+    buscar_unidades(adaptador, pendentes, db_file, max_workers, rate_limiter, circuit_breaker, streaming, cache)
+
+    # Unidades que sobraram em andamento (ex.: erro inesperado na thread) voltam para a fila
+    liberar_reservas(conn, adaptador.empresa)
+    conn.close()
+    print("\n\n✅ EXTRAÇÃO CONCLUÍDA!")
+
+def buscar_unidades(adaptador, pendentes, db_file, max_workers=None, rate_limiter=None, circuit_breaker=None, streaming=False, cache=None):
+    """Busca as unidades reservadas, uma thread por host, gravando tudo pelo SQLiteWriter"""
+    # Agrupa as unidades por host: cada host é atendido por uma única thread,
+    # e o rate_limiter controla o ritmo das requisições de cada host
+    unidades_por_host = {}
+    for unidade in pendentes:
+        unidades_por_host.setdefault(urlparse(unidade['url']).netloc, []).append(unidade)
+
+    rate_limiter = rate_limiter or RateLimiter()
+    circuit_breaker = circuit_breaker or CircuitBreaker()
+    streaming = streaming and adaptador.streaming
+    workers = max_workers or len(unidades_por_host)
+    print(f"🔧 Processando {len(unidades_por_host)} hosts ({workers} threads)")
+
+    # Uma sessão para todas as threads, com um pool keep-alive por host
+    session = criar_sessao(len(unidades_por_host), cabecalhos=adaptador.cabecalhos)
+    CONTADORES.zerar()
+
+    # Rede e disco em paralelo: as threads buscam e o writer grava em lotes
+    with SQLiteWriter(db_file, normalizador=Normalizador(adaptador.empresa)) as writer, \
+            ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(METRICAS.perfilado(processar_host), session, host, unidades_host, writer, rate_limiter, circuit_breaker,
+                            adaptador, streaming, cache): host
+            for host, unidades_host in unidades_por_host.items()
+        }
+        for future in as_completed(futures):
+            host = futures[future]
+            try:
+                salvos = future.result()
+                print(f"\n🏁 {host}: concluído ({salvos} períodos salvos)")
+            except Exception as e:
+                print(f"\n🔴 {host}: ERRO inesperado: {str(e)}")
+
+    session.close()
+    print(f"\n💾 {writer.linhas_gravadas} linhas gravadas em {writer.lotes_gravados} lotes")
+    print(f"🔌 HTTP: {CONTADORES}")
+    # Índices criados depois da carga, com as tabelas já preenchidas
+    with METRICAS.etapa('indices'):
+        garantir_indices(db_file, adaptador.colunas_fixas, {unidade['endpoint'] for unidade in pendentes})
+    if cache:
+        apagados, liberados = cache.podar()
+        if apagados:
+            print(f"🧹 Cache: {apagados} respostas antigas apagadas ({liberados / 1024 / 1024:.1f} MB)")
+
+def processar_host(session, host, unidades_host, writer, rate_limiter, circuit_breaker, adaptador, streaming=False, cache=None):
+    """
+    Busca, em série, as unidades reservadas de um mesmo host e as envia ao writer.
+    Com streaming=True o corpo de cada resposta é lido e gravado em lotes, sem ser carregado inteiro;
+    o de uma unidade com hash conhecido vai antes para o disco, e só é gravado se o hash mudou.
+    Com cache, os corpos com dados são guardados para a reconstrução offline.
+    """
+    salvos = 0
+
+    for unidade in unidades_host:
+        tabela = unidade['endpoint']
+        url = unidade['url']
+        periodo = f"{unidade['mes']:02d}/{unidade['ano']}" if unidade['mes'] else str(unidade['ano'])
+        ug = f" | UG {unidade['unidadegestora']}" if unidade['unidadegestora'] else ''
+        prefixo = f"🏛️ {unidade['municipio']}{ug} | {tabela} | 📅 {periodo}"
+
+        if not circuit_breaker.permitir(host):
+            # Host fora do ar: a unidade fica adiada no ledger para o modo de falhas
+            writer.registrar(montar_resultado(ADIADO, unidade['id'], erro=f"Circuito aberto para {host}",
+                                              tipo_erro=TIPO_CIRCUITO_ABERTO))
+            METRICAS.somar('adiadas', 1, tabela, host)
+            continue
+
+        inicio = time()
+        response = None
+        try:
+            fixos = {col: unidade[col] for col in adaptador.colunas_fixas}
+            # Versão nova de uma unidade já gravada substitui as linhas antigas
+            substituir = fixos if pode_ter_linhas(unidade) else None
+            response = get_com_limite(session, rate_limiter, url, timeout=30, stream=streaming,
+                                      headers=cabecalhos_condicionais(unidade), endpoint=tabela)
+            response.raise_for_status()
+            # Só uma resposta sem erro HTTP fecha o circuito (um 5xx não prova que o host voltou)
+            circuit_breaker.registrar_sucesso(host)
+            if inalterado(unidade, response):
+                print(f"{prefixo} ⚪ Não modificado (304)")
+                METRICAS.somar('inalteradas', 1, tabela, host)
+                if cache:
+                    cache.tocar(unidade['hash'])
+                writer.registrar(montar_resultado(INALTERADO, unidade['id'], http_status=response.status_code, iniciado_em=inicio))
+                continue
+            if streaming:
+                corpo, cache_fluxo = response, cache
+                if unidade.get('hash'):
+                    # Unidade com conteúdo conhecido: o corpo vai para o disco e só é gravado se o hash mudou
+                    with METRICAS.etapa('fluxo', tabela, host):
+                        lidos, hash, corpo = baixar_corpo(response, cache)
+                    if inalterado(unidade, response, hash):
+                        corpo.close()
+                        print(f"{prefixo} ⚪ Conteúdo igual ao da última busca")
+                        METRICAS.somar('inalteradas', 1, tabela, host)
+                        METRICAS.somar('bytes', lidos, tabela, host)
+                        writer.registrar(montar_resultado(INALTERADO, unidade['id'], http_status=response.status_code,
+                                                          bytes=lidos, iniciado_em=inicio))
+                        continue
+                    # Já guardado no cache por baixar_corpo
+                    cache_fluxo = None
+                # O ledger é atualizado depois do último lote da unidade
+                with METRICAS.etapa('fluxo', tabela, host):
+                    linhas, lidos, hash = gravar_em_fluxo(writer, tabela, corpo, fixos, substituir=bool(substituir), cache=cache_fluxo)
+                METRICAS.somar('bytes', lidos, tabela, host)
+                METRICAS.somar('linhas', linhas, tabela, host)
+                writer.registrar(montar_resultado(OK if linhas else VAZIO, unidade['id'], http_status=response.status_code,
+                                                  linhas=linhas, bytes=lidos, iniciado_em=inicio, **validadores(response, hash)))
+                if linhas:
+                    salvos += 1
+                    print(f"{prefixo} ✅ {linhas} linhas salvas")
+                else:
+                    print(f"{prefixo} 🟡 Resposta vazia. Ignorando.")
+                    METRICAS.somar('vazias', 1, tabela, host)
+                continue
+
+            METRICAS.somar('bytes', len(response.content), tabela, host)
+            hash = hash_conteudo(response.content)
+            if inalterado(unidade, response, hash):
+                print(f"{prefixo} ⚪ Conteúdo igual ao da última busca")
+                METRICAS.somar('inalteradas', 1, tabela, host)
+                if cache:
+                    with METRICAS.etapa('cache', tabela, host):
+                        cache.guardar(hash, response.content)
+                writer.registrar(montar_resultado(INALTERADO, unidade['id'], http_status=response.status_code,
+                                                  bytes=len(response.content), iniciado_em=inicio))
+                continue
+            if not response.content.strip():
+                print(f"{prefixo} 🟡 Resposta vazia. Ignorando.")
+                METRICAS.somar('vazias', 1, tabela, host)
+                writer.registrar(montar_resultado(VAZIO, unidade['id'], http_status=response.status_code, iniciado_em=inicio,
+                                                  **validadores(response, hash)))
+                continue
+            with METRICAS.etapa('leitura', tabela, host):
+                dados = adaptador.ler_resposta(response)
+
+            if len(dados) == 0:
+                print(f"{prefixo} 🟡 Dados vazios")
+                METRICAS.somar('vazias', 1, tabela, host)
+                writer.registrar(montar_resultado(VAZIO, unidade['id'], http_status=response.status_code,
+                                                  bytes=len(response.content), iniciado_em=inicio, **validadores(response, hash)))
+                continue
+
+            if cache:
+                with METRICAS.etapa('cache', tabela, host):
+                    cache.guardar(hash, response.content)
+            METRICAS.somar('linhas', len(dados), tabela, host)
+            # Resultado no ledger e linhas de dados entram no mesmo lote
+            adaptador.gravar(writer, tabela, dados, fixos, montar_resultado(
+                OK, unidade['id'], http_status=response.status_code, linhas=len(dados),
+                bytes=len(response.content), iniciado_em=inicio, **validadores(response, hash)), substituir)
+            salvos += 1
+            print(f"{prefixo} ✅ Dados salvos")
+
+        except Exception as e:
+            print(f"{prefixo} 🔴 ERRO: {str(e)}")
+            METRICAS.somar('erros', 1, tabela, host)
+            if eh_falha_de_conexao(e) and circuit_breaker.registrar_falha(host):
+                print(f"⚡ {host}: circuito aberto após falhas de conexão seguidas. Próximas unidades serão adiadas.")
+            http_status = response.status_code if response is not None else None
+            writer.registrar(montar_resultado(ERRO, unidade['id'], http_status=http_status, iniciado_em=inicio,
+                                              erro=f"{type(e).__name__}: {str(e)}", tipo_erro=type(e).__name__))
+        finally:
+            # Sondagem sem resultado conclusivo (ex.: RetryError, erro de leitura) não pode prender o host
+            circuit_breaker.liberar_sonda(host)
+
+    return salvos
+
+def run_failed_urls(adaptador, db_file, error_log_file=None, tipos_erro=None, ignorar_espera=False, max_workers=None,
+                    rate_limiter=None, circuit_breaker=None, streaming=False, cache=None):
+    """
+    Reprocessa as unidades com erro ou adiadas registradas no ledger.
+
+    Args:
+        error_log_file: Log de erros em texto das versões antigas, importado para o ledger se existir
+        tipos_erro: Reprocessa só estes tipos de erro (ex.: ['ReadTimeout', 'HTTPError'])
+        ignorar_espera: Tenta também as unidades cuja próxima tentativa ainda não chegou
+    """
+    conn = configurar_conexao(sqlite3.connect(db_file))
+    criar_ledger(conn)
+    liberar_reservas(conn, adaptador.empresa)
+    if error_log_file and os.path.exists(error_log_file):
+        marcadas, sem_unidade = importar_log_de_erros(conn, adaptador.empresa, error_log_file)
+        print(f"\n📥 Log de erros antigo importado: {marcadas} unidades marcadas, {sem_unidade} URLs fora do ledger")
+
+    falhas = reservar_pendentes(conn, adaptador.empresa, status=STATUS_FALHA, tipos_erro=tipos_erro, apenas_elegiveis=not ignorar_espera)
+    if not falhas:
+        print("\n✅ Nenhuma unidade com falha para reprocessar agora.")
+    else:
+        print(f"\n🔧 Reprocessando {len(falhas)} unidades com falha")
+        buscar_unidades(adaptador, falhas, db_file, max_workers, rate_limiter, circuit_breaker, streaming, cache)
+        liberar_reservas(conn, adaptador.empresa)
+
+    for status, tipo_erro, quantidade, falhas_seguidas, proxima in resumo_falhas(conn, adaptador.empresa):
+        quando = datetime.fromtimestamp(proxima).strftime("%d/%m %H:%M") if proxima else "próxima execução"
+        print(f"🔴 {status} | {tipo_erro}: {quantidade} unidades (até {falhas_seguidas} falhas seguidas, nova tentativa: {quando})")
+    conn.close()
+
+def reconstruir(adaptador, db_file, cache, filtro_endpoints=None, filtro_municipios=None, streaming=False):
+    """
+    Refaz as tabelas a partir das respostas guardadas no cache, sem acessar os portais
+    (ex.: depois de mudar o achatamento ou o tratamento de colunas de um adaptador).
+
+    Cada unidade com conteúdo conhecido no ledger é lida do cache e gravada de novo.
+    Se todas as unidades com linhas de um endpoint estão no cache (e não há filtro de
+    municípios), a tabela é recriada do zero, com as colunas que a leitura atual gera;
+    senão as linhas de cada unidade são substituídas e as demais ficam como estão.
+    Status, hashes e validadores continuam os da última busca; cada unidade regravada só
+    ganha uma versão nova no ledger, para que Consolidar e ExportParquet a copiem de novo.
+
+    Returns:
+        int: Linhas gravadas
+    """
+    conn = configurar_conexao(sqlite3.connect(db_file))
+    criar_ledger(conn)
+    liberar_reservas(conn, adaptador.empresa)
+    filtro = {endpoint.lower() for endpoint in filtro_endpoints or ()}
+    unidades = [u for u in unidades_com_conteudo(conn, adaptador.empresa, municipios=filtro_municipios)
+                if not filtro or u['endpoint'].lower() in filtro]
+
+    por_tabela = {}
+    for unidade in unidades:
+        por_tabela.setdefault(unidade['endpoint'], []).append(unidade)
+
+    colunas = ', '.join(f"{col} {_TIPOS_FIXOS[col]}" for col in adaptador.colunas_fixas)
+    recriadas = set()
+    sem_cache = 0
+    for tabela, unidades_tabela in por_tabela.items():
+        no_cache = {u['id'] for u in unidades_tabela if cache.contem(u['hash'])}
+        sem_cache += len(unidades_tabela) - len(no_cache)
+        if not filtro_municipios and no_cache and ids_com_linhas(conn, adaptador.empresa, tabela) <= no_cache:
+            for filha in descendentes(conn, tabela):
+                conn.execute(f'DROP TABLE IF EXISTS "{filha}"')
+            conn.execute(f"DROP TABLE IF EXISTS {tabela}")
+            conn.execute(f"CREATE TABLE {tabela} (id INTEGER PRIMARY KEY AUTOINCREMENT, {colunas})")
+            recriadas.add(tabela)
+    conn.commit()
+    conn.close()
+
+    print(f"\n📦 {len(unidades)} unidades com conteúdo no ledger, {len(unidades) - sem_cache} no cache "
+          f"({len(recriadas)} de {len(por_tabela)} tabelas recriadas do zero)")
+    if sem_cache:
+        print(f"🟡 {sem_cache} unidades fora do cache mantêm as linhas atuais (use o modo atualizar para baixá-las)")
+
+    streaming = streaming and adaptador.streaming
+    with SQLiteWriter(db_file, normalizador=Normalizador(adaptador.empresa)) as writer:
+        for unidade in unidades:
+            response = cache.abrir(unidade['hash'])
+            if response is None:
+                continue
+            tabela = unidade['endpoint']
+            fixos = {col: unidade[col] for col in adaptador.colunas_fixas}
+            substituir = None if tabela in recriadas else fixos
+            try:
+                if streaming:
+                    with METRICAS.etapa('fluxo', tabela):
+                        linhas, *_ = gravar_em_fluxo(writer, tabela, response, fixos, substituir=bool(substituir))
+                    METRICAS.somar('linhas', linhas, tabela)
+                    writer.registrar(regravacao(unidade['id']))
+                    continue
+                with METRICAS.etapa('leitura', tabela):
+                    dados = adaptador.ler_resposta(response)
+                METRICAS.somar('linhas', len(dados), tabela)
+                if len(dados):
+                    adaptador.gravar(writer, tabela, dados, fixos, regravacao(unidade['id']), substituir)
+            except Exception as e:
+                print(f"🔴 {unidade['municipio']} | {tabela} | {unidade['ano']}/{unidade['mes']}: ERRO ao reprocessar: {str(e)}")
+
+    print(f"\n💾 {writer.linhas_gravadas} linhas gravadas em {writer.lotes_gravados} lotes")
+    # As tabelas recriadas voltam sem índices; eles são montados uma vez, com a carga pronta
+    with METRICAS.etapa('indices'):
+        garantir_indices(db_file, adaptador.colunas_fixas, list(por_tabela))
+    print("\n✅ RECONSTRUÇÃO CONCLUÍDA!")
+    return writer.linhas_gravadas
+
+def generate_months_range(data_inicio, data_fim):
+    meses = []
+    ano_inicio, mes_inicio = data_inicio
+    ano_fim, mes_fim = data_fim
+    ano_atual, mes_atual = ano_inicio, mes_inicio
+
+    while (ano_atual < ano_fim) or (ano_atual == ano_fim and mes_atual <= mes_fim):
+        meses.append((ano_atual, mes_atual))
+        mes_atual += 1
+        if mes_atual > 12:
+            mes_atual = 1
+            ano_atual += 1
+
+    return meses
+
+def save_last_run(adaptador, last_run_file, fim):
+    with open(last_run_file, 'w') as f:
+        f.write(str(fim) if adaptador.anual else f"{fim[0]},{fim[1]}")
+
+def get_last_run(adaptador, last_run_file):
+    if not os.path.exists(last_run_file):
+        return None
+    with open(last_run_file, 'r') as f:
+        conteudo = f.read().strip()
+    if adaptador.anual:
+        return int(conteudo)
+    ano, mes = map(int, conteudo.split(','))
+    return (ano, mes)
+
+def log_execution(log_file, message):
+    timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    with open(log_file, 'a') as f:
+        f.write(f"[{timestamp}] {message}\n")
+
+def log_execution_time(log_file, start_time):
+    elapsed = time() - start_time
+    minutes, seconds = divmod(elapsed, 60)
+    timestamp = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    with open(log_file, 'a') as f:
+        f.write(f"[{timestamp}] Tempo de execução: {int(minutes)} minutos e {int(seconds)} segundos\n\n")
+
+def load_prefeituras(filename):
+    try:
+        return pd.read_csv(filename)
+    except Exception as e:
+        print(f"\n🔴 ERRO ao ler arquivo de prefeituras: {str(e)}")
+        return pd.DataFrame(columns=['prefeitura', 'municipio', 'url', 'empresa', 'unidadegestora'])
+
+def load_endpoints(filename):
+    try:
+        with open(filename, 'r', encoding='utf-8-sig') as file:
+            return [line.strip() for line in file if line.strip()]
+    except Exception as e:
+        print(f"\n🔴 ERRO ao ler arquivo de endpoints: {str(e)}")
+        return []
@@ -0,0 +1,171 @@
+"""
+Índices das tabelas dos extratores.
+
+As tabelas de cada endpoint nascem só com a chave id. Este módulo declara os índices
+que elas devem ter:
+
+    - chave da unidade: as colunas fixas do adaptador, na ordem (municipio, prefeitura,
+      ano, mes) ou (municipio, prefeitura, unidadegestora, ano). É o filtro da
+      substituição das linhas de uma unidade pelo writer e dos pipelines por município/período;
+    - analíticos: documento do favorecido/fornecedor, processo e contrato, nas tabelas
+      que têm uma coluna com um desses nomes (as colunas vêm da API e mudam por empresa).
+
+Os índices são criados depois das cargas (fim de buscar_unidades e de reconstruir), não
+antes: a primeira carga de uma tabela grava sem manter índice e o índice é montado uma
+vez, ordenando a tabela pronta. Nas cargas seguintes eles já existem e são mantidos.
+
+    python src/indices.py bds/portaltp.db      # cria o que faltar e mostra o relatório
+"""
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+
+# Papel analítico -> nomes de coluna possíveis (comparados sem acentos, maiúsculas e separadores)
+COLUNAS_ANALITICAS = {
+    'documento': ('cpfcnpj', 'cnpjcpf', 'cnpj', 'cpf', 'documento', 'documentofavorecido', 'cpfcnpjfavorecido',
+                  'cnpjcpffavorecido', 'favorecidocpfcnpj', 'favorecidodocumento', 'cpfcnpjcredor', 'cnpjcpfcredor',
+                  'credorcpfcnpj', 'credordocumento', 'cpfcnpjfornecedor', 'cnpjfornecedor', 'fornecedorcnpj',
+                  'fornecedorcpfcnpj', 'fornecedordocumento'),
+    'processo': ('processo', 'numeroprocesso', 'nprocesso', 'nrprocesso', 'processonumero', 'processoformatado'),
+    'contrato': ('contrato', 'numerocontrato', 'ncontrato', 'nrcontrato', 'contratonumero'),
+}
+
+# Linhas amostradas por índice no ANALYZE feito depois da criação
+LIMITE_ANALISE = 1000
+
+def _aspas(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+def nome_comparavel(nome):
+    sem_acentos = unicodedata.normalize('NFKD', nome).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]', '', sem_acentos.lower())
+
+def tabelas_de_dados(conn):
+    """Tabelas dos endpoints (sem as internas do SQLite e do extrator, que começam com _)"""
+    cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+    return [nome for (nome,) in cursor if not nome.startswith(('sqlite_', '_'))]
+
+def indices_declarados(conn, tabela, colunas_fixas):
+    """
+    Índices que a tabela deve ter, conforme as colunas que ela tem hoje.
+
+    Returns:
+        list: [(nome do índice, (colunas,))]
+    """
+    colunas = [row[1] for row in conn.execute(f"PRAGMA table_info({_aspas(tabela)})")]
+    declarados = []
+    chave = tuple(col for col in colunas_fixas if col in colunas)
+    if chave:
+        declarados.append((f"idx_{tabela}_unidade", chave))
+
+    por_nome = {}
+    for coluna in colunas:
+        por_nome.setdefault(nome_comparavel(coluna), coluna)
+    for nomes in COLUNAS_ANALITICAS.values():
+        for nome in nomes:
+            if nome in por_nome:
+                declarados.append((f"idx_{tabela}_{nome_comparavel(por_nome[nome])}", (por_nome[nome],)))
+    return declarados
+
+def criar_indices(conn, colunas_fixas, tabelas=None):
+    """
+    Cria os índices declarados que ainda não existem e atualiza as estatísticas deles.
+
+    Returns:
+        list: Nomes dos índices criados
+    """
+    existentes = {nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    dados = tabelas_de_dados(conn)
+    criados = []
+    for tabela in tabelas or dados:
+        if tabela not in dados:
+            continue
+        for nome, colunas in indices_declarados(conn, tabela, colunas_fixas):
+            if nome in existentes:
+                continue
+            conn.execute(f"CREATE INDEX {_aspas(nome)} ON {_aspas(tabela)} ({', '.join(map(_aspas, colunas))})")
+            existentes.add(nome)
+            criados.append(nome)
+
+    if criados:
+        # Estatística por amostragem, para o planejador escolher os índices novos
+        conn.execute(f"PRAGMA analysis_limit={LIMITE_ANALISE}")
+        for nome in criados:
+            conn.execute(f"ANALYZE {_aspas(nome)}")
+    conn.commit()
+    return criados
+
+def garantir_indices(db_file, colunas_fixas, tabelas=None):
+    """Chamado depois de cada carga: cria o que faltar nas tabelas carregadas"""
+    inicio = time.time()
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA busy_timeout=30000")
+    try:
+        criados = criar_indices(conn, colunas_fixas, tabelas)
+    finally:
+        conn.close()
+    if criados:
+        print(f"🗂️ {len(criados)} índices criados em {time.time() - inicio:.1f}s: {', '.join(criados)}")
+    return criados
+
+def _tamanhos(conn):
+    """Bytes ocupados por índice (None se o SQLite não tiver a tabela virtual dbstat)"""
+    try:
+        return dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+    except sqlite3.OperationalError:
+        return None
+
+def relatorio_indices(conn):
+    """
+    Tamanho e uso dos índices das tabelas de dados.
+
+    O SQLite não conta acessos por índice; o uso informado é a escolha do planejador para
+    a busca típica de cada índice (igualdade em todas as colunas), e a seletividade é a
+    média de linhas por chave do sqlite_stat1.
+
+    Returns:
+        list: [{'tabela', 'indice', 'colunas', 'bytes', 'linhas_por_chave', 'usado'}]
+    """
+    tamanhos = _tamanhos(conn)
+    tem_stat = conn.execute("SELECT 1 FROM sqlite_master WHERE name='sqlite_stat1'").fetchone() is not None
+    relatorio = []
+    for tabela in tabelas_de_dados(conn):
+        for _, nome, *_ in conn.execute(f"PRAGMA index_list({_aspas(tabela)})").fetchall():
+            colunas = [row[2] for row in conn.execute(f"PRAGMA index_info({_aspas(nome)})")]
+            linhas_por_chave = None
+            if tem_stat:
+                stat = conn.execute("SELECT stat FROM sqlite_stat1 WHERE idx = ?", (nome,)).fetchone()
+                if stat:
+                    linhas_por_chave = int(stat[0].split()[-1])
+            filtro = ' AND '.join(f"{_aspas(col)} = ?" for col in colunas if col)
+            plano = conn.execute(f"EXPLAIN QUERY PLAN SELECT 1 FROM {_aspas(tabela)} WHERE {filtro}",
+                                 [None] * filtro.count('?')).fetchall() if filtro else []
+            relatorio.append({
+                'tabela': tabela,
+                'indice': nome,
+                'colunas': colunas,
+                'bytes': tamanhos.get(nome) if tamanhos is not None else None,
+                'linhas_por_chave': linhas_por_chave,
+                'usado': any(f"INDEX {nome} " in f"{linha[-1]} " for linha in plano),
+            })
+    return relatorio
+
+def imprimir_relatorio(relatorio):
+    print(f"\n{'tabela':<28}{'índice':<44}{'MB':>8}{'linhas/chave':>14}  uso")
+    for linha in relatorio:
+        mb = '?' if linha['bytes'] is None else f"{linha['bytes'] / 1024 / 1024:.1f}"
+        seletividade = '?' if linha['linhas_por_chave'] is None else str(linha['linhas_por_chave'])
+        print(f"{linha['tabela']:<28}{linha['indice']:<44}{mb:>8}{seletividade:>14}  {'✅' if linha['usado'] else '⚪'}")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Uso: python src/indices.py <banco.db>")
+        sys.exit(1)
+    # As colunas fixas de todos os adaptadores; só as que existem em cada tabela entram na chave
+    colunas_fixas = ('municipio', 'prefeitura', 'unidadegestora', 'ano', 'mes')
+    garantir_indices(sys.argv[1], colunas_fixas)
+    conn = sqlite3.connect(sys.argv[1])
+    imprimir_relatorio(relatorio_indices(conn))
+    conn.close()
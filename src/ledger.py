@@ -0,0 +1,343 @@
+"""
+Livro-razão (ledger) das unidades de extração.
+
+Cada unidade é uma combinação (empresa, endpoint, município, unidade gestora, período)
+e fica registrada na tabela _ledger do próprio banco da empresa, junto com o status,
+o código HTTP, a quantidade de linhas e bytes e os tempos da última tentativa.
+Como o ledger mora no mesmo banco dos dados, o resultado de uma unidade e as linhas
+que ela gerou são gravados na mesma transação. O hash do conteúdo e os validadores HTTP
+(ETag / Last-Modified) da última busca permitem revalidar a unidade depois (condicional.py).
+
+O ledger também é o registro de falhas: cada unidade com erro guarda o tipo do erro,
+quantas falhas seguidas teve e a partir de quando pode ser tentada de novo, e o
+reprocessamento é uma consulta indexada por (empresa, status, tipo_erro).
+
+Cada mudança nas linhas de uma unidade (resultado gravado pelo extrator, ou linhas
+regravadas pela reconstrução) recebe uma versão nova, crescente no banco, dentro da
+transação que grava as linhas. Quem copia os dados (Consolidar, ExportParquet) guarda a
+maior versão lida antes da cópia e, na execução seguinte, refaz só as unidades com versão
+maior: ao contrário de um horário, a versão só fica visível junto com as linhas.
+"""
+import os
+import re
+from time import time
+
+PENDENTE = 'pendente'
+EM_ANDAMENTO = 'em_andamento'
+OK = 'ok'
+VAZIO = 'vazio'
+ERRO = 'erro'
+ADIADO = 'adiado'
+# Revalidada sem mudanças (304 ou mesmo hash): as linhas da última busca continuam valendo
+INALTERADO = 'inalterado'
+
+# Status que ainda precisam ser buscados numa extração normal
+STATUS_A_BUSCAR = (PENDENTE, ERRO, ADIADO)
+# Status buscados numa atualização: tudo, inclusive o que já foi extraído
+STATUS_A_ATUALIZAR = STATUS_A_BUSCAR + (OK, VAZIO, INALTERADO)
+
+# Status reprocessados pelo modo de falhas
+STATUS_FALHA = (ERRO, ADIADO)
+# Status cujas linhas no banco vieram do conteúdo identificado pelo hash (refeitas a partir do cache)
+STATUS_COM_CONTEUDO = (OK, INALTERADO)
+
+# Status que não mexem nas linhas da unidade: linhas e validadores da última busca são mantidos
+_STATUS_SEM_DADOS_NOVOS = (INALTERADO, ADIADO)
+
+# Tipo de erro registrado para unidades adiadas pelo circuit breaker
+TIPO_CIRCUITO_ABERTO = 'CircuitoAberto'
+
+# Espera antes de tentar de novo uma unidade com erro: dobra a cada falha seguida, até o máximo
+ATRASO_BASE = 5 * 60
+ATRASO_MAXIMO = 24 * 60 * 60
+
+# Colunas acrescentadas depois da primeira versão do ledger
+_COLUNAS_NOVAS = {
+    'hash': 'TEXT',
+    'etag': 'TEXT',
+    'last_modified': 'TEXT',
+    'tipo_erro': 'TEXT',
+    'falhas_seguidas': 'INTEGER NOT NULL DEFAULT 0',
+    'proxima_tentativa': 'REAL',
+    'versao': 'INTEGER',
+}
+
+# Próxima versão do ledger, calculada dentro da transação de escrita (o SQLite serializa as escritas)
+_PROXIMA_VERSAO = "(SELECT COALESCE(MAX(versao), 0) + 1 FROM _ledger)"
+
+CAMPOS_UNIDADE = ('empresa', 'endpoint', 'municipio', 'prefeitura', 'unidadegestora', 'ano', 'mes', 'url')
+
+def criar_ledger(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS _ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            empresa TEXT NOT NULL,
+            endpoint TEXT NOT NULL,
+            municipio TEXT NOT NULL,
+            prefeitura TEXT,
+            unidadegestora TEXT NOT NULL DEFAULT '',
+            ano INTEGER NOT NULL,
+            mes INTEGER NOT NULL DEFAULT 0,
+            url TEXT,
+            status TEXT NOT NULL DEFAULT 'pendente',
+            http_status INTEGER,
+            linhas INTEGER,
+            bytes INTEGER,
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            iniciado_em REAL,
+            concluido_em REAL,
+            duracao REAL,
+            erro TEXT,
+            hash TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            tipo_erro TEXT,
+            falhas_seguidas INTEGER NOT NULL DEFAULT 0,
+            proxima_tentativa REAL,
+            versao INTEGER,
+            UNIQUE (empresa, endpoint, municipio, unidadegestora, ano, mes)
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_status ON _ledger (empresa, status, ano, mes)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_url ON _ledger (url)")
+    existentes = {row[1] for row in conn.execute("PRAGMA table_info(_ledger)")}
+    for coluna, tipo in _COLUNAS_NOVAS.items():
+        if coluna not in existentes:
+            conn.execute(f"ALTER TABLE _ledger ADD COLUMN {coluna} {tipo}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_falhas ON _ledger (empresa, status, tipo_erro, proxima_tentativa)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_versao ON _ledger (versao)")
+    conn.commit()
+
+def endpoints_no_ledger(conn, empresa):
+    """Endpoints que já têm unidades registradas para a empresa"""
+    cursor = conn.execute("SELECT DISTINCT endpoint FROM _ledger WHERE empresa = ?", (empresa,))
+    return {row[0] for row in cursor.fetchall()}
+
+def planejar_unidades(conn, unidades):
+    """
+    Registra as unidades de trabalho (dicts com CAMPOS_UNIDADE) que ainda não existem no ledger.
+
+    Returns:
+        int: Quantidade de unidades novas
+    """
+    antes = conn.total_changes
+    conn.executemany(f'''
+        INSERT OR IGNORE INTO _ledger ({', '.join(CAMPOS_UNIDADE)})
+        VALUES ({', '.join('?' for _ in CAMPOS_UNIDADE)})
+    ''', ([unidade.get(campo, '' if campo == 'unidadegestora' else None) for campo in CAMPOS_UNIDADE] for unidade in unidades))
+    conn.commit()
+    return conn.total_changes - antes
+
+def importar_existentes(conn, empresa, endpoint, tabela, colunas_chave):
+    """
+    Marca como OK as unidades cujos dados já estão na tabela do endpoint.
+
+    Usado uma única vez por endpoint, para bancos criados antes do ledger: faz uma só
+    varredura na tabela de dados em vez de um SELECT por unidade.
+
+    Args:
+        colunas_chave: Colunas da tabela de dados que identificam a unidade, na ordem
+                       (municipio, unidadegestora, ano, mes); use None para as ausentes
+    """
+    existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (tabela,)).fetchone()
+    if not existe:
+        return 0
+
+    selecao = ', '.join(col if col else "''" if i == 1 else '0' for i, col in enumerate(colunas_chave))
+    chaves = conn.execute(f"SELECT DISTINCT {selecao} FROM {tabela}").fetchall()
+    antes = conn.total_changes
+    conn.executemany('''
+        UPDATE _ledger SET status = 'ok'
+        WHERE empresa = ? AND endpoint = ? AND municipio = ? AND unidadegestora = ? AND ano = ? AND mes = ?
+    ''', ((empresa, endpoint, municipio, str(ug), ano, mes) for municipio, ug, ano, mes in chaves))
+    conn.commit()
+    return conn.total_changes - antes
+
+def liberar_reservas(conn, empresa):
+    """Devolve para a fila as unidades que ficaram presas em andamento (execução interrompida)"""
+    conn.execute("UPDATE _ledger SET status = ? WHERE empresa = ? AND status = ?", (PENDENTE, empresa, EM_ANDAMENTO))
+    conn.commit()
+
+def reservar_pendentes(conn, empresa, periodo_inicio=None, periodo_fim=None, status=STATUS_A_BUSCAR, endpoints=None, municipios=None,
+                       tipos_erro=None, apenas_elegiveis=True):
+    """
+    Reserva em lote as unidades a buscar e as devolve como dicts.
+
+    Args:
+        periodo_inicio, periodo_fim: Tuplas (ano, mes) inclusivas; use mes=0 para períodos anuais.
+                                     Sem período, reserva unidades de qualquer ano
+        status: Status que devem ser buscados
+        endpoints: Restringe a reserva a estes endpoints (opcional)
+        municipios: Restringe a reserva a estes municípios (opcional)
+        tipos_erro: Restringe a reserva a unidades com estes tipos de erro (opcional)
+        apenas_elegiveis: Ignora unidades com erro cuja próxima tentativa ainda não chegou
+    """
+    filtros = [f"status IN ({', '.join('?' for _ in status)})", "empresa = ?"]
+    params = list(status) + [empresa]
+    if periodo_inicio and periodo_fim:
+        filtros.append("(ano * 100 + mes) BETWEEN ? AND ?")
+        params.extend([periodo_inicio[0] * 100 + periodo_inicio[1], periodo_fim[0] * 100 + periodo_fim[1]])
+    if endpoints:
+        filtros.append(f"endpoint IN ({', '.join('?' for _ in endpoints)})")
+        params.extend(endpoints)
+    if municipios:
+        filtros.append(f"municipio IN ({', '.join('?' for _ in municipios)})")
+        params.extend(municipios)
+    if tipos_erro:
+        filtros.append(f"tipo_erro IN ({', '.join('?' for _ in tipos_erro)})")
+        params.extend(tipos_erro)
+    if apenas_elegiveis:
+        filtros.append("(proxima_tentativa IS NULL OR proxima_tentativa <= ?)")
+        params.append(time())
+
+    cursor = conn.execute(f"SELECT * FROM _ledger WHERE {' AND '.join(filtros)} ORDER BY id", params)
+    colunas = [col[0] for col in cursor.description]
+    unidades = [dict(zip(colunas, row)) for row in cursor.fetchall()]
+
+    conn.executemany("UPDATE _ledger SET status = ? WHERE id = ?", ((EM_ANDAMENTO, unidade['id']) for unidade in unidades))
+    conn.commit()
+    return unidades
+
+def unidades_com_conteudo(conn, empresa, endpoints=None, municipios=None):
+    """Unidades com linhas gravadas a partir de um conteúdo conhecido (hash), sem reservá-las"""
+    filtros = [f"status IN ({', '.join('?' for _ in STATUS_COM_CONTEUDO)})", "empresa = ?", "hash IS NOT NULL"]
+    params = list(STATUS_COM_CONTEUDO) + [empresa]
+    if endpoints:
+        filtros.append(f"endpoint IN ({', '.join('?' for _ in endpoints)})")
+        params.extend(endpoints)
+    if municipios:
+        filtros.append(f"municipio IN ({', '.join('?' for _ in municipios)})")
+        params.extend(municipios)
+
+    cursor = conn.execute(f"SELECT * FROM _ledger WHERE {' AND '.join(filtros)} ORDER BY id", params)
+    colunas = [col[0] for col in cursor.description]
+    return [dict(zip(colunas, row)) for row in cursor.fetchall()]
+
+def ids_com_linhas(conn, empresa, endpoint):
+    """Ids das unidades do endpoint que podem ter linhas no banco (já buscadas ou importadas, e não vazias)"""
+    return {row[0] for row in conn.execute(
+        "SELECT id FROM _ledger WHERE empresa = ? AND endpoint = ? AND status != ? AND (status != ? OR tentativas > 0)",
+        (empresa, endpoint, VAZIO, PENDENTE))}
+
+def registrar_resultado(conn, unidade_id, status, http_status=None, linhas=0, bytes=0, iniciado_em=None, erro=None, concluido_em=None,
+                        hash=None, etag=None, last_modified=None, tipo_erro=None):
+    """
+    Atualiza o resultado de uma unidade. Não faz commit: quem chama grava os dados
+    e confirma a transação, para que ledger e dados fiquem consistentes.
+
+    Unidades INALTERADO ou ADIADO mantêm as linhas e os validadores da última busca;
+    nos demais status os validadores são substituídos (um erro os apaga, forçando a
+    próxima busca a baixar o conteúdo inteiro).
+
+    Um ERRO soma uma falha seguida e adia a próxima tentativa (ATRASO_BASE, dobrando a
+    cada falha, até ATRASO_MAXIMO); uma unidade ADIADO pode ser tentada já na próxima
+    execução; os demais status zeram a contagem.
+
+    Sem status (ver regravacao), só a versão da unidade muda: as linhas foram regravadas
+    sem uma busca nova. Os status que mexem nas linhas também recebem uma versão nova.
+    """
+    if status is None:
+        conn.execute(f"UPDATE _ledger SET versao = {_PROXIMA_VERSAO} WHERE id = ?", (unidade_id,))
+        return
+    agora = concluido_em or time()
+    duracao = agora - iniciado_em if iniciado_em else None
+    if status == ERRO:
+        falhas = "falhas_seguidas + 1"
+        proxima = f"? + MIN({ATRASO_BASE} * (1 << MIN(falhas_seguidas, 16)), {ATRASO_MAXIMO})"
+        params_proxima = (agora,)
+    else:
+        falhas = "falhas_seguidas" if status == ADIADO else "0"
+        proxima = "NULL"
+        params_proxima = ()
+
+    if status in _STATUS_SEM_DADOS_NOVOS:
+        conn.execute(f'''
+            UPDATE _ledger
+            SET status = ?, http_status = ?, bytes = ?, tentativas = tentativas + 1,
+                iniciado_em = ?, concluido_em = ?, duracao = ?, erro = ?, tipo_erro = ?,
+                proxima_tentativa = {proxima}, falhas_seguidas = {falhas}
+            WHERE id = ?
+        ''', (status, http_status, bytes, iniciado_em, agora, duracao, erro, tipo_erro, *params_proxima, unidade_id))
+        return
+    conn.execute(f'''
+        UPDATE _ledger
+        SET status = ?, http_status = ?, linhas = ?, bytes = ?, tentativas = tentativas + 1,
+            iniciado_em = ?, concluido_em = ?, duracao = ?, erro = ?, hash = ?, etag = ?, last_modified = ?,
+            tipo_erro = ?, proxima_tentativa = {proxima}, falhas_seguidas = {falhas}, versao = {_PROXIMA_VERSAO}
+        WHERE id = ?
+    ''', (status, http_status, linhas, bytes, iniciado_em, agora, duracao, erro, hash, etag, last_modified,
+          tipo_erro, *params_proxima, unidade_id))
+
+def montar_resultado(status, unidade_id, http_status=None, linhas=0, bytes=0, iniciado_em=None, erro=None,
+                     hash=None, etag=None, last_modified=None, tipo_erro=None):
+    """Resultado de uma unidade no formato aceito pelo SQLiteWriter"""
+    return {'unidade_id': unidade_id, 'status': status, 'http_status': http_status, 'linhas': linhas, 'bytes': bytes,
+            'iniciado_em': iniciado_em, 'erro': erro, 'concluido_em': time(),
+            'hash': hash, 'etag': etag, 'last_modified': last_modified, 'tipo_erro': tipo_erro}
+
+def regravacao(unidade_id):
+    """Resultado que só marca a unidade como regravada (nova versão), sem mudar status e validadores"""
+    return {'unidade_id': unidade_id, 'status': None}
+
+def versao_atual(conn, esquema='main'):
+    """Maior versão do ledger (0 sem nenhuma); None se o ledger não existir ou for anterior às versões"""
+    colunas = {row[1] for row in conn.execute(f"PRAGMA {esquema}.table_info(_ledger)")}
+    if 'versao' not in colunas:
+        return None
+    return conn.execute(f"SELECT COALESCE(MAX(versao), 0) FROM {esquema}._ledger").fetchone()[0]
+
+def resumo_falhas(conn, empresa):
+    """
+    Falhas pendentes da empresa agrupadas por status e tipo de erro.
+
+    Returns:
+        list: Tuplas (status, tipo_erro, unidades, maior sequência de falhas, próxima tentativa mais cedo)
+    """
+    return conn.execute(f'''
+        SELECT status, COALESCE(tipo_erro, '?'), COUNT(*), MAX(falhas_seguidas), MIN(proxima_tentativa)
+        FROM _ledger
+        WHERE empresa = ? AND status IN ({', '.join('?' for _ in STATUS_FALHA)})
+        GROUP BY status, tipo_erro
+        ORDER BY COUNT(*) DESC
+    ''', (empresa, *STATUS_FALHA)).fetchall()
+
+def _tipo_erro_do_log(mensagem):
+    """Tipo de erro de uma linha do log antigo ('Adiado|...', 'HTTPError|...', 'Erro: ReadTimeout - ...')"""
+    if mensagem.startswith('Adiado'):
+        return TIPO_CIRCUITO_ABERTO
+    tipos = re.findall(r'\b[A-Z]\w*(?:Error|Exception|Timeout)\b', mensagem)
+    return tipos[0] if tipos else 'Desconhecido'
+
+def importar_log_de_erros(conn, empresa, error_log_file):
+    """
+    Importa uma única vez o log de erros em texto das versões antigas ("data | URL | erro").
+
+    Cada URL do log marca a unidade correspondente do ledger como ERRO (se ela ainda não
+    foi extraída), já elegível para nova tentativa; o arquivo é então renomeado para
+    `.importado`, para não ser lido de novo.
+
+    Returns:
+        tuple: (unidades marcadas, URLs sem unidade correspondente no ledger)
+    """
+    falhas = {}
+    with open(error_log_file, 'r', encoding='utf-8', errors='replace') as f:
+        for linha in f:
+            partes = [parte.strip() for parte in linha.split('|', 2)]
+            if len(partes) == 3 and partes[1]:
+                falhas[partes[1]] = partes[2].replace('|', ': ')
+
+    marcadas = 0
+    sem_unidade = 0
+    for url, mensagem in falhas.items():
+        cursor = conn.execute(f'''
+            UPDATE _ledger
+            SET status = ?, erro = ?, tipo_erro = ?, proxima_tentativa = NULL, falhas_seguidas = MAX(falhas_seguidas, 1)
+            WHERE empresa = ? AND url = ? AND status IN ({', '.join('?' for _ in STATUS_A_BUSCAR)})
+        ''', (ERRO, mensagem, _tipo_erro_do_log(mensagem), empresa, url, *STATUS_A_BUSCAR))
+        if cursor.rowcount:
+            marcadas += cursor.rowcount
+        elif not conn.execute("SELECT 1 FROM _ledger WHERE empresa = ? AND url = ?", (empresa, url)).fetchone():
+            sem_unidade += 1
+    conn.commit()
+    os.replace(error_log_file, error_log_file + '.importado')
+    return marcadas, sem_unidade
@@ -0,0 +1,254 @@
+"""
+Métricas por etapa das execuções dos extratores.
+
+O log de execução só guarda o tempo total de cada opção. METRICAS acumula, durante a
+execução, o tempo de cada etapa do caminho quente e contadores, por endpoint e host:
+
+    - espera: fila do rate limiter antes de cada requisição;
+    - http: da requisição à resposta (com o corpo, fora do modo streaming), com o
+      histograma de latência por endpoint/host;
+    - leitura: parse do JSON e achatamento (adaptador.ler_resposta);
+    - fluxo: modo streaming, leitura e envio ao writer juntos (inclui filhas,
+      normalizacao e fila dos lotes);
+    - filhas: separação dos arrays de objetos em tabelas filhas;
+    - normalizacao: conversão das colunas tipadas;
+    - fila: espera por espaço na fila do writer (contrapressão do disco);
+    - cache: compressão e gravação das respostas no cache;
+    - schema, substituicao, insercao, commit: gravador (ALTER/CREATE das tabelas,
+      DELETE das linhas antigas de uma unidade, executemany, commit com o ledger);
+    - indices: criação dos índices depois da carga.
+
+Os tempos são somados em todas as threads (rede, gravador e principal), então a soma
+das etapas passa do tempo total quando há paralelismo. Contadores: requisicoes, retries,
+bytes, linhas, erros, inalteradas, vazias e linhas_gravadas.
+
+No fim de cada execução, extrator.executar grava logs/metricas/<prefixo>_<data>.json e
+imprime o resumo. Com perfil=True (main.py --perfil) o cProfile roda em cada thread e as
+estatísticas, juntadas, vão para um .prof ao lado do relatório (pstats ou snakeviz); as
+funções mais caras entram no relatório. Um perfilador por amostragem (py-spy) pode ser
+anexado de fora ao processo, sem nada daqui.
+"""
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from time import perf_counter, time
+
+# Limites superiores (ms) das faixas do histograma de latência; a última faixa é "acima de"
+FAIXAS_LATENCIA_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Funções do perfil listadas no relatório e no resumo
+FUNCOES_PERFIL = 25
+
+def _percentil(faixas, p):
+    """Limite superior da faixa que contém o percentil p (None se acima da última)"""
+    total = sum(faixas)
+    alvo = p / 100 * total
+    acumulado = 0
+    for limite, quantidade in zip(FAIXAS_LATENCIA_MS, faixas):
+        acumulado += quantidade
+        if acumulado >= alvo:
+            return limite
+    return None
+
+class Perfil:
+    """cProfile em várias threads: cada thread perfila o próprio trecho e as estatísticas são juntadas no fim"""
+
+    def __init__(self):
+        self._perfis = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def perfilar(self):
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Outro perfilador já ativo (ex.: python -m cProfile): a thread segue sem perfil
+            yield
+            return
+        try:
+            yield
+        finally:
+            perfil.disable()
+            with self._lock:
+                self._perfis.append(perfil)
+
+    def estatisticas(self):
+        with self._lock:
+            perfis = [perfil for perfil in self._perfis if perfil.getstats()]
+        return pstats.Stats(*perfis) if perfis else None
+
+    def funcoes(self, stats, quantidade=FUNCOES_PERFIL):
+        """As funções com maior tempo acumulado"""
+        funcoes = []
+        for (arquivo, linha, nome), (_, chamadas, proprio, acumulado, _) in stats.stats.items():
+            funcoes.append({'funcao': f"{os.path.basename(arquivo)}:{linha}({nome})", 'chamadas': chamadas,
+                            'proprio_s': round(proprio, 4), 'acumulado_s': round(acumulado, 4)})
+        funcoes.sort(key=lambda f: f['acumulado_s'], reverse=True)
+        return funcoes[:quantidade]
+
+class Metricas:
+    """Tempos por etapa e contadores de uma execução, seguros para uso por várias threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.iniciar()
+
+    def iniciar(self, empresa=None, perfil=False):
+        """Zera as métricas para uma nova execução"""
+        with self._lock:
+            self.empresa = empresa
+            self.inicio = time()
+            self._etapas = {}
+            self._contadores = {}
+            self._latencias = {}
+            self.perfil = Perfil() if perfil else None
+
+    def tempo(self, etapa, segundos, endpoint=None, host=None):
+        chave = (etapa, endpoint, host)
+        with self._lock:
+            acumulado = self._etapas.get(chave)
+            if acumulado is None:
+                self._etapas[chave] = [1, segundos]
+            else:
+                acumulado[0] += 1
+                acumulado[1] += segundos
+
+    @contextmanager
+    def etapa(self, etapa, endpoint=None, host=None):
+        inicio = perf_counter()
+        try:
+            yield
+        finally:
+            self.tempo(etapa, perf_counter() - inicio, endpoint, host)
+
+    def somar(self, contador, quantidade=1, endpoint=None, host=None):
+        chave = (contador, endpoint, host)
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + quantidade
+
+    def latencia(self, segundos, endpoint=None, host=None):
+        """Tempo de uma requisição: entra na etapa http e no histograma do endpoint/host"""
+        self.tempo('http', segundos, endpoint, host)
+        faixa = bisect_left(FAIXAS_LATENCIA_MS, segundos * 1000)
+        with self._lock:
+            faixas = self._latencias.get((endpoint, host))
+            if faixas is None:
+                faixas = self._latencias[(endpoint, host)] = [0] * (len(FAIXAS_LATENCIA_MS) + 1)
+            faixas[faixa] += 1
+
+    def perfilar(self):
+        """Contexto que perfila a thread atual, se o perfil estiver ligado"""
+        return self.perfil.perfilar() if self.perfil else nullcontext()
+
+    def perfilado(self, funcao):
+        """`funcao` executada dentro de perfilar() (alvo de threads e executores)"""
+        @functools.wraps(funcao)
+        def executar(*args, **kwargs):
+            with self.perfilar():
+                return funcao(*args, **kwargs)
+        return executar
+
+    def relatorio(self):
+        """Métricas da execução como dict (o JSON gravado por salvar)"""
+        with self._lock:
+            etapas = {chave: list(valor) for chave, valor in self._etapas.items()}
+            contadores = dict(self._contadores)
+            latencias = {chave: list(faixas) for chave, faixas in self._latencias.items()}
+
+        por_etapa = {}
+        for (etapa, _, _), (chamadas, segundos) in etapas.items():
+            total = por_etapa.setdefault(etapa, {'chamadas': 0, 'segundos': 0.0})
+            total['chamadas'] += chamadas
+            total['segundos'] += segundos
+        for total in por_etapa.values():
+            total['segundos'] = round(total['segundos'], 4)
+
+        rotulos = [f"<={limite}" for limite in FAIXAS_LATENCIA_MS] + [f">{FAIXAS_LATENCIA_MS[-1]}"]
+        return {
+            'empresa': self.empresa,
+            'inicio': datetime.fromtimestamp(self.inicio).isoformat(timespec='seconds'),
+            'duracao_s': round(time() - self.inicio, 3),
+            'por_etapa': dict(sorted(por_etapa.items(), key=lambda item: item[1]['segundos'], reverse=True)),
+            'etapas': sorted(({'etapa': etapa, 'endpoint': endpoint, 'host': host, 'chamadas': chamadas,
+                               'segundos': round(segundos, 4)}
+                              for (etapa, endpoint, host), (chamadas, segundos) in etapas.items()),
+                             key=lambda item: item['segundos'], reverse=True),
+            'contadores': [{'contador': contador, 'endpoint': endpoint, 'host': host, 'valor': valor}
+                           for (contador, endpoint, host), valor in sorted(contadores.items(), key=str)],
+            'latencias': [{'endpoint': endpoint, 'host': host, 'requisicoes': sum(faixas),
+                           'p50_ms': _percentil(faixas, 50), 'p90_ms': _percentil(faixas, 90), 'p99_ms': _percentil(faixas, 99),
+                           'faixas_ms': dict(zip(rotulos, faixas))}
+                          for (endpoint, host), faixas in sorted(latencias.items(), key=str)],
+        }
+
+    def salvar(self, pasta, prefixo, extras=None):
+        """
+        Grava o relatório JSON (e o .prof, com o perfil ligado) e imprime o resumo.
+
+        Args:
+            pasta: Pasta dos relatórios (criada se não existir)
+            prefixo: Início do nome dos arquivos (Adaptador.prefixo_logs)
+            extras: Chaves acrescentadas ao relatório (ex.: contadores HTTP)
+
+        Returns:
+            str: Caminho do relatório
+        """
+        os.makedirs(pasta, exist_ok=True)
+        base = os.path.join(pasta, f"{prefixo}_{datetime.fromtimestamp(self.inicio).strftime('%Y%m%d_%H%M%S')}")
+        relatorio = self.relatorio()
+        relatorio.update(extras or {})
+        stats = self.perfil.estatisticas() if self.perfil else None
+        if stats:
+            stats.dump_stats(base + '.prof')
+            relatorio['perfil'] = {'arquivo': base + '.prof', 'funcoes': self.perfil.funcoes(stats)}
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        imprimir_resumo(relatorio)
+        print(f"📊 Relatório de métricas: {base}.json")
+        return base + '.json'
+
+def imprimir_resumo(relatorio, endpoints=10):
+    """Resumo legível do relatório: etapas, endpoints/hosts mais lentos e o perfil"""
+    print(f"\n📊 Etapas ({relatorio['duracao_s']:.1f}s de execução; tempos somados em todas as threads)")
+    for etapa, total in relatorio['por_etapa'].items():
+        media = total['segundos'] / total['chamadas'] * 1000 if total['chamadas'] else 0
+        print(f"  {etapa:<14}{total['segundos']:>10.2f}s{total['chamadas']:>9} chamadas{media:>10.1f} ms/chamada")
+
+    contadores = {}
+    for item in relatorio['contadores']:
+        contadores.setdefault((item['endpoint'], item['host']), {})[item['contador']] = item['valor']
+    http = {(item['endpoint'], item['host']): item['segundos'] for item in relatorio['etapas'] if item['etapa'] == 'http'}
+
+    def lentidao(item):
+        # p99 None: acima da última faixa do histograma; empate decidido pelo tempo total em http
+        p99 = float('inf') if item['p99_ms'] is None else item['p99_ms']
+        return p99, http.get((item['endpoint'], item['host']), 0)
+
+    latencias = sorted(relatorio['latencias'], key=lentidao, reverse=True)
+    if latencias:
+        print("\n  Endpoints/hosts mais lentos (p99, depois tempo total em http)")
+        print(f"  {'endpoint':<32}{'host':<28}{'req':>6}{'http s':>9}{'p50':>8}{'p99':>8}{'MB':>9}{'linhas':>10}{'retries':>8}")
+    acima = f">{FAIXAS_LATENCIA_MS[-1]}"
+    for item in latencias[:endpoints]:
+        chave = (item['endpoint'], item['host'])
+        valores = contadores.get(chave, {})
+        p50 = acima if item['p50_ms'] is None else item['p50_ms']
+        p99 = acima if item['p99_ms'] is None else item['p99_ms']
+        print(f"  {str(item['endpoint'])[:31]:<32}{str(item['host'])[:27]:<28}{item['requisicoes']:>6}{http.get(chave, 0):>9.2f}"
+              f"{p50:>8}{p99:>8}{valores.get('bytes', 0) / 1024 / 1024:>9.1f}{valores.get('linhas', 0):>10}"
+              f"{valores.get('retries', 0):>8}")
+
+    perfil = relatorio.get('perfil')
+    if perfil:
+        print(f"\n🔬 Perfil: {perfil['arquivo']}")
+        for funcao in perfil['funcoes'][:10]:
+            print(f"  {funcao['acumulado_s']:>9.2f}s {funcao['proprio_s']:>9.2f}s {funcao['chamadas']:>9}  {funcao['funcao']}")
+
+METRICAS = Metricas()
@@ -0,0 +1,205 @@
+"""
+Normalização tipada das colunas antes da gravação.
+
+Sem especificação, o tipo de uma coluna nova é o que a primeira amostra sugere, e valores,
+datas e documentos chegam como texto ('R$ 1.234,56', '2024-01-02T00:00:00',
+'12.345.678/0001-90'). data/tipos_colunas.json declara, por empresa e por endpoint, o
+tipo das colunas conhecidas:
+
+    {
+      "*":         {"*": {"valor": "dinheiro", "dataassinatura": "data", "cpfcnpj": "documento"}},
+      "tectrilha": {"*": {"anoprocesso": "inteiro"}},
+      "agape&alphatec": {"pagamentos": {"credor_cpfcnpj": "documento"}}
+    }
+
+"*" vale para todas as empresas/endpoints; a entrada mais específica prevalece. Os nomes
+são comparados sem acentos, maiúsculas e separadores (Valor, valor e VALOR casam). Tipos:
+
+    - dinheiro: REAL; aceita número, '1234.56' e o formato brasileiro 'R$ 1.234,56';
+    - data: INTEGER com dias desde 1970-01-01; aceita ISO (com ou sem hora) e DD/MM/AAAA.
+      No SQLite: date(coluna * 86400, 'unixepoch');
+    - documento: VARCHAR(14) (afinidade TEXT) só com os dígitos do CPF (11) ou CNPJ (14);
+      números perdem os zeros à esquerda na API e são completados;
+    - inteiro: INTEGER; aceita 2023, 2023.0 e '2023'.
+
+Cada lote é convertido coluna a coluna com operações vetorizadas do pandas. Um valor que
+não pode ser convertido fica como veio (nada se perde).
+
+Só são convertidas as colunas novas e as que já estão declaradas com o tipo de destino.
+Uma coluna existente com outro tipo (ex.: Valor TEXT de um banco antigo) continua
+recebendo os valores como vêm da API, para não misturar 'R$ 1.234,56' e 1234.56 nem
+'2024-01-02' e 19724 na mesma coluna. Para tipá-la, converta os dados e mude o tipo com
+Pipelines/MigrarSchema.py (--tipo contratos.Valor:REAL, documentos com VARCHAR(14)), ou
+refaça a tabela a partir do cache com o modo reconstruir do extrator.
+"""
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from indices import nome_comparavel
+
+ARQUIVO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'tipos_colunas.json')
+
+# Tipo SQLite da coluna criada para cada tipo de normalização
+# (documento: o tamanho distingue as colunas normalizadas das colunas TEXT antigas)
+TIPOS_SQLITE = {'dinheiro': 'REAL', 'data': 'INTEGER', 'documento': 'VARCHAR(14)', 'inteiro': 'INTEGER'}
+
+_EPOCA = pd.Timestamp('1970-01-01')
+
+_NUMERICOS = ('integer', 'floating', 'mixed-integer-float', 'decimal')
+
+def _mesclar(serie, convertidos, vazios=None):
+    """Série com os valores convertidos onde houve conversão; o resto fica como veio (vazios viram None)"""
+    saida = pd.Series(serie.tolist(), index=serie.index, dtype=object)
+    validos = convertidos.dropna()
+    saida[validos.index] = pd.Series(validos.tolist(), index=validos.index, dtype=object)
+    if vazios is not None:
+        saida[vazios] = None
+    return saida
+
+def _texto(serie):
+    """Só os valores de texto da série (NaN nos demais), para usar o acessor .str"""
+    inferido = pd.api.types.infer_dtype(serie, skipna=True)
+    if inferido == 'string':
+        return serie
+    if inferido in _NUMERICOS + ('empty', 'boolean'):
+        return pd.Series(float('nan'), index=serie.index, dtype=object)
+    return serie.where(serie.map(lambda valor: isinstance(valor, str)))
+
+def normalizar_dinheiro(serie):
+    if pd.api.types.infer_dtype(serie, skipna=True) in _NUMERICOS:
+        # Caso comum: a API já manda números
+        return serie
+    texto = _texto(serie).str.replace(r'[R$\s]', '', regex=True)
+    brasileiro = texto.str.contains(',', regex=False, na=False)
+    texto = texto.mask(brasileiro, texto.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    valores = pd.to_numeric(texto, errors='coerce')
+    # Valores que já vieram como número
+    valores = valores.fillna(pd.to_numeric(serie.where(texto.isna()), errors='coerce'))
+    return _mesclar(serie, valores, texto == '')
+
+def normalizar_data(serie):
+    # Só a parte da data: a hora e o fuso não mudam o dia do calendário informado
+    texto = _texto(serie).str.slice(0, 10)
+    datas = pd.to_datetime(texto, format='%Y-%m-%d', errors='coerce')
+    faltantes = datas.isna() & texto.notna()
+    vazios = None
+    if faltantes.any():
+        restantes = texto[faltantes].str.strip()
+        datas[faltantes] = pd.to_datetime(restantes, format='%d/%m/%Y', errors='coerce')
+        vazios = restantes.index[restantes == '']
+    dias = (datas - _EPOCA).dt.days
+    return _mesclar(serie, dias.dropna().astype('int64'), vazios)
+
+def normalizar_documento(serie):
+    texto = _texto(serie)
+    if texto is serie:
+        # Caso comum: já vem só com os dígitos
+        valores = serie.to_numpy(dtype=str)
+        if np.char.isdigit(valores).all() and np.isin(np.char.str_len(valores), (11, 14)).all():
+            return serie
+    digitos = texto.str.replace(r'\D', '', regex=True)
+    convertidos = digitos.where(digitos.str.len().isin([11, 14]))
+    # Números: a API perdeu os zeros à esquerda
+    numeros = pd.to_numeric(serie.where(texto.isna()), errors='coerce').dropna()
+    numeros = numeros[(numeros >= 0) & (numeros == numeros.round())].astype('int64').astype(str)
+    numeros = numeros.str.zfill(11).where(numeros.str.len() <= 11, numeros.str.zfill(14))
+    convertidos[numeros.index] = numeros.where(numeros.str.len() <= 14)
+    return _mesclar(serie, convertidos, texto.str.strip() == '')
+
+def normalizar_inteiro(serie):
+    texto = _texto(serie)
+    numeros = pd.to_numeric(serie.where(texto.isna(), texto.str.strip()), errors='coerce')
+    inteiros = numeros[numeros.notna() & (numeros == numeros.round())].astype('int64')
+    return _mesclar(serie, inteiros, texto.str.strip() == '')
+
+NORMALIZADORES = {
+    'dinheiro': normalizar_dinheiro,
+    'data': normalizar_data,
+    'documento': normalizar_documento,
+    'inteiro': normalizar_inteiro,
+}
+
+def carregar_especificacao(arquivo=ARQUIVO):
+    """Especificação de tipos ({} se o arquivo não existir)"""
+    if not os.path.exists(arquivo):
+        return {}
+    with open(arquivo, encoding='utf-8') as f:
+        especificacao = json.load(f)
+    for empresa, tabelas in especificacao.items():
+        for tabela, colunas in tabelas.items():
+            desconhecidos = set(colunas.values()) - set(NORMALIZADORES)
+            if desconhecidos:
+                raise ValueError(f"Tipos desconhecidos em {empresa}/{tabela}: {sorted(desconhecidos)}")
+    return especificacao
+
+class Normalizador:
+    """
+    Aplica a especificação de uma empresa aos lotes do SQLiteWriter.
+
+    Args:
+        empresa: Chave da empresa na especificação (Adaptador.empresa)
+        especificacao: Especificação já carregada (padrão: data/tipos_colunas.json)
+    """
+
+    def __init__(self, empresa, especificacao=None):
+        self.empresa = empresa
+        self.especificacao = carregar_especificacao() if especificacao is None else especificacao
+        self._por_colunas = {}
+        self._avisadas = set()
+        self._lock = threading.Lock()
+
+    def tipos_da_tabela(self, tabela):
+        """{nome comparável: tipo de normalização} que valem para a tabela"""
+        tipos = {}
+        for empresa in ('*', self.empresa):
+            for chave in ('*', tabela):
+                for coluna, tipo in self.especificacao.get(empresa, {}).get(chave, {}).items():
+                    tipos[nome_comparavel(coluna)] = tipo
+        return tipos
+
+    def _tipadas(self, tabela, colunas):
+        chave = (tabela, tuple(colunas))
+        tipadas = self._por_colunas.get(chave)
+        if tipadas is None:
+            tipos = self.tipos_da_tabela(tabela)
+            tipadas = [(i, col, tipos[nome_comparavel(col)]) for i, col in enumerate(colunas) if nome_comparavel(col) in tipos]
+            with self._lock:
+                self._por_colunas[chave] = tipadas
+        return tipadas
+
+    def _compativeis(self, tabela, tipadas, declarados):
+        """Colunas tipadas que ainda não existem ou já estão declaradas com o tipo de destino"""
+        compativeis = []
+        for i, col, tipo in tipadas:
+            declarado = declarados.get(col.lower())
+            if declarado is None or declarado.upper().replace(' ', '') == TIPOS_SQLITE[tipo]:
+                compativeis.append((i, col, tipo))
+            elif (tabela, col.lower()) not in self._avisadas:
+                with self._lock:
+                    self._avisadas.add((tabela, col.lower()))
+                print(f"🟡 {tabela}.{col} está declarada como {declarado or 'sem tipo'}: gravada sem normalização "
+                      f"({tipo}); migre com MigrarSchema --tipo {tabela}.{col}:{TIPOS_SQLITE[tipo]}")
+        return compativeis
+
+    def aplicar(self, tabela, colunas, linhas, declarados=None):
+        """
+        Converte as colunas tipadas do lote.
+
+        Args:
+            declarados: {coluna em minúsculas: tipo declarado} das colunas que a tabela já tem;
+                        as de outro tipo ficam como vieram
+
+        Returns:
+            tuple: (linhas convertidas, {coluna: tipo SQLite} das colunas tipadas)
+        """
+        tipadas = self._tipadas(tabela, colunas)
+        if tipadas and declarados:
+            tipadas = self._compativeis(tabela, tipadas, declarados)
+        if not tipadas or not linhas:
+            return linhas, {}
+        valores = list(zip(*linhas))
+        for i, _, tipo in tipadas:
+            valores[i] = NORMALIZADORES[tipo](pd.Series(valores[i], dtype=object)).tolist()
+        return list(zip(*valores)), {col: TIPOS_SQLITE[tipo] for _, col, tipo in tipadas}
@@ -0,0 +1,124 @@
+import threading
+from time import monotonic, sleep
+from urllib.parse import urlparse
+import requests
+from metricas import METRICAS
+
+# Códigos que indicam que o portal está sobrecarregado e pede para desacelerar
+STATUS_SOBRECARGA = (429, 503)
+
+class _Bucket:
+    __slots__ = ('taxa', 'tokens', 'ultimo', 'bloqueado_ate', 'lock')
+
+    def __init__(self, taxa, rajada):
+        self.taxa = taxa
+        self.tokens = rajada
+        self.ultimo = monotonic()
+        self.bloqueado_ate = 0.0
+        self.lock = threading.Lock()
+
+class RateLimiter:
+    """
+    Limitador de taxa com um token bucket por host, seguro para uso entre threads.
+
+    A taxa de cada host se adapta às respostas (AIMD): cai pela metade quando o
+    portal responde 429/503 ou falha na conexão, e sobe aos poucos enquanto a
+    latência fica abaixo de `latencia_alvo`.
+
+    Args:
+        taxa: Requisições por segundo iniciais de cada host
+        rajada: Quantidade máxima de tokens acumulados (requisições em sequência sem espera)
+        taxa_min: Limite inferior da taxa adaptativa
+        taxa_max: Limite superior da taxa adaptativa
+        latencia_alvo: Latência (s) abaixo da qual a taxa do host é aumentada
+        incremento: Quanto a taxa sobe a cada resposta rápida
+        adaptativo: Se False, a taxa fica fixa em `taxa`
+    """
+
+    def __init__(self, taxa=1.0, rajada=1, taxa_min=0.1, taxa_max=4.0,
+                 latencia_alvo=1.0, incremento=0.05, adaptativo=True):
+        self.taxa = taxa
+        self.rajada = rajada
+        self.taxa_min = taxa_min
+        self.taxa_max = taxa_max
+        self.latencia_alvo = latencia_alvo
+        self.incremento = incremento
+        self.adaptativo = adaptativo
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host):
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.setdefault(host, _Bucket(self.taxa, self.rajada))
+        return bucket
+
+    def aguardar(self, host):
+        """Bloqueia até haver um token disponível para o host. Retorna o tempo esperado (s)"""
+        bucket = self._bucket(host)
+        with bucket.lock:
+            agora = monotonic()
+            bucket.tokens = min(self.rajada, bucket.tokens + (agora - bucket.ultimo) * bucket.taxa)
+            bucket.ultimo = agora
+            # O token é reservado já: se o saldo ficar negativo, as próximas chamadas esperam mais
+            bucket.tokens -= 1
+            espera = max(-bucket.tokens / bucket.taxa, bucket.bloqueado_ate - agora, 0.0)
+
+        if espera > 0:
+            sleep(espera)
+        return espera
+
+    def registrar_resposta(self, host, status_code=None, latencia=None, retry_after=None):
+        """Ajusta a taxa do host conforme o resultado da última requisição"""
+        bucket = self._bucket(host)
+        with bucket.lock:
+            if retry_after:
+                bucket.bloqueado_ate = max(bucket.bloqueado_ate, monotonic() + retry_after)
+
+            if not self.adaptativo:
+                return
+
+            if status_code is None or status_code in STATUS_SOBRECARGA:
+                bucket.taxa = max(self.taxa_min, bucket.taxa / 2)
+            elif latencia is not None and latencia < self.latencia_alvo:
+                bucket.taxa = min(self.taxa_max, bucket.taxa + self.incremento)
+
+    def taxa_atual(self, host):
+        return self._bucket(host).taxa
+
+def retry_after_segundos(response):
+    """Lê o cabeçalho Retry-After (em segundos) de uma resposta, se houver"""
+    if response is None:
+        return None
+    valor = response.headers.get('Retry-After')
+    try:
+        return float(valor) if valor else None
+    except ValueError:
+        return None
+
+def get_com_limite(session, rate_limiter, url, timeout=30, stream=False, headers=None, endpoint=None):
+    """
+    Faz um GET respeitando o limite do host da URL e informa o resultado ao limitador.
+    Com stream=True a latência medida é até o recebimento dos cabeçalhos.
+    A espera, a latência e os retries entram em METRICAS com o `endpoint` informado.
+    """
+    host = urlparse(url).netloc
+    inicio = monotonic()
+    rate_limiter.aguardar(host)
+    espera = monotonic()
+    METRICAS.tempo('espera', espera - inicio, endpoint, host)
+    METRICAS.somar('requisicoes', 1, endpoint, host)
+    try:
+        response = session.get(url, timeout=timeout, stream=stream, headers=headers)
+    except requests.exceptions.RequestException:
+        METRICAS.latencia(monotonic() - espera, endpoint, host)
+        rate_limiter.registrar_resposta(host, None)
+        raise
+    latencia = monotonic() - espera
+    METRICAS.latencia(latencia, endpoint, host)
+    retries = getattr(response.raw, 'retries', None)
+    if retries is not None and retries.history:
+        METRICAS.somar('retries', len(retries.history), endpoint, host)
+    rate_limiter.registrar_resposta(host, response.status_code, latencia, retry_after_segundos(response))
+    return response
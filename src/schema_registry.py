@@ -0,0 +1,93 @@
+import threading
+
+# Quantidade de registros inspecionados para inferir o tipo de uma coluna nova
+TAMANHO_AMOSTRA = 50
+
+def inferir_tipo(valores):
+    """
+    Tipo SQLite de uma coluna a partir de uma amostra de valores Python.
+
+    Ignora nulos; qualquer texto (ou mistura de tipos não numéricos) vira TEXT,
+    só inteiros (e booleanos) viram INTEGER e números com algum float viram REAL.
+    """
+    tipo = None
+    for valor in valores:
+        if valor is None:
+            continue
+        if isinstance(valor, (bool, int)):
+            atual = 'INTEGER'
+        elif isinstance(valor, float):
+            if valor != valor:  # NaN
+                continue
+            atual = 'REAL'
+        else:
+            return 'TEXT'
+        if tipo is None or (tipo == 'INTEGER' and atual == 'REAL'):
+            tipo = atual
+    return tipo or 'TEXT'
+
+class SchemaRegistry:
+    """
+    Cache em memória das colunas de cada tabela de um banco.
+
+    As colunas de uma tabela são lidas com PRAGMA table_info uma única vez; depois
+    disso a verificação de colunas novas é uma diferença de conjuntos e os
+    ALTER TABLE ADD COLUMN necessários são emitidos juntos. A comparação ignora
+    maiúsculas/minúsculas, como o próprio SQLite faz com nomes de colunas.
+    """
+
+    def __init__(self):
+        self._colunas = {}
+        self._lock = threading.Lock()
+
+    def colunas(self, conn, tabela):
+        """Nomes (em minúsculas) das colunas conhecidas da tabela"""
+        existentes = self._colunas.get(tabela)
+        if existentes is None:
+            with self._lock:
+                existentes = {row[1].lower() for row in conn.execute(f'PRAGMA table_info("{tabela}")')}
+                self._colunas[tabela] = existentes
+        return existentes
+
+    def colunas_novas(self, conn, tabela, colunas):
+        """Colunas de `colunas` que ainda não existem na tabela, sem repetição e na ordem recebida"""
+        existentes = self.colunas(conn, tabela)
+        novas = []
+        vistas = set()
+        for col in colunas:
+            chave = col.lower()
+            if chave not in existentes and chave not in vistas and chave != 'id':
+                novas.append(col)
+                vistas.add(chave)
+        return novas
+
+    def garantir_colunas(self, conn, tabela, colunas, tipos=None):
+        """
+        Cria, numa só passada, as colunas que faltam na tabela.
+
+        Args:
+            colunas: Colunas que os registros a gravar possuem
+            tipos: {coluna: tipo SQLite}; colunas sem tipo viram TEXT
+
+        Returns:
+            list: Colunas criadas
+        """
+        novas = self.colunas_novas(conn, tabela, colunas)
+        if not novas:
+            return novas
+        tipos = tipos or {}
+        for col in novas:
+            conn.execute(f'ALTER TABLE "{tabela}" ADD COLUMN "{col}" {tipos.get(col, "TEXT")}')
+        self._colunas[tabela].update(col.lower() for col in novas)
+        return novas
+
+    def registrar_tabela(self, tabela, colunas):
+        """Informa as colunas de uma tabela recém-criada, evitando o PRAGMA"""
+        self._colunas[tabela] = {col.lower() for col in colunas}
+
+    def invalidar(self, tabela=None):
+        """Descarta o cache (após uma transação desfeita ou uma migração de schema)"""
+        if tabela is None:
+            self._colunas.clear()
+        else:
+            self._colunas.pop(tabela, None)
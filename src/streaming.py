@@ -0,0 +1,222 @@
+"""
+Leitura incremental de respostas JSON.
+
+Em vez de carregar o corpo inteiro (response.content / response.json()) e montar um
+DataFrame, o corpo é lido em pedaços e os elementos do array JSON de nível superior
+são decodificados um a um; as linhas vão para o SQLiteWriter em lotes de tamanho fixo.
+A memória usada fica limitada a um pedaço do corpo mais um lote de registros,
+qualquer que seja o tamanho da resposta.
+"""
+import codecs
+import hashlib
+import json
+import tempfile
+from itertools import islice
+
+# Bytes lidos da conexão por vez
+TAMANHO_PEDACO = 64 * 1024
+# Registros enviados ao writer por vez
+TAMANHO_LOTE = 1000
+
+_ESPACOS = ' \t\r\n'
+# Caracteres que podem continuar um número JSON ('-0' pode ser o começo de '-0.5e3')
+_CONTINUACAO_NUMERO = '0123456789.eE+-'
+
+class LeitorResposta:
+    """
+    Itera o corpo de uma resposta aberta com stream=True, contando os bytes lidos e calculando o hash.
+    Com `copia` (objeto com write, ex.: uma gravação do cache) cada pedaço também é escrito nela.
+    """
+
+    def __init__(self, response, tamanho_pedaco=TAMANHO_PEDACO, copia=None):
+        self.response = response
+        self.tamanho_pedaco = tamanho_pedaco
+        self.copia = copia
+        self.bytes = 0
+        self._hash = hashlib.sha256()
+
+    def __iter__(self):
+        for pedaco in self.response.iter_content(self.tamanho_pedaco):
+            self.bytes += len(pedaco)
+            self._hash.update(pedaco)
+            if self.copia is not None:
+                self.copia.write(pedaco)
+            yield pedaco
+
+    @property
+    def hash(self):
+        return self._hash.hexdigest()
+
+class CorpoTemporario:
+    """Corpo de uma resposta guardado num arquivo temporário e relido com a interface usada por gravar_em_fluxo"""
+
+    def __init__(self):
+        self._arquivo = tempfile.TemporaryFile()
+
+    def write(self, pedaco):
+        self._arquivo.write(pedaco)
+
+    def iter_content(self, tamanho):
+        self._arquivo.seek(0)
+        while True:
+            pedaco = self._arquivo.read(tamanho)
+            if not pedaco:
+                return
+            yield pedaco
+
+    def close(self):
+        self._arquivo.close()
+
+def baixar_corpo(response, cache=None):
+    """
+    Lê o corpo inteiro de uma resposta aberta com stream=True para o disco, sem carregá-lo
+    na memória: no cache (CacheRespostas), se houver, senão num arquivo temporário. Serve
+    para comparar o hash com o da última busca antes de gravar qualquer linha.
+
+    Returns:
+        tuple: (bytes lidos, hash do corpo, corpo para gravar_em_fluxo); com cache o corpo
+               já fica guardado nele
+    """
+    gravacao = cache.gravacao() if cache else None
+    destino = gravacao or CorpoTemporario()
+    leitor = LeitorResposta(response, copia=destino)
+    try:
+        for _ in leitor:
+            pass
+    except BaseException:
+        if gravacao:
+            gravacao.descartar()
+        else:
+            destino.close()
+        raise
+    finally:
+        response.close()
+    if gravacao:
+        gravacao.concluir(leitor.hash)
+        return leitor.bytes, leitor.hash, cache.abrir(leitor.hash)
+    return leitor.bytes, leitor.hash, destino
+
+def iterar_array_json(pedacos):
+    """
+    Gera, um a um, os elementos do array JSON de nível superior recebido em pedaços de bytes.
+
+    Aceita BOM UTF-8 e corpo vazio (nenhum elemento). Se o documento não for um array,
+    ele é lido inteiro e, sendo um objeto, gerado como registro único.
+    """
+    decodificador = json.JSONDecoder()
+    texto = codecs.getincrementaldecoder('utf-8-sig')()
+    pedacos = iter(pedacos)
+    buf = ''
+    pos = 0
+    fim = False
+
+    def carregar():
+        """Acrescenta o próximo pedaço ao buffer, descartando o que já foi consumido"""
+        nonlocal buf, pos, fim
+        if fim:
+            return False
+        pedaco = next(pedacos, None)
+        if pedaco is None:
+            fim = True
+            resto = texto.decode(b'', final=True)
+        else:
+            resto = texto.decode(pedaco)
+        buf = buf[pos:] + resto
+        pos = 0
+        return True
+
+    def proximo_caractere():
+        """Avança sobre espaços e devolve o próximo caractere (None no fim do corpo)"""
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _ESPACOS:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not carregar():
+                return None
+
+    inicio = proximo_caractere()
+    if inicio is None:
+        return
+    if inicio != '[':
+        while carregar():
+            pass
+        documento = json.loads(buf[pos:])
+        if isinstance(documento, dict):
+            yield documento
+        return
+
+    pos += 1
+    if proximo_caractere() == ']':
+        return
+
+    while True:
+        if proximo_caractere() is None:
+            raise ValueError("JSON incompleto: array não foi fechado")
+        while True:
+            try:
+                valor, fim_valor = decodificador.raw_decode(buf, pos)
+                # Um número no fim do buffer (ou seguido só de '.', 'e', ...) pode continuar no próximo pedaço
+                numero = type(valor) in (int, float)
+                if fim or (fim_valor < len(buf) and not (numero and not buf[fim_valor:].lstrip(_CONTINUACAO_NUMERO))):
+                    break
+            except json.JSONDecodeError:
+                if fim:
+                    raise
+            carregar()
+        pos = fim_valor
+        yield valor
+
+        separador = proximo_caractere()
+        if separador == ',':
+            pos += 1
+        elif separador == ']':
+            return
+        elif separador is None:
+            raise ValueError("JSON incompleto: array não foi fechado")
+        else:
+            raise ValueError(f"JSON inválido: esperado ',' ou ']' e encontrado {separador!r}")
+
+def iterar_em_lotes(itens, tamanho=TAMANHO_LOTE):
+    """Agrupa um iterável em listas de até `tamanho` itens"""
+    itens = iter(itens)
+    while True:
+        lote = list(islice(itens, tamanho))
+        if not lote:
+            return
+        yield lote
+
+def gravar_em_fluxo(writer, tabela, response, fixos, substituir=True, tamanho_lote=TAMANHO_LOTE, cache=None):
+    """
+    Lê a resposta (aberta com stream=True) e envia os registros ao writer em lotes.
+
+    Com substituir=True o primeiro lote apaga as linhas que a mesma unidade
+    (identificada pelas colunas fixas) tenha deixado numa busca anterior, para que o
+    reprocessamento não duplique dados. O resultado no ledger fica por conta de
+    quem chama, depois do último lote.
+
+    Com `cache` (CacheRespostas) o corpo é guardado comprimido enquanto é lido.
+
+    Returns:
+        tuple: (linhas gravadas, bytes lidos, hash do corpo)
+    """
+    gravacao = cache.gravacao() if cache else None
+    leitor = LeitorResposta(response, copia=gravacao)
+    linhas = 0
+    try:
+        for lote in iterar_em_lotes(iterar_array_json(leitor), tamanho_lote):
+            writer.gravar_registros(tabela, lote, fixos, substituir=fixos if substituir and linhas == 0 else None)
+            linhas += len(lote)
+    except BaseException:
+        if gravacao:
+            gravacao.descartar()
+        raise
+    finally:
+        response.close()
+    if gravacao:
+        if linhas:
+            gravacao.concluir(leitor.hash)
+        else:
+            gravacao.descartar()
+    return linhas, leitor.bytes, leitor.hash
@@ -0,0 +1,435 @@
+import json
+import queue
+import sqlite3
+import threading
+from itertools import chain, repeat
+from time import perf_counter
+import pandas as pd
+from ledger import registrar_resultado, ERRO
+from schema_registry import SchemaRegistry, inferir_tipo, TAMANHO_AMOSTRA
+from metricas import METRICAS
+
+_FIM = object()
+
+# Tabelas filhas (arrays de objetos aninhados): <tabela>__<campo>, ligadas ao pai por id_pai
+SEPARADOR_FILHA = '__'
+COLUNA_PAI = 'id_pai'
+
+def configurar_conexao(conn, cache_mb=64):
+    """Coloca a conexão em WAL com pragmas voltados para carga em massa"""
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{cache_mb * 1024}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+def tipos_do_dataframe(df):
+    """Tipo SQLite de cada coluna a partir dos dtypes do DataFrame"""
+    tipos = {}
+    for col in df.columns:
+        if pd.api.types.is_bool_dtype(df[col]) or pd.api.types.is_integer_dtype(df[col]):
+            tipos[col] = 'INTEGER'
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            tipos[col] = 'REAL'
+        else:
+            tipos[col] = 'TEXT'
+    return tipos
+
+def linhas_do_dataframe(df):
+    """Converte o DataFrame em lista de tuplas com tipos nativos do Python (NaN vira None)"""
+    valores = df.astype(object).where(pd.notna(df), None).values.tolist()
+    return [tuple(linha) for linha in valores]
+
+def linhas_dos_registros(registros, fixos=None):
+    """
+    Converte uma lista de dicts (JSON da API) em colunas + tuplas, sem passar por DataFrame.
+
+    As colunas são a união das chaves, na ordem em que aparecem. As colunas de `fixos`
+    (municipio, ano, ...) vão no fim de todas as linhas e substituem chaves de mesmo nome
+    vindas da API.
+    """
+    fixos = fixos or {}
+    nomes_fixos = {col.lower() for col in fixos}
+    colunas = [col for col in dict.fromkeys(chain.from_iterable(registros)) if col.lower() not in nomes_fixos]
+    valores_fixos = tuple(fixos.values())
+    linhas = [tuple(map(registro.get, colunas)) + valores_fixos for registro in registros]
+    return colunas + list(fixos), linhas
+
+class Filha:
+    """
+    Linhas de uma tabela filha, vindas de um array de objetos aninhado nos registros.
+
+    `posicoes[i]` é a posição, nas linhas do pai, da linha a que a i-ésima linha filha
+    pertence; na gravação o writer troca a posição pelo id que a linha do pai recebeu.
+    """
+
+    def __init__(self, tabela, colunas, linhas, posicoes, filhas=None, tipos=None):
+        self.tabela = tabela
+        self.colunas = colunas
+        self.linhas = linhas
+        self.posicoes = posicoes
+        self.filhas = filhas or []
+        self.tipos = tipos or {}
+
+def extrair_filhas(tabela, colunas, linhas, achatar=None):
+    """
+    Separa dos registros os arrays de objetos aninhados, que vão para tabelas filhas
+    (<tabela>__<campo>, com a coluna id_pai) em vez de virar texto ou colunas posicionais.
+    Os demais valores aninhados (objetos, listas de valores simples) viram texto JSON;
+    listas e objetos vazios viram NULL.
+
+    id e id_pai são do banco (o rowid e a ligação com o pai): os campos de mesmo nome
+    vindos da API, no pai e nas filhas, são mantidos como <campo>_origem.
+
+    Args:
+        achatar: Função registros -> (colunas, linhas) aplicada aos objetos de cada array
+                 (padrão: linhas_dos_registros; a Agape passa o seu achatador)
+
+    Returns:
+        tuple: (colunas, linhas, [Filha]), sem as colunas que só tinham arrays de objetos
+    """
+    colunas = colunas_de_origem(colunas)
+    # Caso comum: nenhum valor aninhado, uma passada em C sobre os tipos basta
+    if not linhas or not {list, dict} & set(map(type, chain.from_iterable(linhas))):
+        return colunas, linhas, []
+
+    achatar = achatar or linhas_dos_registros
+    valores = [list(coluna) for coluna in zip(*linhas)]
+    filhas = []
+    manter = []
+    for i, coluna in enumerate(colunas):
+        valores_coluna = valores[i]
+        if not {list, dict} & set(map(type, valores_coluna)):
+            manter.append(i)
+            continue
+        registros = []
+        posicoes = []
+        for posicao, valor in enumerate(valores_coluna):
+            tipo = type(valor)
+            if tipo is list and any(valor) and all(type(item) is dict for item in valor):
+                registros.extend(valor)
+                posicoes.extend(repeat(posicao, len(valor)))
+                valores_coluna[posicao] = None
+            elif tipo is list or tipo is dict:
+                valores_coluna[posicao] = json.dumps(valor, ensure_ascii=False) if valor else None
+        if registros:
+            nome = f"{tabela}{SEPARADOR_FILHA}{coluna}"
+            colunas_filha, linhas_filha = achatar(registros)
+            colunas_filha, linhas_filha, netas = extrair_filhas(nome, colunas_filha, linhas_filha, achatar)
+            filhas.append(Filha(nome, colunas_filha, linhas_filha, posicoes, netas))
+            if all(valor is None for valor in valores_coluna):
+                continue
+        manter.append(i)
+
+    return [colunas[i] for i in manter], list(zip(*(valores[i] for i in manter))), filhas
+
+def colunas_de_origem(colunas):
+    """Renomeia para <campo>_origem os campos da API chamados id ou id_pai, que são colunas do banco"""
+    return [f"{col}_origem" if col.lower() in ('id', COLUNA_PAI) else col for col in colunas]
+
+def tabelas_filhas(conn, tabela):
+    """Tabelas filhas diretas de uma tabela"""
+    padrao = tabela.replace('\\', '\\\\').replace('_', '\\_').replace('%', '\\%') + '\\_\\_%'
+    cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE ? ESCAPE '\\'", (padrao,))
+    return [nome for (nome,) in cursor if SEPARADOR_FILHA not in nome[len(tabela) + len(SEPARADOR_FILHA):]]
+
+def descendentes(conn, tabela):
+    """Tabelas filhas, netas, ... de uma tabela, das mais profundas para as mais rasas"""
+    resultado = []
+    for filha in tabelas_filhas(conn, tabela):
+        resultado.extend(descendentes(conn, filha))
+        resultado.append(filha)
+    return resultado
+
+def _ids_inseridos(conn, quantidade):
+    """
+    Ids das linhas recém-inseridas por um executemany, na ordem das linhas. Com um único
+    gravador e id AUTOINCREMENT, as linhas recebem ids consecutivos terminando em
+    last_insert_rowid() (o id da API nunca é gravado no id, ver extrair_filhas).
+    """
+    ultimo = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return range(ultimo - quantidade + 1, ultimo + 1)
+
+def registros_da_resposta(response):
+    """Lista de registros (dicts) do JSON de uma resposta; um objeto isolado vira lista de um item"""
+    dados = response.json()
+    if isinstance(dados, dict):
+        return [dados]
+    return dados or []
+
+class SQLiteWriter:
+    """
+    Gravador dedicado: uma única thread com uma única conexão recebe, por uma fila
+    limitada, as linhas de várias respostas e as grava em lotes grandes com
+    executemany, uma transação por lote. O resultado de cada unidade no ledger
+    entra no mesmo lote das suas linhas.
+
+    Enquanto o gravador escreve, as threads de rede continuam buscando; se o disco
+    ficar para trás a fila enche e `gravar` passa a bloquear (contrapressão).
+
+    Args:
+        db_file: Caminho do banco SQLite
+        tamanho_lote: Linhas acumuladas antes de gravar um lote
+        tamanho_fila: Quantidade máxima de respostas aguardando gravação
+        intervalo: Segundos sem novas respostas antes de gravar um lote incompleto
+        normalizador: normalizacao.Normalizador aplicado às linhas na thread que chama `gravar`; só
+                      converte as colunas novas e as já declaradas com o tipo de destino
+    """
+
+    def __init__(self, db_file, tamanho_lote=5000, tamanho_fila=64, intervalo=0.5, cache_mb=64, normalizador=None):
+        self.db_file = db_file
+        self.normalizador = normalizador
+        # Tabela -> {coluna em minúsculas: tipo declarado}, lido uma vez pelas threads que chamam `gravar`
+        self._declarados = {}
+        self._lock_declarados = threading.Lock()
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.cache_mb = cache_mb
+        self.linhas_gravadas = 0
+        self.lotes_gravados = 0
+        self.falhas = 0
+        self.schema = SchemaRegistry()
+        # Tabela -> tabelas filhas diretas existentes no banco (lido uma vez por tabela)
+        self._filhas = {}
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._thread = threading.Thread(target=METRICAS.perfilado(self._executar), name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    def gravar(self, tabela, colunas, linhas, tipos=None, resultado=None, substituir=None, filhas=None):
+        """
+        Enfileira linhas para gravação.
+
+        Args:
+            tabela: Tabela de destino (colunas novas são criadas automaticamente)
+            colunas: Nomes das colunas, na ordem dos valores de cada linha
+            linhas: Lista de tuplas
+            tipos: {coluna: tipo SQLite} usado ao criar colunas novas (se ausente, é inferido
+                   de uma amostra das linhas)
+            resultado: Argumentos de ledger.registrar_resultado (ver ledger.montar_resultado)
+            substituir: {coluna: valor}; linhas da tabela com esses valores são apagadas
+                        antes da inserção, na mesma transação (junto com as linhas filhas delas)
+            filhas: [Filha] de extrair_filhas; gravadas com o id que cada linha recebe
+        """
+        tipos = dict(tipos or {})
+        if self.normalizador:
+            # Conversão vetorizada das colunas tipadas, fora da thread do gravador
+            with METRICAS.etapa('normalizacao', tabela):
+                linhas, tipos_normalizados = self.normalizador.aplicar(tabela, colunas, linhas, self._tipos_declarados(tabela))
+                tipos.update(tipos_normalizados)
+                self._normalizar_filhas(filhas)
+        # Fila cheia: o disco está atrasado e a thread espera aqui
+        with METRICAS.etapa('fila', tabela):
+            self._fila.put((tabela, list(colunas), linhas, tipos, resultado, substituir, filhas or []))
+
+    def _normalizar_filhas(self, filhas):
+        for filha in filhas or ():
+            filha.linhas, tipos_normalizados = self.normalizador.aplicar(filha.tabela, filha.colunas, filha.linhas,
+                                                                         self._tipos_declarados(filha.tabela))
+            filha.tipos.update(tipos_normalizados)
+            self._normalizar_filhas(filha.filhas)
+
+    def _tipos_declarados(self, tabela):
+        """
+        Tipos declarados das colunas que a tabela já tinha na primeira gravação desta execução.
+        Colunas criadas depois pelo gravador recebem o tipo da normalização, então o cache
+        não precisa ser atualizado.
+        """
+        declarados = self._declarados.get(tabela)
+        if declarados is None:
+            with self._lock_declarados:
+                declarados = self._declarados.get(tabela)
+                if declarados is None:
+                    # Conexão só de leitura: em WAL ela não disputa com a do gravador
+                    conn = sqlite3.connect(self.db_file)
+                    try:
+                        declarados = {row[1].lower(): row[2] for row in conn.execute(f'PRAGMA table_info("{tabela}")')}
+                    finally:
+                        conn.close()
+                    self._declarados[tabela] = declarados
+        return declarados
+
+    def gravar_dataframe(self, tabela, df, resultado=None, substituir=None):
+        self.gravar(tabela, df.columns, linhas_do_dataframe(df), tipos_do_dataframe(df), resultado, substituir)
+
+    def gravar_registros(self, tabela, registros, fixos=None, resultado=None, substituir=None):
+        """Enfileira registros (dicts) acrescidos das colunas fixas; os tipos das colunas novas são inferidos"""
+        colunas, linhas = linhas_dos_registros(registros, fixos)
+        with METRICAS.etapa('filhas', tabela):
+            colunas, linhas, filhas = extrair_filhas(tabela, colunas, linhas)
+        self.gravar(tabela, colunas, linhas, None, resultado, substituir, filhas)
+
+    def registrar(self, resultado):
+        """Enfileira só a atualização do ledger (respostas vazias, erros, unidades adiadas)"""
+        self._fila.put((None, [], [], {}, resultado, None, []))
+
+    def fechar(self):
+        """Grava o que estiver na fila e encerra a thread"""
+        if self._thread.is_alive():
+            self._fila.put(_FIM)
+            self._thread.join()
+
+    def _executar(self):
+        conn = configurar_conexao(sqlite3.connect(self.db_file), self.cache_mb)
+        lote = []
+        linhas_no_lote = 0
+        while True:
+            try:
+                item = self._fila.get(timeout=self.intervalo)
+            except queue.Empty:
+                item = None
+
+            if item is _FIM:
+                break
+            if item is not None:
+                lote.append(item)
+                linhas_no_lote += len(item[2])
+
+            if lote and (item is None or linhas_no_lote >= self.tamanho_lote or len(lote) >= 500):
+                self._gravar_lote(conn, lote)
+                lote = []
+                linhas_no_lote = 0
+
+        if lote:
+            self._gravar_lote(conn, lote)
+        conn.close()
+
+    def _gravar_lote(self, conn, lote):
+        try:
+            self._aplicar(conn, lote)
+            self.lotes_gravados += 1
+            return
+        except Exception as e:
+            conn.rollback()
+            # ALTERs e tabelas filhas desfeitos junto com a transação: o cache de schema precisa ser relido
+            self.schema.invalidar()
+            self._filhas.clear()
+            if len(lote) == 1:
+                self._registrar_falha(conn, lote[0], e)
+                return
+
+        # Um item ruim não derruba o lote inteiro: regrava item a item
+        for item in lote:
+            try:
+                self._aplicar(conn, [item])
+            except Exception as e:
+                conn.rollback()
+                self.schema.invalidar()
+                self._filhas.clear()
+                self._registrar_falha(conn, item, e)
+
+    def _aplicar(self, conn, lote):
+        """Grava o lote inteiro numa única transação"""
+        conn.execute("BEGIN")
+        grupos = {}
+        for tabela, colunas, linhas, tipos, _, substituir, filhas in lote:
+            if tabela is None or not linhas:
+                continue
+            self._garantir_colunas(conn, tabela, colunas, linhas, tipos)
+            if substituir:
+                inicio = perf_counter()
+                filtro = ' AND '.join(f'"{col}" = ?' for col in substituir)
+                valores = tuple(substituir.values())
+                # Filhas antes do pai: o filtro delas seleciona os ids das linhas do pai
+                self._apagar_filhas(conn, tabela, f'SELECT id FROM "{tabela}" WHERE {filtro}', valores)
+                conn.execute(f'DELETE FROM "{tabela}" WHERE {filtro}', valores)
+                METRICAS.tempo('substituicao', perf_counter() - inicio, tabela)
+            grupo = grupos.setdefault((tabela, tuple(colunas)), ([], []))
+            if filhas:
+                grupo[1].append((len(grupo[0]), filhas))
+            grupo[0].extend(linhas)
+
+        total = 0
+        for (tabela, colunas), (linhas, filhas) in grupos.items():
+            total += self._inserir(conn, tabela, colunas, linhas)
+            if filhas:
+                ids = _ids_inseridos(conn, len(linhas))
+                for deslocamento, filhas_item in filhas:
+                    for filha in filhas_item:
+                        total += self._inserir_filha(conn, tabela, filha, ids, deslocamento)
+
+        inicio = perf_counter()
+        for item in lote:
+            if item[4]:
+                registrar_resultado(conn, **item[4])
+        conn.commit()
+        METRICAS.tempo('commit', perf_counter() - inicio)
+        self.linhas_gravadas += total
+
+    def _garantir_colunas(self, conn, tabela, colunas, linhas, tipos):
+        novas = self.schema.colunas_novas(conn, tabela, colunas)
+        if novas:
+            inicio = perf_counter()
+            amostra = linhas[:TAMANHO_AMOSTRA]
+            tipos_novas = {col: tipos.get(col) or inferir_tipo(linha[colunas.index(col)] for linha in amostra)
+                           for col in novas}
+            self.schema.garantir_colunas(conn, tabela, novas, tipos_novas)
+            METRICAS.tempo('schema', perf_counter() - inicio, tabela)
+
+    def _inserir(self, conn, tabela, colunas, linhas):
+        nomes = ', '.join(f'"{col}"' for col in colunas)
+        marcadores = ', '.join('?' for _ in colunas)
+        inicio = perf_counter()
+        conn.executemany(f'INSERT INTO "{tabela}" ({nomes}) VALUES ({marcadores})', linhas)
+        METRICAS.tempo('insercao', perf_counter() - inicio, tabela)
+        METRICAS.somar('linhas_gravadas', len(linhas), tabela)
+        return len(linhas)
+
+    def _inserir_filha(self, conn, tabela_pai, filha, ids_pai, deslocamento):
+        """Grava as linhas de uma Filha (e as netas) com o id da linha do pai em id_pai"""
+        self._garantir_filha(conn, tabela_pai, filha.tabela)
+        colunas = [COLUNA_PAI] + list(filha.colunas)
+        linhas = [(ids_pai[deslocamento + posicao],) + tuple(linha) for posicao, linha in zip(filha.posicoes, filha.linhas)]
+        self._garantir_colunas(conn, filha.tabela, colunas, linhas, filha.tipos)
+        total = self._inserir(conn, filha.tabela, colunas, linhas)
+        if filha.filhas:
+            ids = _ids_inseridos(conn, len(linhas))
+            for neta in filha.filhas:
+                total += self._inserir_filha(conn, filha.tabela, neta, ids, 0)
+        return total
+
+    def _garantir_filha(self, conn, tabela_pai, tabela):
+        filhas = self._tabelas_filhas(conn, tabela_pai)
+        if tabela in filhas:
+            return
+        inicio = perf_counter()
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{tabela}" (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                     f'"{COLUNA_PAI}" INTEGER REFERENCES "{tabela_pai}" (id))')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{tabela}_{COLUNA_PAI}" ON "{tabela}" ("{COLUNA_PAI}")')
+        self.schema.invalidar(tabela)
+        filhas.append(tabela)
+        self._filhas.setdefault(tabela, [])
+        METRICAS.tempo('schema', perf_counter() - inicio, tabela)
+
+    def _tabelas_filhas(self, conn, tabela):
+        filhas = self._filhas.get(tabela)
+        if filhas is None:
+            filhas = self._filhas[tabela] = tabelas_filhas(conn, tabela)
+        return filhas
+
+    def _apagar_filhas(self, conn, tabela, ids_pai, valores):
+        """Apaga as linhas filhas (e netas) das linhas do pai selecionadas por `ids_pai`"""
+        for filha in self._tabelas_filhas(conn, tabela):
+            ids = f'SELECT id FROM "{filha}" WHERE "{COLUNA_PAI}" IN ({ids_pai})'
+            self._apagar_filhas(conn, filha, ids, valores)
+            conn.execute(f'DELETE FROM "{filha}" WHERE "{COLUNA_PAI}" IN ({ids_pai})', valores)
+
+    def _registrar_falha(self, conn, item, erro):
+        tabela, _, linhas, _, resultado, *_ = item
+        self.falhas += 1
+        print(f"\n🔴 ERRO ao gravar {len(linhas)} linhas em '{tabela}': {str(erro)}")
+        if resultado:
+            # Sem os validadores, a próxima busca baixa e grava a unidade de novo
+            resultado = dict(resultado, status=ERRO, erro=f"{type(erro).__name__}: {str(erro)}", tipo_erro=type(erro).__name__,
+                             hash=None, etag=None, last_modified=None)
+            try:
+                registrar_resultado(conn, **resultado)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
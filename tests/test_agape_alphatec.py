@@ -0,0 +1,46 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+# O nome do arquivo tem '&', então não dá para usar import normal
+spec = importlib.util.spec_from_file_location('agape_alphatec', os.path.join(SRC_DIR, 'agape&alphatec.py'))
+agape = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(agape)
+
+class WriterFalso:
+    def __init__(self):
+        self.chamadas = []
+
+    def gravar(self, tabela, colunas, linhas, tipos=None, resultado=None, substituir=None, filhas=None):
+        self.chamadas.append((tabela, colunas, linhas, filhas))
+
+class TestGravar(unittest.TestCase):
+    FIXOS = {'municipio': 'Vitória', 'ano': 2024, 'mes': 1}
+
+    def gravar(self, registros):
+        adaptador = agape.AgapeAlphatec()
+        writer = WriterFalso()
+        adaptador.gravar(writer, 'despesas', adaptador.achatador.achatar(registros), self.FIXOS, None, None)
+        return writer.chamadas[0]
+
+    def test_registros_vazios(self):
+        _, colunas, linhas, _ = self.gravar([{}, {}])
+        self.assertEqual(colunas, list(self.FIXOS))
+        self.assertEqual(linhas, [tuple(self.FIXOS.values())] * 2)
+
+    def test_so_colunas_fixas(self):
+        _, colunas, linhas, _ = self.gravar([{'Municipio': 'Serra', 'ANO': 2023, 'mes': 5}])
+        self.assertEqual(colunas, list(self.FIXOS))
+        self.assertEqual(linhas, [tuple(self.FIXOS.values())])
+
+    def test_colunas_da_api_e_fixas(self):
+        _, colunas, linhas, _ = self.gravar([{'valor': 1.5, 'ano': 1999}, {'valor': 2.0}])
+        self.assertEqual(colunas, ['valor'] + list(self.FIXOS))
+        self.assertEqual(linhas, [(1.5, 'Vitória', 2024, 1), (2.0, 'Vitória', 2024, 1)])
+
+if __name__ == '__main__':
+    unittest.main()
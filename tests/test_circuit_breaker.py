@@ -0,0 +1,85 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+import circuit_breaker
+from circuit_breaker import ABERTO, FECHADO, MEIO_ABERTO, CircuitBreaker
+
+HOST = 'api.exemplo.gov.br'
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.agora = 1000.0
+        relogio = mock.patch.object(circuit_breaker, 'monotonic', lambda: self.agora)
+        relogio.start()
+        self.addCleanup(relogio.stop)
+        self.disjuntor = CircuitBreaker(limite_falhas=2, tempo_reabertura=60)
+
+    def abrir(self):
+        self.disjuntor.registrar_falha(HOST)
+        self.assertTrue(self.disjuntor.registrar_falha(HOST))
+        self.assertEqual(self.disjuntor.estado(HOST), ABERTO)
+
+    def test_abre_depois_do_limite_de_falhas(self):
+        self.assertFalse(self.disjuntor.registrar_falha(HOST))
+        self.assertTrue(self.disjuntor.permitir(HOST))
+        self.assertTrue(self.disjuntor.registrar_falha(HOST))
+        self.assertFalse(self.disjuntor.permitir(HOST))
+        # Os outros hosts não são afetados
+        self.assertTrue(self.disjuntor.permitir('outro.gov.br'))
+
+    def test_sucesso_zera_as_falhas(self):
+        self.disjuntor.registrar_falha(HOST)
+        self.disjuntor.registrar_sucesso(HOST)
+        self.assertFalse(self.disjuntor.registrar_falha(HOST))
+        self.assertEqual(self.disjuntor.estado(HOST), FECHADO)
+
+    def test_meio_aberto_deixa_passar_uma_unica_sonda(self):
+        self.abrir()
+        self.agora += 59
+        self.assertFalse(self.disjuntor.permitir(HOST))
+        self.agora += 1
+        self.assertTrue(self.disjuntor.permitir(HOST))
+        self.assertEqual(self.disjuntor.estado(HOST), MEIO_ABERTO)
+        self.assertFalse(self.disjuntor.permitir(HOST))
+
+    def test_sonda_com_sucesso_fecha(self):
+        self.abrir()
+        self.agora += 60
+        self.assertTrue(self.disjuntor.permitir(HOST))
+        self.disjuntor.registrar_sucesso(HOST)
+        self.assertEqual(self.disjuntor.estado(HOST), FECHADO)
+        self.assertTrue(self.disjuntor.permitir(HOST))
+        self.assertTrue(self.disjuntor.permitir(HOST))
+
+    def test_sonda_com_falha_reabre_sem_esperar_o_limite(self):
+        self.abrir()
+        self.agora += 60
+        self.assertTrue(self.disjuntor.permitir(HOST))
+        self.assertTrue(self.disjuntor.registrar_falha(HOST))
+        self.assertEqual(self.disjuntor.estado(HOST), ABERTO)
+        self.assertFalse(self.disjuntor.permitir(HOST))
+        # O tempo de reabertura conta de novo a partir da falha da sonda
+        self.agora += 60
+        self.assertTrue(self.disjuntor.permitir(HOST))
+
+    def test_liberar_sonda_permite_nova_sondagem(self):
+        self.abrir()
+        self.agora += 60
+        self.assertTrue(self.disjuntor.permitir(HOST))
+        self.disjuntor.liberar_sonda(HOST)
+        self.assertEqual(self.disjuntor.estado(HOST), MEIO_ABERTO)
+        self.assertTrue(self.disjuntor.permitir(HOST))
+        self.assertFalse(self.disjuntor.permitir(HOST))
+
+    def test_liberar_sonda_sem_sondagem_nao_faz_nada(self):
+        self.abrir()
+        self.disjuntor.liberar_sonda(HOST)
+        self.assertFalse(self.disjuntor.permitir(HOST))
+
+if __name__ == '__main__':
+    unittest.main()
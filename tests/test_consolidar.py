@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'Pipelines'))
+
+from Consolidar import construir_entidade
+from ledger import OK, VAZIO, criar_ledger, planejar_unidades, registrar_resultado, regravacao
+
+SPEC = {
+    'colunas': {'numero': 'TEXT', 'valor_homologado': 'REAL'},
+    'fontes': [{'empresa': 'portaltp', 'banco': 'portaltp.db', 'tabela': 'licitacoes', 'mapa': {'ValorHomologado': 'valor_homologado'}}],
+}
+
+class TestConsolidarIncremental(unittest.TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.bds = Path(pasta.name)
+        self.saida = self.bds / 'consolidado'
+        self.fonte = sqlite3.connect(self.bds / 'portaltp.db')
+        self.addCleanup(self.fonte.close)
+        criar_ledger(self.fonte)
+        self.fonte.execute("CREATE TABLE licitacoes (id INTEGER PRIMARY KEY AUTOINCREMENT, Numero TEXT, ValorHomologado REAL, "
+                           "municipio TEXT, ano INTEGER, mes INTEGER)")
+        planejar_unidades(self.fonte, [{'empresa': 'portaltp', 'endpoint': 'licitacoes', 'municipio': municipio, 'ano': 2024, 'mes': 1}
+                                       for municipio in ('Serra', 'Vitória')])
+        self.unidades = dict(self.fonte.execute("SELECT municipio, id FROM _ledger"))
+        self.gravar('Serra', [('1', 10.0), ('2', 20.0)])
+        self.gravar('Vitória', [('3', 30.0)])
+
+    def gravar(self, municipio, linhas, status=OK):
+        """Grava as linhas de uma unidade como o extrator: linhas e ledger na mesma transação"""
+        self.fonte.execute("DELETE FROM licitacoes WHERE municipio = ?", (municipio,))
+        self.fonte.executemany("INSERT INTO licitacoes (Numero, ValorHomologado, municipio, ano, mes) VALUES (?, ?, ?, 2024, 1)",
+                               [(numero, valor, municipio) for numero, valor in linhas])
+        registrar_resultado(self.fonte, self.unidades[municipio], status, linhas=len(linhas))
+        self.fonte.commit()
+
+    def construir(self, completo=False):
+        relatorio = construir_entidade('licitacoes', SPEC, self.bds, self.saida, completo)
+        conn = sqlite3.connect(self.saida / 'licitacoes.db')
+        try:
+            linhas = conn.execute("SELECT municipio, numero, valor_homologado FROM licitacoes ORDER BY numero").fetchall()
+        finally:
+            conn.close()
+        return relatorio[-1], linhas
+
+    def test_primeira_construcao_copia_tudo(self):
+        relatorio, linhas = self.construir()
+        self.assertIn('refeita inteira', relatorio)
+        self.assertEqual(linhas, [('Serra', '1', 10.0), ('Serra', '2', 20.0), ('Vitória', '3', 30.0)])
+
+    def test_refaz_so_as_particoes_alteradas(self):
+        self.construir()
+        relatorio, linhas = self.construir()
+        self.assertIn('0 partições refeitas', relatorio)
+
+        self.gravar('Serra', [('4', 40.0)])
+        relatorio, linhas = self.construir()
+        self.assertIn('1 partições refeitas, 1 linhas inseridas', relatorio)
+        self.assertEqual(linhas, [('Vitória', '3', 30.0), ('Serra', '4', 40.0)])
+
+    def test_particao_que_voltou_vazia_sai_da_entidade(self):
+        self.construir()
+        # O extrator não apaga as linhas antigas de uma unidade vazia
+        registrar_resultado(self.fonte, self.unidades['Vitória'], VAZIO)
+        self.fonte.commit()
+        relatorio, linhas = self.construir()
+        self.assertIn('1 partições refeitas, 0 linhas inseridas', relatorio)
+        self.assertEqual(linhas, [('Serra', '1', 10.0), ('Serra', '2', 20.0)])
+
+    def test_regravacao_da_reconstrucao_entra_na_proxima_construcao(self):
+        self.construir()
+        self.fonte.execute("UPDATE licitacoes SET ValorHomologado = 99 WHERE municipio = 'Vitória'")
+        registrar_resultado(self.fonte, **regravacao(self.unidades['Vitória']))
+        self.fonte.commit()
+        relatorio, linhas = self.construir()
+        self.assertIn('1 partições refeitas', relatorio)
+        self.assertIn(('Vitória', '3', 99.0), linhas)
+
+    def test_mudanca_de_mapeamento_refaz_a_fonte(self):
+        self.construir()
+        SPEC_NOVA = dict(SPEC, fontes=[dict(SPEC['fontes'][0], mapa={})])
+        relatorio = construir_entidade('licitacoes', SPEC_NOVA, self.bds, self.saida)
+        self.assertIn('refeita inteira', relatorio[-1])
+
+if __name__ == '__main__':
+    unittest.main()
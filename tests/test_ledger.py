@@ -0,0 +1,103 @@
+import os
+import sqlite3
+import sys
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+from ledger import (ADIADO, ATRASO_BASE, ATRASO_MAXIMO, EM_ANDAMENTO, ERRO, INALTERADO, OK, PENDENTE, VAZIO,
+                    criar_ledger, planejar_unidades, registrar_resultado, regravacao, reservar_pendentes, versao_atual)
+
+EMPRESA = 'portaltp'
+
+class TestLedger(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        criar_ledger(self.conn)
+        planejar_unidades(self.conn, [{'empresa': EMPRESA, 'endpoint': 'contratos', 'municipio': 'Serra', 'ano': 2024, 'mes': mes}
+                                      for mes in (1, 2)])
+        self.id, self.outro_id = [row[0] for row in self.conn.execute("SELECT id FROM _ledger ORDER BY mes")]
+
+    def tearDown(self):
+        self.conn.close()
+
+    def unidade(self, unidade_id=None):
+        cursor = self.conn.execute("SELECT * FROM _ledger WHERE id = ?", (unidade_id or self.id,))
+        return dict(zip([col[0] for col in cursor.description], cursor.fetchone()))
+
+    def test_planejar_nao_duplica(self):
+        novas = planejar_unidades(self.conn, [{'empresa': EMPRESA, 'endpoint': 'contratos', 'municipio': 'Serra', 'ano': 2024, 'mes': 1}])
+        self.assertEqual(novas, 0)
+        self.assertEqual(self.unidade()['status'], PENDENTE)
+
+    def test_erro_adia_com_atraso_dobrando(self):
+        registrar_resultado(self.conn, self.id, OK, hash='h1', etag='"e1"', concluido_em=100.0)
+        registrar_resultado(self.conn, self.id, ERRO, erro='timeout', tipo_erro='Timeout', concluido_em=1000.0)
+        unidade = self.unidade()
+        self.assertEqual((unidade['status'], unidade['falhas_seguidas']), (ERRO, 1))
+        self.assertEqual(unidade['proxima_tentativa'], 1000.0 + ATRASO_BASE)
+        # O erro apaga os validadores: a próxima busca baixa o conteúdo inteiro
+        self.assertEqual((unidade['hash'], unidade['etag']), (None, None))
+
+        registrar_resultado(self.conn, self.id, ERRO, concluido_em=2000.0)
+        unidade = self.unidade()
+        self.assertEqual(unidade['falhas_seguidas'], 2)
+        self.assertEqual(unidade['proxima_tentativa'], 2000.0 + 2 * ATRASO_BASE)
+
+    def test_atraso_limitado_ao_maximo(self):
+        self.conn.execute("UPDATE _ledger SET falhas_seguidas = 40 WHERE id = ?", (self.id,))
+        registrar_resultado(self.conn, self.id, ERRO, concluido_em=1000.0)
+        self.assertEqual(self.unidade()['proxima_tentativa'], 1000.0 + ATRASO_MAXIMO)
+
+    def test_adiado_mantem_falhas_e_pode_ser_tentado_ja(self):
+        registrar_resultado(self.conn, self.id, ERRO)
+        registrar_resultado(self.conn, self.id, ADIADO, tipo_erro='CircuitoAberto')
+        unidade = self.unidade()
+        self.assertEqual((unidade['status'], unidade['falhas_seguidas'], unidade['proxima_tentativa']), (ADIADO, 1, None))
+
+    def test_sucesso_zera_falhas(self):
+        registrar_resultado(self.conn, self.id, ERRO)
+        registrar_resultado(self.conn, self.id, OK, linhas=10, hash='h1')
+        unidade = self.unidade()
+        self.assertEqual((unidade['status'], unidade['falhas_seguidas'], unidade['proxima_tentativa']), (OK, 0, None))
+        self.assertEqual((unidade['linhas'], unidade['tentativas']), (10, 2))
+
+    def test_inalterado_mantem_linhas_e_validadores(self):
+        registrar_resultado(self.conn, self.id, OK, linhas=10, hash='h1', etag='"e1"')
+        registrar_resultado(self.conn, self.id, INALTERADO, http_status=304)
+        unidade = self.unidade()
+        self.assertEqual((unidade['status'], unidade['linhas'], unidade['hash'], unidade['etag']), (INALTERADO, 10, 'h1', '"e1"'))
+
+    def test_reserva_ignora_erros_ainda_nao_elegiveis(self):
+        registrar_resultado(self.conn, self.id, ERRO)
+        self.conn.commit()
+        reservadas = reservar_pendentes(self.conn, EMPRESA)
+        self.assertEqual([u['id'] for u in reservadas], [self.outro_id])
+        self.assertEqual(self.unidade(self.outro_id)['status'], EM_ANDAMENTO)
+
+        self.conn.execute("UPDATE _ledger SET proxima_tentativa = 0 WHERE id = ?", (self.id,))
+        self.assertEqual([u['id'] for u in reservar_pendentes(self.conn, EMPRESA)], [self.id])
+
+    def test_versao_cresce_so_quando_as_linhas_mudam(self):
+        self.assertEqual(versao_atual(self.conn), 0)
+        registrar_resultado(self.conn, self.id, OK)
+        registrar_resultado(self.conn, self.outro_id, VAZIO)
+        self.assertEqual((self.unidade()['versao'], self.unidade(self.outro_id)['versao']), (1, 2))
+
+        registrar_resultado(self.conn, self.id, INALTERADO)
+        registrar_resultado(self.conn, self.id, ADIADO)
+        self.assertEqual(versao_atual(self.conn), 2)
+
+        registrar_resultado(self.conn, **regravacao(self.id))
+        unidade = self.unidade()
+        self.assertEqual((unidade['versao'], unidade['status'], unidade['tentativas']), (3, ADIADO, 3))
+
+    def test_versao_atual_sem_coluna_versao(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE _ledger (id INTEGER PRIMARY KEY, status TEXT)")
+        self.assertIsNone(versao_atual(conn))
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+PIPELINES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Pipelines')
+sys.path.insert(0, PIPELINES_DIR)
+
+from MigrarSchema import migrar
+
+class TestMigrar(unittest.TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.db = Path(pasta.name) / 'teste.db'
+        conn = sqlite3.connect(self.db)
+        conn.executescript('''
+            CREATE TABLE contratos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                Numero TEXT,
+                Valor TEXT CHECK (Valor != ''),
+                Documento TEXT,
+                ano INTEGER,
+                dobro REAL GENERATED ALWAYS AS (Valor * 2) VIRTUAL,
+                CHECK (ano > 2000)
+            );
+            CREATE INDEX idx_contratos_numero ON contratos (Numero);
+            INSERT INTO contratos (Numero, Valor, Documento, ano) VALUES ('1/2024', '10.5', 'a', 2024), ('2/2024', '3', 'b', 2023);
+        ''')
+        conn.close()
+
+    def migrar(self, plano, **kwargs):
+        relatorio = []
+        with redirect_stdout(StringIO()):
+            ok = migrar(self.db, plano, progresso=None, relatorio=relatorio, **kwargs)
+        return ok, {item['tabela']: item['caminho'] for item in relatorio}
+
+    def consultar(self, sql):
+        conn = sqlite3.connect(self.db)
+        try:
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def colunas(self):
+        return [row[1] for row in self.consultar("PRAGMA table_xinfo(contratos)")]
+
+    def test_renomear_e_nativo(self):
+        ok, caminhos = self.migrar({'contratos': {'renomear': {'Numero': 'numero'}}})
+        self.assertTrue(ok)
+        self.assertEqual(caminhos, {'contratos': 'nativo'})
+        self.assertEqual(self.colunas(), ['id', 'numero', 'Valor', 'Documento', 'ano', 'dobro'])
+        self.assertEqual(self.consultar("SELECT numero FROM contratos ORDER BY id"), [('1/2024',), ('2/2024',)])
+
+    def test_mudanca_de_tipo_reconstroi_mantendo_geradas_e_checks(self):
+        ok, caminhos = self.migrar({'contratos': {'renomear': {'Valor': 'valor', 'Numero': 'numero'}, 'tipos': {'Valor': 'REAL'},
+                                                  'remover': ['Documento']}})
+        self.assertTrue(ok)
+        self.assertEqual(caminhos, {'contratos': 'reconstrucao'})
+        self.assertEqual(self.colunas(), ['id', 'numero', 'valor', 'ano', 'dobro'])
+        self.assertEqual(self.consultar("SELECT id, numero, valor, dobro FROM contratos ORDER BY id"),
+                         [(1, '1/2024', 10.5, 21.0), (2, '2/2024', 3.0, 6.0)])
+        # Os CHECKs e o índice passam para a tabela nova com os nomes novos
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.consultar("INSERT INTO contratos (numero, valor, ano) VALUES ('3/2024', 1, 1999)")
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.consultar("INSERT INTO contratos (numero, valor, ano) VALUES ('3/2024', '', 2024)")
+        self.assertEqual(self.consultar("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'contratos'"),
+                         [('idx_contratos_numero',)])
+        self.assertEqual(self.consultar("SELECT seq FROM sqlite_sequence WHERE name = 'contratos'"), [(2,)])
+
+    def test_reconstrucao_forcada(self):
+        ok, caminhos = self.migrar({'contratos': {'renomear': {'Numero': 'numero'}}}, reconstruir=True)
+        self.assertTrue(ok)
+        self.assertEqual(caminhos, {'contratos': 'reconstrucao'})
+        self.assertEqual(self.consultar("SELECT numero, dobro FROM contratos ORDER BY id"), [('1/2024', 21.0), ('2/2024', 6.0)])
+
+    def test_coluna_usada_por_gerada_ou_check_nao_e_removida(self):
+        antes = self.consultar("SELECT sql FROM sqlite_master WHERE name = 'contratos'")
+        for coluna in ('Valor', 'ano'):
+            with self.subTest(coluna=coluna):
+                ok, _ = self.migrar({'contratos': {'remover': [coluna], 'tipos': {'Numero': 'TEXT'}}})
+                self.assertFalse(ok)
+                self.assertEqual(self.consultar("SELECT sql FROM sqlite_master WHERE name = 'contratos'"), antes)
+
+    def test_simular_nao_altera_o_banco(self):
+        relatorio = []
+        with redirect_stdout(StringIO()):
+            self.assertTrue(migrar(self.db, {'contratos': {'tipos': {'Valor': 'REAL'}}}, simular=True, relatorio=relatorio))
+        self.assertEqual(relatorio[0]['caminho'], 'reconstrucao')
+        self.assertEqual(self.consultar("SELECT type FROM pragma_table_info('contratos') WHERE name = 'Valor'"), [('TEXT',)])
+
+if __name__ == '__main__':
+    unittest.main()
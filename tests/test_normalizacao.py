@@ -0,0 +1,58 @@
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+from normalizacao import Normalizador
+
+ESPECIFICACAO = {
+    '*': {'*': {'valor': 'dinheiro', 'dataassinatura': 'data', 'cpfcnpj': 'documento'}},
+    'tectrilha': {'*': {'anoprocesso': 'inteiro'}, 'contratos': {'valor': 'inteiro'}},
+}
+
+class TestNormalizador(unittest.TestCase):
+    def setUp(self):
+        self.normalizador = Normalizador('tectrilha', ESPECIFICACAO)
+
+    def test_converte_as_colunas_declaradas(self):
+        colunas = ['Valor', 'Data_Assinatura', 'CpfCnpj', 'AnoProcesso', 'objeto']
+        linhas = [
+            ('R$ 1.234,56', '2024-01-02T00:00:00', '12.345.678/0001-90', '2023', 'obra'),
+            (10, '02/01/2024', 1234567890, 2023.0, 'compra'),
+        ]
+        convertidas, tipos = self.normalizador.aplicar('licitacoes', colunas, linhas)
+        self.assertEqual(convertidas, [
+            (1234.56, 19724, '12345678000190', 2023, 'obra'),
+            (10.0, 19724, '01234567890', 2023, 'compra'),
+        ])
+        self.assertEqual(tipos, {'Valor': 'REAL', 'Data_Assinatura': 'INTEGER', 'CpfCnpj': 'VARCHAR(14)', 'AnoProcesso': 'INTEGER'})
+
+    def test_valor_invalido_fica_como_veio(self):
+        convertidas, _ = self.normalizador.aplicar('licitacoes', ['valor', 'anoprocesso'], [('a combinar', ''), (None, 'x')])
+        self.assertEqual(convertidas, [('a combinar', None), (None, 'x')])
+
+    def test_entrada_mais_especifica_prevalece(self):
+        _, tipos = self.normalizador.aplicar('contratos', ['valor'], [('7',)])
+        self.assertEqual(tipos, {'valor': 'INTEGER'})
+        self.assertEqual(Normalizador('portaltp', ESPECIFICACAO).tipos_da_tabela('contratos')['valor'], 'dinheiro')
+
+    def test_coluna_declarada_com_outro_tipo_nao_e_convertida(self):
+        linhas = [('R$ 1,00', '2024-01-02')]
+        saida = StringIO()
+        with redirect_stdout(saida):
+            convertidas, tipos = self.normalizador.aplicar('licitacoes', ['Valor', 'DataAssinatura'], linhas,
+                                                           {'valor': 'TEXT', 'dataassinatura': 'integer'})
+        self.assertIn('MigrarSchema --tipo licitacoes.Valor:REAL', saida.getvalue())
+        self.assertEqual(convertidas, [('R$ 1,00', 19724)])
+        self.assertEqual(tipos, {'DataAssinatura': 'INTEGER'})
+
+    def test_sem_colunas_tipadas(self):
+        linhas = [('a', 1)]
+        self.assertEqual(self.normalizador.aplicar('licitacoes', ['objeto', 'numero'], linhas), (linhas, {}))
+
+if __name__ == '__main__':
+    unittest.main()
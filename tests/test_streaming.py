@@ -0,0 +1,46 @@
+import os
+import sys
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_DIR)
+
+from streaming import iterar_array_json
+
+def em_pedacos(corpo, tamanho):
+    return [corpo[i:i + tamanho] for i in range(0, len(corpo), tamanho)]
+
+class TestIterarArrayJson(unittest.TestCase):
+    CORPO = ('[{"nome": "Conceição", "obs": "aspas \\" e barra \\\\", "unicode": "\\u00e9"},'
+             ' 12345, -0.5e3, "texto, com ] e [", [1, [2]], {"vazio": {}}, true, null]').encode('utf-8')
+    ESPERADO = [{'nome': 'Conceição', 'obs': 'aspas " e barra \\', 'unicode': 'é'},
+                12345, -500.0, 'texto, com ] e [', [1, [2]], {'vazio': {}}, True, None]
+
+    def test_qualquer_fronteira_de_pedaco(self):
+        # Pedaços de 1 byte cortam caracteres UTF-8, escapes e números ao meio
+        for tamanho in (1, 2, 3, 7, 64, len(self.CORPO)):
+            with self.subTest(tamanho=tamanho):
+                self.assertEqual(list(iterar_array_json(em_pedacos(self.CORPO, tamanho))), self.ESPERADO)
+
+    def test_numero_no_fim_do_pedaco(self):
+        self.assertEqual(list(iterar_array_json([b'[1', b'23, 4', b'5]'])), [123, 45])
+
+    def test_array_vazio_e_corpo_vazio(self):
+        self.assertEqual(list(iterar_array_json([b'[', b' \n ', b']'])), [])
+        self.assertEqual(list(iterar_array_json([b''])), [])
+        self.assertEqual(list(iterar_array_json([])), [])
+
+    def test_bom(self):
+        self.assertEqual(list(iterar_array_json(em_pedacos(b'\xef\xbb\xbf[{"a": 1}]', 1))), [{'a': 1}])
+
+    def test_objeto_isolado_vira_registro_unico(self):
+        self.assertEqual(list(iterar_array_json([b'{"a":', b' [1, 2]}'])), [{'a': [1, 2]}])
+
+    def test_array_nao_fechado(self):
+        with self.assertRaises(ValueError):
+            list(iterar_array_json([b'[{"a": 1}, {"b": 2}']))
+        with self.assertRaises(ValueError):
+            list(iterar_array_json([b'[{"a": 1} {"b": 2}]']))
+
+if __name__ == '__main__':
+    unittest.main()